@@ -1,67 +1,331 @@
 from tkinter import PhotoImage
 
+DIRECTIONS = ["north", "south", "east", "west"]
+DETAIL_UNIT = 24
+
 
 class Drawer:
-    """Contains methods to draw the game display for the trivia game."""
-    def __init__(self, maze, canvas):
+    """
+    Contains methods to draw the game display for the trivia game. The canvas shows a viewport of view_rows by
+    view_cols rooms that scrolls to follow the player, and only the rooms inside it are drawn. draw creates a canvas
+    item for every feature of the visible rooms and keeps them, tagged by kind ("highlight", "wall", "door", "hint",
+    "exit", "player"). After that, update only changes the items of the rooms a move or a locked door affected, so
+    redrawing after a move costs the same however large the maze is.
+    In minimap mode the whole maze is scaled to fit the viewport. Once rooms are smaller than DETAIL_UNIT pixels, walls
+    and doors are left out, visited rooms are drawn as one rectangle per run of rooms in a row, and the player and exit
+    are drawn as colored squares.
+    view: (view_rows, view_cols) number of rooms shown at once, the whole maze if None
+    player_image, exit_image: images for the player and the exit, loaded from the fx folder if None
+    """
+    def __init__(self, maze, canvas, player_image=None, exit_image=None, view=None):
         self.maze = maze
         self.rows = self.maze.rows
         self.cols = self.maze.cols
         self.room_unit = 100
         self.canvas = canvas
-        self.player_image = PhotoImage(file='fx/player.gif')
-        self.exit_image = PhotoImage(file='fx/exit.gif')
+        self.player_image = player_image if player_image is not None else PhotoImage(file='fx/player.gif')
+        self.exit_image = exit_image if exit_image is not None else PhotoImage(file='fx/exit.gif')
+        self.hint = None
+        self.view = view
+        self.view_rows, self.view_cols = view if view is not None else (self.rows, self.cols)
+        self.width, self.height = self.view_cols * 100, self.view_rows * 100
+        self.minimap = False
+        self.top = 0
+        self.left = 0
+        self.margin = 1
+        self._grid = None
+        self._highlights = {}
+        self._doors = {}
+        self._player = None
+        self._player_cell = None
+        self._locks_seen = 0
+        self._hint_key = None
+
+    @property
+    def detailed(self):
+        """True if rooms are large enough to draw walls, doors and images."""
+        return self.room_unit >= DETAIL_UNIT
+
+    def set_minimap(self, minimap):
+        """Switches between the viewport following the player and the whole maze scaled to fit, and redraws."""
+        self.minimap = minimap
+        self.draw()
+
+    def scroll(self, rows, cols):
+        """Moves the viewport by the given number of rooms, staying inside the maze, and redraws if it moved. The
+        viewport jumps back to the player on the player's next move if the player is out of sight."""
+        if self._place(self.top + rows, self.left + cols):
+            self.draw()
 
     def draw(self):
-        """Draws all of the rooms in the maze along with their contents. Draws walls in a separate loop from the
-        doors to avoid overlapping lines causing doors to be obscured in the map. Returns the canvas object after
-        drawing all features."""
+        """Draws the visible rooms in the maze along with their contents. Draws walls in a separate loop from the
+        doors to avoid overlapping lines causing doors to be obscured in the map. If hint is set to a PathService, the
+        route to the exit is drawn under the player."""
         self.canvas.delete("all")
-        for room in self.maze.visited_rooms:
-            self.highlight_room(room)
-        for row in self.maze.grid:
-            for room in row:
-                self.draw_walls(room)
-        for room in self.maze.visited_rooms:
-            self.draw_door(room)
+        self._player = None
+        self.rows, self.cols = self.maze.rows, self.maze.cols
+        self._grid = self.maze.grid
+        self._highlights = {}
+        self._doors = {}
+        self._locks_seen = len(self.maze.locked_doors)
+        self._hint_key = None
+        self._fit()
+        cells = self._visible_cells()
+        if self.detailed:
+            for cell in cells:
+                if self.maze.is_visited(*divmod(cell, self.cols)):
+                    self.highlight_room(self.maze.get_room(*divmod(cell, self.cols)))
+            for cell in cells:
+                self.draw_walls(self.maze.get_room(*divmod(cell, self.cols)))
+            for cell in cells:
+                self._refresh_doors(cell)
+        else:
+            self._highlight_runs()
+        self.draw_hint(self.hint.path() if self.hint is not None else None)
         self.draw_exit()
         self.draw_player()
 
+    def update(self):
+        """Brings the display up to date after the player moved or doors were locked. Only the rooms the player left
+        and entered and the rooms on both sides of newly locked doors are redrawn, along with the hint if it changed.
+        Falls back to draw if nothing was drawn yet, the viewport has to scroll to keep the player in sight, or the maze
+        was constructed again or replaced."""
+        maze = self.maze
+        if self._player is None or maze.grid is not self._grid or self._follow():
+            self.draw()
+            return
+        cols = self.cols
+        location = maze.player_location
+        cells = {self._player_cell, location[0] * cols + location[1]}
+        for row, col, direction in maze.locked_doors[self._locks_seen:]:
+            cell = row * cols + col
+            cells.add(cell)
+            cells.add(self._neighbour(cell, direction))
+        self._locks_seen = len(maze.locked_doors)
+        for cell in cells:
+            if cell is not None and self._in_view(cell):
+                self._refresh(cell)
+        self.draw_hint(self.hint.path() if self.hint is not None else None)
+        self.draw_player()
+
+    def _fit(self):
+        """Sets the size of the rooms and the viewport for the current mode, scrolling to the player if needed."""
+        if self.minimap:
+            self.room_unit = max(1, min(self.width // self.cols, self.height // self.rows, 100))
+            self.view_rows, self.view_cols = self.rows, self.cols
+            self.top = self.left = 0
+            return
+        self.room_unit = 100
+        self.view_rows, self.view_cols = self.view if self.view is not None else (self.rows, self.cols)
+        self.view_rows, self.view_cols = min(self.view_rows, self.rows), min(self.view_cols, self.cols)
+        self._place(self.top, self.left)
+        self._follow()
+
+    def _follow(self):
+        """Scrolls the viewport so the player is at least margin rooms away from its edges, centering the player if
+        the viewport has to move. Returns True if it moved."""
+        if self.minimap:
+            return False
+        row, col = self.maze.player_location[0], self.maze.player_location[1]
+        top, left = self.top, self.left
+        margin_rows = min(self.margin, (self.view_rows - 1) // 2)
+        margin_cols = min(self.margin, (self.view_cols - 1) // 2)
+        if not top + margin_rows <= row < top + self.view_rows - margin_rows:
+            top = row - self.view_rows // 2
+        if not left + margin_cols <= col < left + self.view_cols - margin_cols:
+            left = col - self.view_cols // 2
+        return self._place(top, left)
+
+    def _place(self, top, left):
+        """Moves the top left corner of the viewport, kept inside the maze. Returns True if it moved."""
+        top = max(0, min(top, self.rows - self.view_rows))
+        left = max(0, min(left, self.cols - self.view_cols))
+        moved = (top, left) != (self.top, self.left)
+        self.top, self.left = top, left
+        return moved
+
+    def _visible_cells(self):
+        cols = self.cols
+        return [row * cols + col for row in range(self.top, self.top + self.view_rows)
+                for col in range(self.left, self.left + self.view_cols)]
+
+    def _in_view(self, cell):
+        row, col = divmod(cell, self.cols)
+        return self.top <= row < self.top + self.view_rows and self.left <= col < self.left + self.view_cols
+
+    def _x(self, col):
+        return (col - self.left) * self.room_unit
+
+    def _y(self, row):
+        return (row - self.top) * self.room_unit
+
+    def _scale(self, length):
+        return length * self.room_unit // 100
+
+    def _refresh(self, cell):
+        """Redraws the highlight of a room and the doors on its four sides to match the maze."""
+        row, col = divmod(cell, self.cols)
+        if self.maze.is_visited(row, col) and cell not in self._highlights:
+            self.highlight_room(self.maze.get_room(row, col))
+        if self.detailed:
+            self._refresh_doors(cell)
+
+    def _refresh_doors(self, cell):
+        """Shows the doors on the four sides of a room that can be travelled through and lead from or to a visited
+        room, and removes the others."""
+        row, col = divmod(cell, self.cols)
+        maze = self.maze
+        visited = maze.is_visited(row, col)
+        for direction in DIRECTIONS:
+            neighbour = self._neighbour(cell, direction)
+            if neighbour is None:
+                continue
+            key = self._door_key(cell, direction)
+            shown = maze.check_direction(row, col, direction) and (
+                visited or maze.is_visited(*divmod(neighbour, self.cols)))
+            if shown and key not in self._doors:
+                self._create_door(row, col, direction)
+            elif not shown and key in self._doors:
+                self.canvas.delete(self._doors.pop(key))
+
+    def _neighbour(self, cell, direction):
+        """Returns the index of the room next to cell in direction, or None if it would be outside the maze."""
+        row, col = divmod(cell, self.cols)
+        if direction == "north":
+            return cell - self.cols if row > 0 else None
+        if direction == "south":
+            return cell + self.cols if row < self.rows - 1 else None
+        if direction == "east":
+            return cell + 1 if col < self.cols - 1 else None
+        return cell - 1 if col > 0 else None
+
+    def _door_key(self, cell, direction):
+        """Returns the key of a door, the same from the rooms on both sides of it."""
+        if direction == "south":
+            return cell + self.cols, "north"
+        if direction == "east":
+            return cell + 1, "west"
+        return cell, direction
+
     def draw_walls(self, room):
         """Draws a rectangle representing a room in the maze in the canvas that is passed in. Uses the position of
         the room to position the rectangle within the canvas."""
         row, col = room.position[0], room.position[1]
-        self.canvas.create_rectangle(self.room_unit * col+4, self.room_unit * row+4, self.room_unit * (col+1),
-                                     self.room_unit * (row+1), width=4)
+        width = max(1, self._scale(4))
+        self.canvas.create_rectangle(self._x(col) + width, self._y(row) + width, self._x(col + 1),
+                                     self._y(row + 1), width=width, tags="wall")
 
     def draw_player(self):
+        """Draws the player, or moves the player's marker if it was already drawn."""
         location = self.maze.player_location
         row, col = location[0], location[1]
-        offset = self.room_unit // 2
-        self.canvas.create_image(self.room_unit * col + offset, self.room_unit * row + offset, image=self.player_image)
+        self._player_cell = row * self.cols + col
+        if self._player is not None:
+            self.canvas.coords(self._player, *self._marker_coords(row, col))
+        elif self.room_unit == 100:
+            self._player = self.canvas.create_image(*self._marker_coords(row, col), image=self.player_image,
+                                                    tags="player")
+        else:
+            self._player = self.canvas.create_rectangle(*self._marker_coords(row, col), fill="red", outline="",
+                                                        tags="player")
 
     def draw_exit(self):
         maze_exit = self.maze.exit
         row, col = maze_exit.position[0], maze_exit.position[1]
+        if not self._in_view(row * self.cols + col):
+            return
+        if self.room_unit == 100:
+            self.canvas.create_image(*self._marker_coords(row, col), image=self.exit_image, tags="exit")
+        else:
+            self.canvas.create_rectangle(*self._marker_coords(row, col), fill="green", outline="", tags="exit")
+
+    def _marker_coords(self, row, col):
+        """Returns the coordinates of the player or exit in a room, the center for images, a square inside the room
+        for the markers used when rooms are scaled down."""
         offset = self.room_unit // 2
-        self.canvas.create_image(self.room_unit * col + offset, self.room_unit * row + offset, image=self.exit_image)
+        if self.room_unit == 100:
+            return self._x(col) + offset, self._y(row) + offset
+        inset = self.room_unit // 5
+        return (self._x(col) + inset, self._y(row) + inset,
+                self._x(col + 1) - inset, self._y(row + 1) - inset)
 
-    def draw_door(self, room):
-        """Draws the doors of the rooms in the maze on the canvas that is passed in. Checks if it is possible to
-        travel in each direction using the maze's check_direction method and draws a door if it is possible to
-        travel in that direction."""
-        row, col = room.position[0], room.position[1]
-        directions = ["north", "south", "east", "west"]
+    def _create_door(self, row, col, direction):
+        i = DIRECTIONS.index(direction)
         cols = [col, col, col+1, col]
         rows = [row, row+1, row, row]
         col_offset, row_offset = [23, 83, 23, 83, -1, 5, -1, 5], [-1, 5, -1, 5, 23, 83, 23, 83]
-        for i in range(4):
-            if self.maze.check_direction(row, col, directions[i]):
-                self.canvas.create_rectangle(self.room_unit * cols[i] + col_offset[i*2], self.room_unit * rows[i] + row_offset[i*2],
-                                             self.room_unit * cols[i] + col_offset[i*2+1], self.room_unit * rows[i] + row_offset[i*2+1],
-                                             fill="white", outline="")
+        item = self.canvas.create_rectangle(self._x(cols[i]) + self._scale(col_offset[i*2]),
+                                            self._y(rows[i]) + self._scale(row_offset[i*2]),
+                                            self._x(cols[i]) + self._scale(col_offset[i*2+1]),
+                                            self._y(rows[i]) + self._scale(row_offset[i*2+1]),
+                                            fill="white", outline="", tags="door")
+        if self._player is not None:
+            self.canvas.tag_raise(item, "wall")
+        self._doors[self._door_key(row * self.cols + col, direction)] = item
 
     def highlight_room(self, room):
         row, col = room.position[0], room.position[1]
-        self.canvas.create_rectangle(self.room_unit * col, self.room_unit * row, self.room_unit * (col + 1),
-                                     self.room_unit * (row + 1), fill='white', outline="")
\ No newline at end of file
+        item = self.canvas.create_rectangle(self._x(col), self._y(row), self._x(col + 1), self._y(row + 1),
+                                            fill='white', outline="", tags="highlight")
+        if self._player is not None:
+            self.canvas.tag_lower(item)
+        self._highlights[row * self.cols + col] = item
+
+    def _highlight_runs(self):
+        """Highlights the visited rooms with one rectangle for each run of visited rooms in a row, used when rooms are
+        too small to draw one by one."""
+        is_visited = self.maze.is_visited
+        for row in range(self.top, self.top + self.view_rows):
+            start = None
+            for col in range(self.left, self.left + self.view_cols + 1):
+                visited = col < self.left + self.view_cols and is_visited(row, col)
+                if visited and start is None:
+                    start = col
+                elif not visited and start is not None:
+                    item = self.canvas.create_rectangle(self._x(start), self._y(row), self._x(col),
+                                                        self._y(row + 1), fill='white', outline="",
+                                                        tags="highlight")
+                    for cell in range(row * self.cols + start, row * self.cols + col):
+                        self._highlights[cell] = item
+                    start = None
+
+    def draw_hint(self, path):
+        """Draws a line through the centers of the rooms in path, a list of [row, col] positions, replacing the line
+        drawn before. Only the stretches of the path inside the viewport are drawn, one line each, reaching one room
+        past its edges. Nothing is drawn if path is None, and nothing is redrawn if neither the path nor the viewport
+        changed since the last call."""
+        key = (path, self.top, self.left, self.view_rows, self.view_cols, self.room_unit)
+        if key == self._hint_key:
+            return
+        self._hint_key = key
+        self.canvas.delete("hint")
+        if not path or len(path) < 2:
+            return
+        top, left = self.top, self.left
+        bottom, right = top + self.view_rows, left + self.view_cols
+        stretches = []
+        start = None
+        for i, (row, col) in enumerate(path):
+            if top <= row < bottom and left <= col < right:
+                if start is None:
+                    start = max(0, i - 1)
+            elif start is not None:
+                stretches.append(path[start:i + 1])
+                start = None
+        if start is not None:
+            stretches.append(path[start:])
+        offset = self.room_unit // 2
+        for stretch in stretches:
+            points = []
+            for row, col in stretch:
+                points.extend([self._x(col) + offset, self._y(row) + offset])
+            if self.detailed:
+                self.canvas.create_line(*points, fill="orange", width=self._scale(6), dash=(8, 4), tags="hint")
+            else:
+                self.canvas.create_line(*points, fill="orange", width=max(1, self.room_unit // 4), tags="hint")
+        if not stretches:
+            return
+        if self._player is not None and self.canvas.find_withtag("exit"):
+            self.canvas.tag_lower("hint", "exit")
+        elif self._player is not None:
+            self.canvas.tag_lower("hint", "player")
@@ -1,35 +1,62 @@
 from maze import Maze
 from MazeDrawer import Drawer
+from path_service import PathService
 from question_database import SQLDatabase
-from tkinter import Tk, Frame, Button, Label, Canvas, Text, Toplevel, Menu, LabelFrame, ttk, StringVar, OptionMenu
+from game_session import GameSession, MOVED, QUESTION, WON, LOST
+from sound_bank import SoundBank
+from save_format import PICKLE_SUFFIX, SaveFormatError
+from save_worker import SaveWorker
+from save_catalog import SaveCatalog, PAGE_SIZE, SORTS, UNVISITED, VISITED, PLAYER, EXIT
+from tkinter import Tk, Frame, Button, Label, Canvas, Text, Toplevel, Menu, LabelFrame, ttk, StringVar, OptionMenu, \
+    Entry, PhotoImage
 from tkinter.constants import E, W, N
-import pickle
-import time
-import pygame
 import random
 from functools import partial
 
+MAX_SIZE = 500
+VIEW_ROOMS = (8, 10)
+COMPACT_ABOVE = 100
+SAVE_POLL_MS = 50
+THUMBNAIL_PIXELS = 64
+THUMBNAIL_COLORS = {UNVISITED: "#808080", VISITED: "#ffffff", PLAYER: "#ff0000", EXIT: "#00a000"}
+
 
 class MazeGUI:
     def __init__(self):
-        self.maze = Maze(4, 4)
+        self.session = GameSession(Maze(4, 4))
         self.root = Tk()
         self.gamescreen = Frame(self.root)
         self.startmenu = Frame(self.root)
-        self.db = None
         self.display = None
         self.drawer = None
-        self.start_time = None
+        self.hints = None
+        self.saves = SaveWorker()
+        self.catalog = SaveCatalog()
+        self.save_file = None
+        self._loading = None
         self.root.resizable(False, False)
         self.root.title("TriviaMaze")
         self.start_menu_init()
         self.startmenu.grid(row=0, column=0)
         self.gamescreen.grid_forget()
-        pygame.init()
-        pygame.mixer.init()
+        self.sounds = SoundBank()
+        self.saves.submit(self.catalog.import_saves)
+        self.root.after(SAVE_POLL_MS, self._poll_saves)
         self.root.mainloop()
-        pygame.init()
-        pygame.mixer.init()
+        self.saves.close()
+        self.catalog.close()
+
+    def _poll_saves(self):
+        """Runs the callbacks of the saves and loads that finished on the save worker, on the Tk thread."""
+        try:
+            self.saves.run_callbacks()
+        finally:
+            self.root.after(SAVE_POLL_MS, self._poll_saves)
+
+    @property
+    def maze(self):
+        """The maze of the current game session."""
+        return self.session.maze
 
     """Start menu"""
     def start_menu_init(self):
@@ -74,8 +101,8 @@ class MazeGUI:
         back_button.grid(row=1, column=0)
 
     def display_new_game_menu(self):
-        """Creates and displays the new game menu, allowing the player to choose question difficulty, maze size, and
-        trivia category. The default options are easy, 4x4 and no specific category."""
+        """Creates and displays the new game menu, allowing the player to choose question difficulty, maze size, maze
+        layout and trivia category. The default options are easy, 4x4, an open layout and no specific category."""
         def set_difficulty(difficulty):
             buttons = {"Easy": easy_button, "Medium": medium_button, "Hard": hard_button}
             for button in buttons.values():
@@ -117,22 +144,36 @@ class MazeGUI:
 
         dimension_frame = Frame(new_game_menu)
         dimension_frame.grid(row=2, column=0, columnspan=3)
-        dimension_choices = range(3, 11)
+        def set_size(rows, cols):
+            """Resizes the maze to the chosen size, kept between 3 and MAX_SIZE. Large mazes keep their rooms in a
+            CompactGrid."""
+            rows, cols = (max(3, min(int(choice) if choice.isdigit() else 4, MAX_SIZE)) for choice in (rows, cols))
+            self.maze.compact = rows * cols > COMPACT_ABOVE
+            self.maze.resize_maze(rows, cols)
+
         row_label = Label(dimension_frame, text="Row: ", font="Times 16", pady=15)
         row_label.grid(row=2, column=0, sticky=W)
         row_choice = StringVar()
         row_choice.set(4)
-        row_select = OptionMenu(dimension_frame, row_choice, *dimension_choices)
+        row_select = ttk.Spinbox(dimension_frame, from_=3, to=MAX_SIZE, textvariable=row_choice, width=4,
+                                 font="Times 16")
         row_select.grid(row=2, column=1)
         col_label = Label(dimension_frame, text="Col: ", font="Times 16")
         col_label.grid(row=2, column=2, sticky=W)
         col_choice = StringVar()
         col_choice.set(4)
-        col_select = OptionMenu(dimension_frame, col_choice, *dimension_choices)
+        col_select = ttk.Spinbox(dimension_frame, from_=3, to=MAX_SIZE, textvariable=col_choice, width=4,
+                                 font="Times 16")
         col_select.grid(row=2, column=3)
-
-        db = SQLDatabase()
-        category_list = db.request_category_list()
+        layouts = {"Open": None, "Backtracker": "backtracker", "Kruskal": "kruskal", "Wilson": "wilson"}
+        layout_label = Label(dimension_frame, text="Layout: ", font="Times 16")
+        layout_label.grid(row=2, column=4, sticky=W)
+        layout_choice = StringVar()
+        layout_choice.set("Open")
+        layout_select = OptionMenu(dimension_frame, layout_choice, *layouts)
+        layout_select.grid(row=2, column=5)
+
+        category_list = SQLDatabase().category_list or {}
         category_frame = Frame(new_game_menu)
         category_frame.grid(row=3, column=0, columnspan=3)
         category_label = Label(category_frame, text="Category: ", font="Times 16", pady=15).grid(row=3, column=0)
@@ -148,148 +189,239 @@ class MazeGUI:
         button_frame.grid(row=4, column=1)
         submit = Button(button_frame, text='Start', font='Times 20',
                         command=lambda: [set_category(c.get(), categories),
-                                         self.maze.resize_maze(int(row_choice.get()), int(col_choice.get())),
+                                         set_size(row_choice.get(), col_choice.get()),
+                                         self.maze.set_layout(layouts[layout_choice.get()]),
                                          self.start_game(new_game=True),
                                          new_game_menu.destroy()])
         submit.grid(row=4, column=0)
         back_button = Button(button_frame, text='Back', font='Times 20', command=lambda: new_game_menu.destroy())
         back_button.grid(row=4, column=1)
 
-    def prompt(self, savefile, type):
+    def prompt(self, type):
         """Creates a text prompt in the text display of the game screen asking the player to confirm their save/load.
-        Prompt message depend on whether the player wishes to save or load. Upon confirming their action the save or
-        load is initiated with the indicated save file.
-        savefile: name of the save file as a string
+        Prompt message depend on whether the player wishes to save or load. Upon confirming their action the game is
+        saved over its save file or the load menu is opened.
         type: type of request, either 'save' or 'load'
         """
         self.clear_text_display()
         if type == "save":
             confirm_text = "Any existing data in this save file will be written over." \
                            "\nAre you sure you wish to continue?"
-            ok_button = Button(self.text_display, text="Yes", font='Times 20', command=lambda: self.save_game(savefile))
+            ok_button = Button(self.text_display, text="Yes", font='Times 20', command=lambda: self.save_game())
         else:
             confirm_text = "Any unsaved progress will be lost when loading a save file.\n " \
                            "Are you sure you wish to continue?"
             ok_button = Button(self.text_display, text="Yes", font='Times 20',
-                               command=lambda: self.load_game(savefile))
+                               command=lambda: [self.clear_text_display(),
+                                                self.display_load_menu(back_to=self.gamescreen)])
         ok_button.grid(row=1, column=2)
         warning_text = Label(self.text_display, font="Times 18", padx=10, pady=10, text=confirm_text)
         warning_text.grid(row=0, column=1, columnspan=4)
         back_button = Button(self.text_display, text="No", font='Times 20', command=lambda: self.clear_text_display())
         back_button.grid(row=1, column=3)
 
-    def load_game(self, savefile, event=None, load_menu=None):
-        """Attempts to open the indicated save file. If it is not found and the load request came from the load menu,
-        nothing happens, if the load request came from in game, displays an error message in the text display before
-        returning. If the file is found, the maze is set equal to the save file data, the existing display is switched,
-        the game restarts with the new maze.
-        savefile: name of the save file as a string
-        load_menu: load menu frame, used to indicate if the load request came from the load menu or in game,
-        default is None
+    def load_game(self, savefile, load_menu, status, event=None):
+        """Starts reading the indicated save file on the save worker and returns, a load that is still running is
+        cancelled. The status label of the load menu shows that the save is loading, going back cancels the load. If
+        the file is found, the maze is set equal to the save file data, the load menu is closed and the game restarts
+        with the new maze, later saves of the game write to the same file.
+        savefile: save file as listed in the save catalog
+        load_menu: load menu frame
+        status: label of the load menu showing the progress of the load
         """
         print(f'loading {savefile}')
-        try:
-            loadhandle = open(savefile+'.pkl', 'rb')
-        except FileNotFoundError:
-            if load_menu:
-                return
-            else:
-                self.clear_text_display()
-                no_file_found_text = "No save file could be found for this save slot."
-                no_file = Label(self.text_display, text=no_file_found_text, font='Times 20', padx=30, pady=40)
-                no_file.grid(row=0, column=0)
-                continue_button = Button(self.text_display, text='Continue', font='Times 20',
-                                         command=self.clear_text_display)
-                continue_button.grid(row=1, column=0)
-                return
-        load_tone = pygame.mixer.Sound('sfx/load_tone.wav')
-        pygame.mixer.Sound.play(load_tone)
-        mazedata = pickle.load(loadhandle)
-        loadhandle.close()
-        self.maze = mazedata
-        if not load_menu:
-            self.display.destroy()
-        else:
-            load_menu.destroy()
-            self.screen_switch(self.startmenu, self.gamescreen)
+        self.cancel_load()
+        self._loading = self.saves.load(savefile, on_done=partial(self._finish_load, savefile, load_menu),
+                                        on_error=partial(self._load_failed, status))
+        status['text'] = "Loading, click Back to cancel."
+
+    def cancel_load(self):
+        """Cancels the load that is running, if any. The game goes on as if the load had never been asked for."""
+        if self._loading is not None:
+            self._loading.cancel()
+            self._loading = None
+
+    def _finish_load(self, savefile, load_menu, maze):
+        """Continues the game of the maze that was loaded."""
+        self._loading = None
+        self.session.resume(maze)
+        self.save_file = savefile
+        self.sounds.play("load_tone")
+        load_menu.destroy()
+        self.screen_switch(self.startmenu, self.gamescreen)
         self.start_game()
         self.check_end_game()
 
-    def save_game(self, savefile):
+    def _load_failed(self, status, error):
+        self._loading = None
+        if isinstance(error, (FileNotFoundError, SaveFormatError)):
+            status['text'] = "This save file could not be found or is damaged."
+        else:
+            status['text'] = f'The save file could not be loaded: {error}'
+
+    def save_game(self, new_file=False):
         """
-        Sets the time elapsed field for the maze and saves the current maze to the indicated save file. Displays a
-        message in the text display to tell the player that the save was completed.
-        savefile: name of the save file as a string
+        Sets the time elapsed field for the maze and saves the current maze, over the save file it was loaded from or
+        last saved to, or to a new save file if there is none or new_file is True. The state of the game is captured
+        right away and the file is written on the save worker, so the game goes on while it is written. The save
+        catalog is updated once the file is written, and the save status below the text display tells the player when
+        the save was completed.
+        new_file: if True, the game is saved to a new save file
         """
-        self.maze.set_time_elapsed(self.start_time, int(time.time()))
-        self.start_time = int(time.time())
-        savehandle = open(savefile+'.pkl', 'wb')
-        pickle.dump(self.maze, savehandle)
-        savehandle.close()
+        if new_file or self.save_file is None or self.save_file.endswith(PICKLE_SUFFIX):
+            self.save_file = self.catalog.new_filename()
         self.clear_text_display()
-        confirmation = Label(self.text_display, font="Times 18", pady=10, padx=120, text="Successfully saved", )
-        confirmation.grid(row=0, column=0)
-        back_button = Button(self.text_display, text="Continue", font='Times 18', command=self.clear_text_display)
-        back_button.grid(row=1, column=0)
-        save_tone = pygame.mixer.Sound('sfx/save_tone.wav')
-        pygame.mixer.Sound.play(save_tone)
+        self.save_status['text'] = "Saving..."
+        self.saves.save(self.session, self.save_file, on_done=lambda result: self._saved(),
+                        on_error=self._save_failed, catalog=self.catalog)
 
-    def display_load_menu(self):
+    def _saved(self):
+        if self.save_status.winfo_exists():
+            self.save_status['text'] = "Successfully saved"
+        self.sounds.play("save_tone")
+
+    def _save_failed(self, error):
+        if self.save_status.winfo_exists():
+            self.save_status['text'] = f'Saving failed: {error}'
+
+    def display_load_menu(self, back_to=None):
         """
-        Builds a load menu that displays the three save slots. Loads the save information if the save file exists and
-        uses different maze methods/fields to obtain information about the save such as the maze size, player location,
-        trivia category, trivia difficulty, and time spent in game and displays this info.
+        Builds a load menu listing the saves in the save catalog, PAGE_SIZE at a time, with buttons to page through
+        them, a search box matching their name, category or difficulty and a choice of sort order. Each save shows its
+        thumbnail, maze size, player location, trivia category, trivia difficulty, and time spent in game, all read
+        from the catalog on the save worker, so the menu opens at once however many saves there are. Only the save
+        that is clicked is read in full, and going back cancels its load.
+        back_to: frame shown again when going back, the start menu if None
         """
-        saves = Frame(self.root, height=650, width=650, bg='SystemButtonFace')
+        def show_page(number):
+            if pending:
+                pending.pop().cancel()
+            pending.append(self.saves.submit(partial(self.catalog.page, number, PAGE_SIZE, sort.get(), search.get()),
+                                             on_done=fill_page))
+
+        def fill_page(page):
+            pending.clear()
+            if not listing.winfo_exists():
+                return
+            for item in listing.winfo_children():
+                item.destroy()
+            if not page.entries:
+                Label(listing, text="No saves found.", font='Times 14', pady=20).grid(row=0, column=0)
+            for i, entry in enumerate(page.entries):
+                self._save_entry(listing, entry, saves, instruct, partial(show_page, page.number)).grid(row=i, column=0)
+            page_label['text'] = f'Page {page.number + 1}'
+            previous_button.configure(state="normal" if page.number else "disabled",
+                                      command=partial(show_page, page.number - 1))
+            next_button.configure(state="normal" if page.more else "disabled",
+                                  command=partial(show_page, page.number + 1))
+
+        def back():
+            self.cancel_load()
+            if pending:
+                pending.pop().cancel()
+            saves.destroy()
+            (back_to or self.startmenu).grid(row=0, column=0)
+
+        (back_to or self.startmenu).grid_forget()
+        saves = Frame(self.root, height=700, width=650, bg='SystemButtonFace')
         saves.grid(row=0, column=0)
-        save = []
-        load_instruct = "Loading will take a few seconds, and can be inconsistent.\n" \
-                        "Wait a moment before clicking a save file again or exit the load menu and try again."
-        instruct = Label(saves, text=load_instruct, font='Times 12', pady=10)
+        pending = []
+        instruct = Label(saves, text="Click a save file to load it.", font='Times 12', pady=10)
         instruct.grid(row=0, column=0)
-        for i in range(1, 4):
-            savelabel = LabelFrame(saves, height=175, width=550, text=f'Save {i}', cursor='hand1', font='Times 16')
-            savelabel.grid(row=i, column=0, sticky=E)
-            savelabel.grid_propagate(0)
-            try:
-                loadhandle = open(f'save_file_{i}.pkl', 'rb')
-                maze = pickle.load(loadhandle)
-                info = [f'Rows: {maze.get_size()[0]}', f'Columns: {maze.get_size()[1]}',
-                        f'Difficulty: {maze.difficulty}', f'Category: {maze.category}',
-                        f'Position: {maze.player_location}', f'Time: {maze.get_time()}']
-                for j in range(len(info)):
-                    label = Label(savelabel, text=info[j], font='Times 14', anchor=W, padx=5, pady=10)
-                    label.grid(row=j % 2, column=j // 2, sticky=W)
-                loadhandle.close()
-                save_file = "save_file_" + str(i)
-                savelabel.bind('<Button-1>', partial(self.load_game, save_file, load_menu=saves))
-            except FileNotFoundError:
-                continue
-            save.append(savelabel)
-        back_button = Button(saves, text="Back", font='Times 20', anchor=N,
-                             command=lambda: self.screen_switch(saves, self.startmenu))
-        back_button.grid(row=4, column=0)
+        controls = Frame(saves)
+        controls.grid(row=1, column=0)
+        search = StringVar(controls)
+        search_box = Entry(controls, textvariable=search, font='Times 14', width=24)
+        search_box.grid(row=0, column=0, padx=5)
+        search_box.bind('<Return>', lambda event: show_page(0))
+        Button(controls, text="Search", font='Times 12', command=lambda: show_page(0)).grid(row=0, column=1)
+        sort = StringVar(controls)
+        sort.set("recent")
+        sort_menu = OptionMenu(controls, sort, *SORTS, command=lambda choice: show_page(0))
+        sort_menu.grid(row=0, column=2, padx=5)
+        listing = Frame(saves, height=PAGE_SIZE * 110, width=600)
+        listing.grid(row=2, column=0)
+        listing.grid_propagate(0)
+        navigation = Frame(saves)
+        navigation.grid(row=3, column=0)
+        previous_button = Button(navigation, text="Previous", font='Times 16', state="disabled")
+        previous_button.grid(row=0, column=0)
+        page_label = Label(navigation, text="", font='Times 14', padx=10)
+        page_label.grid(row=0, column=1)
+        next_button = Button(navigation, text="Next", font='Times 16', state="disabled")
+        next_button.grid(row=0, column=2)
+        back_button = Button(navigation, text="Back", font='Times 16', anchor=N, command=back)
+        back_button.grid(row=0, column=3, padx=20)
+        show_page(0)
+
+    def _save_entry(self, parent, entry, load_menu, status, refresh):
+        """Builds the row of the load menu for one SaveEntry of the save catalog, clicking it loads the save.
+        refresh: function showing the current page again, called after the save was deleted"""
+        def delete():
+            if delete_button['text'] == "Delete":
+                delete_button['text'] = "Sure?"
+                return
+            self.saves.submit(partial(self.catalog.delete, entry.filename), on_done=lambda result: refresh())
+
+        savelabel = LabelFrame(parent, height=105, width=590, text=entry.name, cursor='hand1', font='Times 14')
+        savelabel.grid_propagate(0)
+        if entry.thumbnail is not None:
+            image = self._thumbnail_image(entry.thumbnail)
+            thumbnail = Label(savelabel, image=image)
+            thumbnail.image = image
+            thumbnail.grid(row=0, column=0, rowspan=2, padx=5)
+            thumbnail.bind('<Button-1>', partial(self.load_game, entry.filename, load_menu, status))
+        info = [f'Rows: {entry.rows}', f'Columns: {entry.cols}',
+                f'Difficulty: {entry.difficulty}', f'Category: {entry.category}',
+                f'Position: {entry.position}', f'Time: {entry.get_time()}']
+        for j in range(len(info)):
+            label = Label(savelabel, text=info[j], font='Times 12', anchor=W, padx=5, pady=5)
+            label.grid(row=j % 2, column=j // 2 + 1, sticky=W)
+            label.bind('<Button-1>', partial(self.load_game, entry.filename, load_menu, status))
+        delete_button = Button(savelabel, text="Delete", font='Times 10', command=delete)
+        delete_button.grid(row=0, column=4, rowspan=2, padx=5)
+        savelabel.bind('<Button-1>', partial(self.load_game, entry.filename, load_menu, status))
+        return savelabel
+
+    @staticmethod
+    def _thumbnail_image(thumbnail):
+        """Returns a PhotoImage of a Thumbnail of the save catalog, scaled up to about THUMBNAIL_PIXELS pixels."""
+        width = thumbnail.width
+        image = PhotoImage(width=width, height=thumbnail.height)
+        rows = []
+        for y in range(thumbnail.height):
+            row = thumbnail.pixels[y * width:(y + 1) * width]
+            rows.append("{" + " ".join(THUMBNAIL_COLORS[pixel] for pixel in row) + "}")
+        image.put(" ".join(rows))
+        scale = max(1, THUMBNAIL_PIXELS // max(thumbnail.width, thumbnail.height))
+        return image.zoom(scale)
 
     def start_game(self, new_game=False):
-        """Builds game screen and database of questions, switches to game screen, saves the current time for use in
-        tracking the play time.
+        """Builds game screen, starts fetching questions in the background, switches to game screen, saves the current
+        time for use in tracking the play time. Returns without waiting for the questions to download.
         new_game: boolean indicating if the game is being loaded from a save file or if it is a new game
         """
         if new_game:
-            self.maze.construct()
+            self.session.new_game()
+            self.save_file = None
             self.screen_switch(self.startmenu, self.gamescreen)
         for item in self.gamescreen.winfo_children():
             item.destroy()
         self._menu_init()
         self._movement_interface_init()
         size = self.maze.get_size()
-        self.display = Canvas(self.gamescreen, height=size[0] * 100, width=size[1] * 100, bg="gray")
-        self.drawer = Drawer(self.maze, self.display)
+        view = (min(size[0], VIEW_ROOMS[0]), min(size[1], VIEW_ROOMS[1]))
+        self.display = Canvas(self.gamescreen, height=view[0] * 100, width=view[1] * 100, bg="gray")
+        self.drawer = Drawer(self.maze, self.display, view=view)
+        self.hints = PathService(self.maze)
         self.drawer.draw()
         self.display.grid(row=0, column=0, columnspan=4)
-        self.db = SQLDatabase(self.maze.category, self.maze.difficulty, self.maze.get_total_doors())
-        self.db.build_database()
-        self.start_time = int(time.time())
+        self.display.bind('<MouseWheel>', lambda event: self.drawer.scroll(-1 if event.delta > 0 else 1, 0))
+        self.display.bind('<Shift-MouseWheel>', lambda event: self.drawer.scroll(0, -1 if event.delta > 0 else 1))
+        self.display.bind('<Button-4>', lambda event: self.drawer.scroll(-1, 0))
+        self.display.bind('<Button-5>', lambda event: self.drawer.scroll(1, 0))
+        self.session.prepare_questions()
+        self.session.start_clock()
 
     def screen_switch(self, curr_frame, new_frame):
         """Switches the main display from the current frame to the desired frame.
@@ -330,23 +462,30 @@ class MazeGUI:
         menubar = Menu(self.root)
         menubar.add_command(label="Help", command=display_help)
         savemenu = Menu(menubar, tearoff=0)
-        savemenu.add_command(label="Save 1", command=lambda: self.prompt("save_file_1", "save"))
-        savemenu.add_command(label="Save 2", command=lambda: self.prompt("save_file_2", "save"))
-        savemenu.add_command(label="Save 3", command=lambda: self.prompt("save_file_3", "save"))
+        savemenu.add_command(label="Save", command=lambda: self.prompt("save") if self.save_file else self.save_game())
+        savemenu.add_command(label="Save As New", command=lambda: self.save_game(new_file=True))
         menubar.add_cascade(label="Save", menu=savemenu)
-        loadmenu = Menu(menubar, tearoff=0)
-        loadmenu.add_command(label="Load 1", command=lambda: self.prompt("save_file_1", "load"))
-        loadmenu.add_command(label="Load 2", command=lambda: self.prompt("save_file_2", "load"))
-        loadmenu.add_command(label="Load 3", command=lambda: self.prompt("save_file_3", "load"))
-        menubar.add_cascade(label="Load", menu=loadmenu)
+        menubar.add_command(label="Load", command=lambda: self.prompt("load"))
+        menubar.add_command(label="Hint", command=self.toggle_hint)
+        menubar.add_command(label="Map", command=lambda: self.drawer.set_minimap(not self.drawer.minimap))
         menubar.add_command(label="Exit", command=lambda: confirm_exit(self.root))
         self.root.config(menu=menubar)
 
+    def toggle_hint(self):
+        """Shows or hides the shortest route from the player to the exit on the game display."""
+        if self.drawer.hint is None:
+            self.drawer.hint = self.hints
+        else:
+            self.drawer.hint = None
+        self.drawer.update()
+
     def _movement_interface_init(self):
         """Creates the interface allowing player movement, binds arrow keys to different movements."""
         self.text_display = Frame(self.gamescreen, height=200, width=600, borderwidth=1)
         self.text_display.grid_propagate(0)
         self.text_display.grid(row=1, column=0)
+        self.save_status = Label(self.gamescreen, text="", font='Times 12', anchor=W)
+        self.save_status.grid(row=2, column=0, sticky=W)
         movementframe = Frame(self.gamescreen)
         self.north = Button(movementframe, text="North", command=lambda: self.display_question("north"), pady=5)
         self.north.grid(row=1, column=2, columnspan=2)
@@ -381,21 +520,16 @@ class MazeGUI:
             else:
                 buttons[i]['state'] = "disabled"
 
-    def _move_player(self, direction, event=None, correct=True):
-        """Moves the player if correct. If incorrect, then the corresponding door is locked. In both cases the game
-        display is redrawn, the movement buttons are reset and any text that is in the text display is deleted.
-        direction: string representing the direction the player is moving
-        correct: boolean indicating if the player correctly answered the trivia question"""
-        pygame.mixer.init()
-        if correct:
-            self.maze.move_player(direction)
-            walk_sound = pygame.mixer.Sound('sfx/walk.wav')
-            pygame.mixer.Sound.play(walk_sound)
+    def _move_player(self, answer, event=None):
+        """Passes the chosen answer to the game session, which moves the player if it is correct and locks the
+        corresponding door if it is not. In both cases the game display is redrawn, the movement buttons are reset and
+        any text that is in the text display is deleted.
+        answer: text of the answer the player chose"""
+        if self.session.answer(answer):
+            self.sounds.play("walk")
         else:
-            self.maze.lock_door(direction)
-            door_lock_sound = pygame.mixer.Sound('sfx/door_lock.wav')
-            pygame.mixer.Sound.play(door_lock_sound)
-        self.drawer.draw()
+            self.sounds.play("door_lock")
+        self.drawer.update()
         self._set_move_button_state()
         self.clear_text_display()
         self.check_end_game()
@@ -406,15 +540,14 @@ class MazeGUI:
         def close(window):
             window.destroy()
 
-        if self.maze.player_wins():
+        status = self.session.status()
+        if status == WON:
             text = Label(self.text_display, text=f'Congrats, you have won the game!', font="Times 26", padx=20, pady=10)
-            game_win_sound = pygame.mixer.Sound('sfx/game_win.wav')
-            pygame.mixer.Sound.play(game_win_sound)
-        elif not self.maze.is_completable():
+            self.sounds.play("game_win")
+        elif status == LOST:
             text = Label(self.text_display, text=f'Game Over\nYou can no longer reach the exit.', font="Times 26",
                          padx=20)
-            game_lose_sound = pygame.mixer.Sound('sfx/game_lose.wav')
-            pygame.mixer.Sound.play(game_lose_sound)
+            self.sounds.play("game_lose")
         else:
             return
         text.grid(row=0, column=0, columnspan=4)
@@ -426,8 +559,9 @@ class MazeGUI:
         exit_button.grid(row=1, column=2)
 
     def display_question(self, direction):
-        """If a question is currently being displayed, pass. If the room that the player is moving too has already been
-        visited, then move the player. Otherwise, pull a question from the database, and display it in the text display.
+        """If a question is currently being displayed, pass. Otherwise asks the game session to move the player. If the
+        room had already been visited, the player is moved, otherwise the session draws a question from the database
+        and it is displayed in the text display.
         direction: string representing the direction that the player is attempting to move in
         """
         def highlight_selection(i, event=None):
@@ -438,34 +572,30 @@ class MazeGUI:
 
         if self.text_display.winfo_children():
             return
-        destination = self.maze.find_destination(self.maze.player_location[0], self.maze.player_location[1], direction)
-        if destination in self.maze.visited_rooms:
-            self.maze.move_player(direction)
-            self.drawer.draw()
+        result = self.session.request_move(direction)
+        if result == MOVED:
+            self.drawer.update()
             self._set_move_button_state()
-            walk_short_sound = pygame.mixer.Sound('sfx/walk_short.wav')
-            pygame.mixer.Sound.play(walk_short_sound)
-        else:
-            question = self.db.get_random_question()
-            question_text = Label(self.text_display, text=f'{question[1]}', font="Times 16",
+            self.sounds.play("walk_short")
+        elif result == QUESTION:
+            question = self.session.question
+            question_text = Label(self.text_display, text=question.text, font="Times 16",
                                   justify="left", wraplength=600, anchor=W, width=600)
             question_text.grid(row=0, column=0)
             answer_list = []
-            answer_count = len(question)
-            positions = [*range(1, answer_count + 1)]
-            random.shuffle(positions)
-            for i in range(2, answer_count):
-                if not question[i]:
-                    return
-                answer = Label(self.text_display, text=f'\t{question[i]}', font="Times 14", anchor=W)
-                answer.grid(row=positions.pop() + 1, column=0, sticky=E + W)
-                answer.bind('<Enter>', partial(highlight_selection, i - 2))
-                answer.bind('<Leave>', partial(unhighlight_selection, i - 2))
-                answer.bind('<Button-1>', partial(self._move_player, direction, correct=(i == 2)))
+            answers = list(question.answers)
+            random.shuffle(answers)
+            for i, answer_text in enumerate(answers):
+                answer = Label(self.text_display, text=f'\t{answer_text}', font="Times 14", anchor=W)
+                answer.grid(row=i + 2, column=0, sticky=E + W)
+                answer.bind('<Enter>', partial(highlight_selection, i))
+                answer.bind('<Leave>', partial(unhighlight_selection, i))
+                answer.bind('<Button-1>', partial(self._move_player, answer_text))
                 answer_list.append(answer)
 
     def clear_text_display(self):
-        """Clears items in the text display."""
+        """Clears items in the text display. A question that was being displayed is dropped from the game session."""
+        self.session.cancel_question()
         for item in self.text_display.winfo_children():
             item.destroy()
 
@@ -0,0 +1,57 @@
+"""
+Micro-benchmark for the adjacency index. Times Maze.check_direction against the previous implementation, which built
+its lookup dictionaries and looked up the doors of both rooms on every call, and times a full traversal of the maze.
+
+Run from the repository root:
+    python -m benchmarks.adjacency [rows] [cols]
+"""
+import sys
+import timeit
+
+from maze import Maze
+
+
+def legacy_check_direction(maze, row, col, direction):
+    """check_direction as it was before the adjacency index was added."""
+    opposite = {"north": "south", "south": "north", "west": "east", "east": "west"}
+    translation = {"north": [-1, 0], "south": [1, 0], "east": [0, 1], "west": [0, -1]}
+    dest_row = row + translation[direction][0]
+    dest_col = col + translation[direction][1]
+    if 0 <= dest_row < maze.rows and 0 <= dest_col < maze.cols:
+        doors1 = maze.get_room(row, col).doors()
+        doors2 = maze.get_room(dest_row, dest_col).doors()
+        if doors1[direction] and doors2[opposite[direction]]:
+            return True
+    return False
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    cols = int(sys.argv[2]) if len(sys.argv) > 2 else rows
+    directions = ["north", "south", "east", "west"]
+    cells = [(row, col) for row in range(rows) for col in range(cols)]
+    print(f'{rows}x{cols} maze, {len(cells) * 4} door checks per pass')
+    for compact in [False, True]:
+        maze = Maze(rows, cols, compact=compact)
+        maze.construct()
+
+        def legacy():
+            for row, col in cells:
+                for direction in directions:
+                    legacy_check_direction(maze, row, col, direction)
+
+        def indexed():
+            for row, col in cells:
+                for direction in directions:
+                    maze.check_direction(row, col, direction)
+
+        backend = "compact" if compact else "rooms"
+        for name, func in [("legacy", legacy), ("indexed", indexed)]:
+            best = min(timeit.repeat(func, number=1, repeat=5))
+            print(f'{backend:>8} {name:>8}: {best * 1e9 / (len(cells) * 4):8.1f} ns per check')
+        best = min(timeit.repeat(lambda: maze.check_traversal(0, 0), number=1, repeat=5))
+        print(f'{backend:>8} traverse: {best * 1e3:8.1f} ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,35 @@
+"""
+Times each maze generation algorithm, and a full compact Maze construction with the fastest one. Each algorithm is
+shown with its entry in maze_generator.ROOM_LIMITS, the number of rooms it is expected to generate in about two
+seconds; generate warns above it, the warning is silenced here and the time marked instead.
+
+Run from the repository root:
+    python -m benchmarks.generation [rows] [cols]
+"""
+import sys
+import time
+import warnings
+
+from maze import Maze
+from maze_generator import generate, ALGORITHMS, ROOM_LIMITS, SlowGenerationWarning
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    cols = int(sys.argv[2]) if len(sys.argv) > 2 else rows
+    print(f'{rows}x{cols} maze')
+    warnings.simplefilter("ignore", SlowGenerationWarning)
+    for algorithm in ALGORITHMS:
+        start = time.perf_counter()
+        generate(rows, cols, algorithm, seed=1)
+        over = " over the limit" if rows * cols > ROOM_LIMITS[algorithm] else ""
+        print(f'{algorithm:>12}: {time.perf_counter() - start:7.2f} s (limit {ROOM_LIMITS[algorithm]} rooms{over})')
+    maze = Maze(rows, cols, compact=True)
+    maze.set_layout("backtracker", seed=1)
+    start = time.perf_counter()
+    maze.construct()
+    print(f'   construct: {time.perf_counter() - start:7.2f} s (backtracker, compact grid)')
+
+
+if __name__ == '__main__':
+    main()
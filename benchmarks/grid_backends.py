@@ -0,0 +1,43 @@
+"""
+Compares construction time and memory use of the Room based grid and the CompactGrid backend. Each backend is built in
+its own process so that the peak resident set size reported for one does not include the other.
+
+Run from the repository root:
+    python -m benchmarks.grid_backends [rows] [cols]
+"""
+import resource
+import subprocess
+import sys
+import time
+
+from maze import Maze
+
+
+def measure(compact, rows, cols):
+    """Builds a maze with the given backend, returns the construction time in seconds and the peak RSS in MB."""
+    baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    maze = Maze(rows, cols, compact=compact)
+    maze.construct()
+    elapsed = time.perf_counter() - start
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return elapsed, (peak - baseline) / 1024
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    cols = int(sys.argv[2]) if len(sys.argv) > 2 else rows
+    print(f'{rows}x{cols} maze')
+    for backend in ["rooms", "compact"]:
+        output = subprocess.run([sys.executable, "-m", "benchmarks.grid_backends", "--child", backend,
+                                 str(rows), str(cols)], capture_output=True, text=True, check=True).stdout
+        elapsed, rss = output.split()
+        print(f'{backend:>8}: construct {float(elapsed):8.3f} s   RSS growth {float(rss):9.1f} MB')
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1] == "--child":
+        result = measure(sys.argv[2] == "compact", int(sys.argv[3]), int(sys.argv[4]))
+        print(*result)
+    else:
+        main()
@@ -0,0 +1,49 @@
+"""
+Compares opening and drawing from a large pool of offline questions stored as an SQLite file, through the
+QuestionSampler, and as a question pack, plain and compressed.
+
+Run from the repository root:
+    python -m benchmarks.question_pack [question count] [draws]
+"""
+import os
+import sys
+import tempfile
+import time
+
+from benchmarks.question_sampling import build
+from pack_tools import export_pack
+from question_pack import QuestionPack
+from question_sampler import QuestionSampler
+
+
+def measure(name, open_source, draws):
+    start = time.perf_counter()
+    source = open_source()
+    opened = time.perf_counter() - start
+    start = time.perf_counter()
+    for _ in range(draws):
+        source.draw()
+    print(f'{name:>16}: opened in {opened * 1e3:8.2f} ms, {(time.perf_counter() - start) / draws * 1e6:7.1f} us '
+          f'per question')
+    source.close()
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    draws = int(sys.argv[2]) if len(sys.argv) > 2 else 10000
+    with tempfile.TemporaryDirectory() as folder:
+        database_file = os.path.join(folder, "questions.db")
+        build(database_file, count)
+        print(f'{count} questions, {draws} draws')
+        measure("SQLite sampler", lambda: QuestionSampler(database_file), draws)
+        for compress in [False, True]:
+            pack_file = os.path.join(folder, f'questions-{compress}.tmqp')
+            export_pack(database_file, pack_file, compress=compress)
+            name = "compressed pack" if compress else "pack"
+            print(f'{name:>16}: {os.path.getsize(pack_file) / 1e6:.1f} MB, SQLite file '
+                  f'{os.path.getsize(database_file) / 1e6:.1f} MB')
+            measure(name, lambda: QuestionPack(pack_file), draws)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,59 @@
+"""
+Compares drawing random questions the old way, a new connection and ORDER BY RANDOM() LIMIT 1 per question, with the
+QuestionSampler, in both modes, on a questions table filled with generated questions.
+
+Run from the repository root:
+    python -m benchmarks.question_sampling [question count] [draws]
+"""
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+from question_sampler import QuestionSampler
+
+
+def build(database_file, count):
+    conn = sqlite3.connect(database_file)
+    conn.execute("""CREATE TABLE questions (type text, question text, correct_answer text, incorrect1 text,
+                    incorrect2 text, incorrect3 text);""")
+    conn.executemany("INSERT INTO questions Values (?,?,?,?,?,?)",
+                     (("multiple", f'Question {i}?', "right", "wrong 1", "wrong 2", "wrong 3") for i in range(count)))
+    conn.commit()
+    conn.close()
+
+
+def order_by_random(database_file):
+    conn = sqlite3.connect(database_file)
+    row = conn.execute("SELECT * FROM questions ORDER BY RANDOM() LIMIT 1;").fetchone()
+    conn.close()
+    return row
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    draws = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    with tempfile.TemporaryDirectory() as folder:
+        database_file = os.path.join(folder, "questions.db")
+        build(database_file, count)
+        print(f'{count} questions, {draws} draws')
+        start = time.perf_counter()
+        for _ in range(draws):
+            order_by_random(database_file)
+        print(f'ORDER BY RANDOM(): {(time.perf_counter() - start) / draws * 1e6:10.1f} us per question')
+        for no_repeat in [False, True]:
+            start = time.perf_counter()
+            sampler = QuestionSampler(database_file, no_repeat=no_repeat)
+            opened = time.perf_counter() - start
+            start = time.perf_counter()
+            for _ in range(draws):
+                sampler.draw()
+            name = "sampler, no repeat" if no_repeat else "sampler"
+            print(f'{name:>18}: {(time.perf_counter() - start) / draws * 1e6:10.1f} us per question '
+                  f'(opened in {opened * 1e3:.1f} ms)')
+            sampler.close()
+
+
+if __name__ == '__main__':
+    main()
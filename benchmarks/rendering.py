@@ -0,0 +1,138 @@
+"""
+Compares redrawing the game display after every move with a full Drawer.draw of the whole maze, which recreates every
+canvas item, with Drawer.update, which only touches the rooms the move changed, and with both inside a viewport of
+8x10 rooms as used by the game, where draw only runs when the viewport scrolls. Also times drawing the minimap of the
+whole maze. Uses a stub canvas that only keeps track of its items, so the numbers are the cost of the drawing code and
+the number of canvas calls, without Tk.
+
+Run from the repository root:
+    python -m benchmarks.rendering [moves]
+"""
+import random
+import sys
+import time
+
+from MazeDrawer import Drawer
+from maze import Maze
+
+
+class StubCanvas:
+    """Stands in for a tkinter Canvas, keeping each item's kind, coordinates and tags and counting calls."""
+    def __init__(self):
+        self.items = {}
+        self.tagged = {}
+        self.calls = 0
+        self._next = 1
+
+    def _create(self, kind, coords, options):
+        self.calls += 1
+        item = self._next
+        self._next += 1
+        tags = options.pop("tags", ())
+        tags = (tags,) if isinstance(tags, str) else tuple(tags)
+        self.items[item] = (kind, tuple(coords), tags,
+                            tuple(sorted((key, str(value)) for key, value in options.items() if key != "image")))
+        for tag in tags:
+            self.tagged.setdefault(tag, set()).add(item)
+        return item
+
+    def create_rectangle(self, *coords, **options):
+        return self._create("rectangle", coords, options)
+
+    def create_image(self, *coords, **options):
+        return self._create("image", coords, options)
+
+    def create_line(self, *coords, **options):
+        return self._create("line", coords, options)
+
+    def coords(self, item, *coords):
+        self.calls += 1
+        kind, _, tags, options = self.items[item]
+        self.items[item] = (kind, tuple(coords), tags, options)
+
+    def delete(self, tag):
+        self.calls += 1
+        if tag == "all":
+            self.items.clear()
+            self.tagged.clear()
+            return
+        for item in [tag] if isinstance(tag, int) else list(self.tagged.get(tag, ())):
+            if item in self.items:
+                for item_tag in self.items.pop(item)[2]:
+                    self.tagged[item_tag].discard(item)
+
+    def find_withtag(self, tag):
+        return tuple(self.tagged.get(tag, ()))
+
+    def tag_raise(self, *args):
+        self.calls += 1
+
+    def tag_lower(self, *args):
+        self.calls += 1
+
+
+def play(size, moves, incremental, view=None, seed=0):
+    """Makes random moves on a size x size maze, locking a door instead of moving one time in ten, redrawing after
+    each one, until moves were made or the player is shut in. Returns the seconds spent redrawing and the canvas calls
+    per move."""
+    rng = random.Random(seed)
+    maze = Maze(size, size, compact=True)
+    maze.construct()
+    canvas = StubCanvas()
+    drawer = Drawer(maze, canvas, player_image="player", exit_image="exit", view=view)
+    drawer.draw()
+    canvas.calls = 0
+    made = 0
+    elapsed = 0.0
+    for _ in range(moves):
+        row, col = maze.player_location[0], maze.player_location[1]
+        directions = [direction for direction in ["north", "south", "east", "west"]
+                      if maze.check_direction(row, col, direction)]
+        if not directions:
+            break
+        direction = rng.choice(directions)
+        if rng.random() < 0.1 and len(directions) > 1:
+            maze.lock_door(direction)
+        else:
+            maze.move_player(direction)
+        start = time.perf_counter()
+        if incremental:
+            drawer.update()
+        else:
+            drawer.draw()
+        elapsed += time.perf_counter() - start
+        made += 1
+    return elapsed / made, canvas.calls / made
+
+
+def minimap(size):
+    """Returns the seconds taken to draw the minimap of a size x size maze with a walk across it visited."""
+    maze = Maze(size, size, compact=True)
+    maze.construct()
+    for _ in range(size - 2):
+        maze.move_player("east")
+    drawer = Drawer(maze, StubCanvas(), player_image="player", exit_image="exit", view=(8, 10))
+    drawer.minimap = True
+    start = time.perf_counter()
+    drawer.draw()
+    return time.perf_counter() - start
+
+
+def main():
+    moves = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    print(f'{"size":>9} {"draw":>12} {"calls":>8} {"update":>12} {"calls":>8} {"viewport":>12} {"calls":>8} '
+          f'{"minimap":>12}')
+    for size in [5, 10, 20, 40, 80, 160, 400]:
+        if size <= 80:
+            full, full_calls = play(size, moves, False)
+            incremental, incremental_calls = play(size, moves, True)
+            whole = f'{full * 1e3:>9.3f} ms {full_calls:>8.1f} {incremental * 1e3:>9.3f} ms {incremental_calls:>8.1f}'
+        else:
+            whole = f'{"-":>12} {"-":>8} {"-":>12} {"-":>8}'
+        viewport, viewport_calls = play(size, moves, True, view=(8, 10))
+        print(f'{size:>4}x{size:<4} {whole} {viewport * 1e3:>9.3f} ms {viewport_calls:>8.1f} '
+              f'{minimap(size) * 1e3:>9.3f} ms')
+
+
+if __name__ == '__main__':
+    main()
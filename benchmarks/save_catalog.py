@@ -0,0 +1,54 @@
+"""
+Times opening the load screen with many saves: reading the header of every save file, as a listing without a catalog
+has to, against reading one page of the save catalog for each sort order, a search and a page deep into the list.
+
+Run from the repository root:
+    python -m benchmarks.save_catalog [saves]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+
+from maze import Maze
+from save_catalog import SaveCatalog, SORTS, PAGE_SIZE, make_thumbnail
+from save_format import write_save, read_header
+
+
+def timed(function):
+    start = time.perf_counter()
+    function()
+    return (time.perf_counter() - start) * 1e3
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    rng = random.Random(1)
+    with tempfile.TemporaryDirectory() as folder:
+        catalog = SaveCatalog(folder)
+        maze = Maze(20, 20, compact=True)
+        maze.construct()
+        filenames = []
+        start = time.perf_counter()
+        for i in range(count):
+            filename = catalog.new_filename()
+            write_save(filename, maze)
+            filenames.append(filename)
+            catalog.record(filename, rng.randrange(4, 500), rng.randrange(4, 500), rng.choice(["easy", "hard"]),
+                           rng.choice([None, "Science: Computers", "History"]), [1, 1], rng.randrange(10000),
+                           thumbnail=make_thumbnail(20, 20, maze._visited, [1, 1]), name=f'Game {i}',
+                           saved_at=rng.random() * 1e9)
+        print(f'{count} saves written in {time.perf_counter() - start:.1f} s')
+        print(f'reading every header: {timed(lambda: [read_header(filename) for filename in filenames]):8.1f} ms')
+        for sort in SORTS:
+            print(f'first page, {sort:>6}: {timed(lambda: catalog.page(0, PAGE_SIZE, sort)):8.2f} ms')
+        print(f'search "comp":        {timed(lambda: catalog.page(0, PAGE_SIZE, search="comp")):8.2f} ms')
+        middle = count // PAGE_SIZE // 2
+        print(f'page {middle} of {count // PAGE_SIZE}:   {timed(lambda: catalog.page(middle)):8.2f} ms')
+        catalog.close()
+        print(f'catalog size: {os.path.getsize(os.path.join(folder, "catalog.db")) / 1024:.0f} kB')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+"""
+Compares pickling a maze, as save files used to, with the save format of save_format: the time to write and read a
+whole save, the size of the file and the time to read what the load menu shows, a full unpickle for a pickle save
+and only the header for a save file. Then compares saving after every move by writing a snapshot each time with
+saving through a SaveJournal, which only appends the moves made since the last save.
+
+Run from the repository root:
+    python -m benchmarks.saves [size]
+"""
+import os
+import pickle
+import sys
+import tempfile
+import time
+
+from maze import Maze
+from save_format import write_save, read_save, read_header, SaveJournal
+
+
+def timed(function):
+    start = time.perf_counter()
+    function()
+    return (time.perf_counter() - start) * 1e3
+
+
+def autosave(size, moves):
+    """Saves a compact maze after each of moves moves, returns the average time per save in ms for snapshots and for
+    the journal, and the time to load the journaled save."""
+    results = []
+    with tempfile.TemporaryDirectory() as folder:
+        filename = os.path.join(folder, "save.tmsave")
+        for journaled in [False, True]:
+            maze = Maze(size, size, compact=True)
+            maze.set_layout("kruskal", seed=1)
+            maze.construct()
+            journal = SaveJournal(filename)
+            total = 0.0
+            for _ in range(moves):
+                row, col = maze.player_location
+                for direction in ["east", "south", "west", "north"]:
+                    if maze.check_direction(row, col, direction):
+                        maze.move_player(direction)
+                        break
+                total += timed(lambda: journal.save(maze) if journaled else write_save(filename, maze))
+            results.append(total / moves)
+        results.append(timed(lambda: read_save(filename)))
+    return results
+
+
+def main():
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+    print(f'{"maze":>22} {"format":>8} {"write":>10} {"read":>10} {"menu":>10} {"file":>10}')
+    for compact in [False, True]:
+        maze = Maze(size, size, compact=compact)
+        maze.set_layout("kruskal", seed=1)
+        maze.construct()
+        for direction in ["east", "south"] * (size // 2):
+            if maze.check_direction(maze.player_location[0], maze.player_location[1], direction):
+                maze.move_player(direction)
+            else:
+                maze.lock_door(direction)
+        name = f'{size}x{size} {"compact" if compact else "rooms"}'
+        with tempfile.TemporaryDirectory() as folder:
+            pickle_file = os.path.join(folder, "save.pkl")
+            save_file = os.path.join(folder, "save.tmsave")
+
+            def write_pickle():
+                with open(pickle_file, 'wb') as handle:
+                    pickle.dump(maze, handle)
+
+            def read_pickle():
+                with open(pickle_file, 'rb') as handle:
+                    pickle.load(handle)
+
+            results = [("pickle", timed(write_pickle), timed(read_pickle), timed(read_pickle), pickle_file),
+                       ("save", timed(lambda: write_save(save_file, maze)), timed(lambda: read_save(save_file)),
+                        timed(lambda: read_header(save_file)), save_file)]
+            for label, write, read, menu, path in results:
+                print(f'{name:>22} {label:>8} {write:>7.1f} ms {read:>7.1f} ms {menu:>7.2f} ms '
+                      f'{os.path.getsize(path) / 1024:>7.0f} kB')
+    snapshot, journaled, load = autosave(size, 1000)
+    print(f'autosave after each of 1000 moves, {size}x{size} compact: snapshot {snapshot:.2f} ms, '
+          f'journal {journaled:.3f} ms per save, journaled save loads in {load:.1f} ms')
+
+
+if __name__ == '__main__':
+    main()
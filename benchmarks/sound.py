@@ -0,0 +1,39 @@
+"""
+Compares playing a sound effect the old way, initialising the mixer and decoding the WAV file on every event, with the
+SoundBank, which decodes every sound once and plays it on its reserved channel. Uses SDL's dummy audio driver unless
+SDL_AUDIODRIVER is set, so it runs without an audio device.
+
+Run from the repository root:
+    python -m benchmarks.sound [plays]
+"""
+import os
+import sys
+import time
+
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import pygame  # noqa: E402
+
+from sound_bank import SoundBank, SFX_FOLDER  # noqa: E402
+
+
+def main():
+    plays = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    names = ["walk_short", "walk", "door_lock", "save_tone", "load_tone", "game_win", "game_lose"]
+    pygame.mixer.init()
+    print(f'{"sound":>12} {"per event":>12} {"bank":>12}')
+    sounds = SoundBank()
+    for name in names:
+        start = time.perf_counter()
+        for _ in range(plays):
+            pygame.mixer.init()
+            pygame.mixer.Sound.play(pygame.mixer.Sound(os.path.join(SFX_FOLDER, name + ".wav")))
+        old = (time.perf_counter() - start) / plays
+        for _ in range(plays):
+            sounds.play(name)
+        print(f'{name:>12} {old * 1e6:>9.1f} us {sounds.latency()[name]["average"] * 1e6:>9.1f} us')
+    print(f'bank loaded in {sounds.load_seconds * 1e3:.1f} ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,128 @@
+from collections.abc import MutableMapping
+
+DOOR_BITS = {"north": 1, "south": 2, "east": 4, "west": 8}
+ALL_DOORS = 15
+ANSWER_SHIFTS = {"north": 0, "south": 2, "east": 4, "west": 6}
+ANSWER_STATES = ['not set', 'correct', 'wrong']
+
+
+class CompactGrid:
+    """
+    Grid backend that stores the rooms of a maze in two flat bytearrays instead of one Room object per room. Each room
+    uses one byte of door flags (see DOOR_BITS, a set bit is an open door) and one byte of answer states, two bits per
+    direction indexing into ANSWER_STATES. Rooms are indexed by row * cols + col. Indexing the grid as grid[row][col]
+    returns a RoomView, so code written against lists of Room objects keeps working.
+    """
+    def __init__(self, rows, cols):
+        self.rows = rows
+        self.cols = cols
+        self.doors = bytearray([ALL_DOORS]) * (rows * cols)
+        self.answers = bytearray(rows * cols)
+
+    def __len__(self):
+        return self.rows
+
+    def __getitem__(self, row):
+        if row < 0:
+            row += self.rows
+        if not 0 <= row < self.rows:
+            raise IndexError("grid row out of range")
+        return GridRow(self, row)
+
+    def __iter__(self):
+        for row in range(self.rows):
+            yield GridRow(self, row)
+
+
+class GridRow:
+    """A single row of a CompactGrid, supports indexing and iteration like a list of rooms."""
+    __slots__ = ('_grid', '_row')
+
+    def __init__(self, grid, row):
+        self._grid = grid
+        self._row = row
+
+    def __len__(self):
+        return self._grid.cols
+
+    def __getitem__(self, col):
+        cols = self._grid.cols
+        if col < 0:
+            col += cols
+        if not 0 <= col < cols:
+            raise IndexError("grid column out of range")
+        return RoomView(self._grid, self._row, col)
+
+    def __iter__(self):
+        for col in range(self._grid.cols):
+            yield RoomView(self._grid, self._row, col)
+
+
+class RoomView:
+    """
+    Lightweight stand in for a Room that reads and writes the door and answer state of one room in a CompactGrid.
+    Views are created on demand, two views of the same room compare equal. The dictionary returned by doors() is a
+    copy, doors should be changed through lock_door.
+    """
+    __slots__ = ('_grid', '_index', '_position')
+
+    def __init__(self, grid, row, col):
+        self._grid = grid
+        self._index = row * grid.cols + col
+        self._position = [row, col]
+
+    def __eq__(self, other):
+        if not isinstance(other, RoomView):
+            return NotImplemented
+        return self._grid is other._grid and self._index == other._index
+
+    def __hash__(self):
+        return hash(self._index)
+
+    def doors(self):
+        flags = self._grid.doors[self._index]
+        return {direction: bool(flags & bit) for direction, bit in DOOR_BITS.items()}
+
+    def lock_door(self, direction):
+        self._grid.doors[self._index] &= ~DOOR_BITS[direction.lower()]
+
+    def game_over(self):
+        for direction, state in self.answers.items():
+            if state == 'wrong':
+                self.lock_door(direction)
+        return not self._grid.doors[self._index]
+
+    @property
+    def answers(self):
+        return AnswerView(self._grid, self._index)
+
+    @property
+    def position(self):
+        return self._position
+
+
+class AnswerView(MutableMapping):
+    """Dictionary style access to the answer states of one room in a CompactGrid."""
+    __slots__ = ('_grid', '_index')
+
+    def __init__(self, grid, index):
+        self._grid = grid
+        self._index = index
+
+    def __getitem__(self, direction):
+        packed = self._grid.answers[self._index]
+        return ANSWER_STATES[(packed >> ANSWER_SHIFTS[direction]) & 3]
+
+    def __setitem__(self, direction, state):
+        shift = ANSWER_SHIFTS[direction]
+        packed = self._grid.answers[self._index] & ~(3 << shift)
+        self._grid.answers[self._index] = packed | (ANSWER_STATES.index(state) << shift)
+
+    def __delitem__(self, direction):
+        raise TypeError("answer directions cannot be removed")
+
+    def __iter__(self):
+        return iter(ANSWER_SHIFTS)
+
+    def __len__(self):
+        return len(ANSWER_SHIFTS)
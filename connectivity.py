@@ -0,0 +1,179 @@
+from collections import deque
+from itertools import chain
+from array import array
+from compact_grid import DOOR_BITS
+
+POPCOUNT = bytes(bin(flags).count("1") for flags in range(256))
+
+
+class ConnectivityTracker:
+    """
+    Keeps track of which rooms of a maze can reach each other as doors get locked. Since doors are only ever closed,
+    a locked door can only split a component in two.
+    When the open doors form a forest, as in every maze generated with a layout, every open door is a bridge, so a lock
+    always splits its component and no search is needed to tell. The rooms are then numbered in depth first order from
+    the root of each tree, the exit for the tree holding it, so the rooms below any door are one range of numbers and
+    a lock only clears that range in the bytearray of rooms still connected to their root, a single slice assignment.
+    Locks and the check whether a room can reach the exit are O(1) in Python operations. Pairs of rooms that were both
+    cut off from their root are checked with a search.
+    Otherwise every room is given a component label, two rooms are connected when their labels match, so connection
+    checks are a single comparison. When a lock splits a component only the smaller half is relabeled, so the locks
+    that split components cost O(n log n) in total over a game, but a lock that leaves its component connected can
+    still search O(n) rooms to find the way around the door.
+    """
+    def __init__(self, maze):
+        self.maze = maze
+        size = maze.rows * maze.cols
+        self.labels = array('l', [-1]) * size
+        self._next_label = 0
+        self.order = self.last = self.rooted = None
+        edges = sum(maze.adjacency.translate(POPCOUNT)) // 2
+        if edges < size:
+            trees = self._number_trees()
+            if edges == size - trees:
+                return
+            self.order = self.last = self.rooted = None
+            self.labels = array('l', [-1]) * size
+            self._next_label = 0
+        for cell in range(size):
+            if self.labels[cell] == -1:
+                self._label(self._flood(cell), self._new_label())
+
+    @property
+    def forest(self):
+        """True if the open doors form a forest, which is then tracked with the depth first numbering."""
+        return self.order is not None
+
+    def connected(self, row1, col1, row2, col2):
+        """Returns True if the room at row1, col1 can reach the room at row2, col2 through open doors."""
+        cols = self.maze.cols
+        first, second = row1 * cols + col1, row2 * cols + col2
+        if self.labels[first] != self.labels[second]:
+            return False
+        if self.order is None:
+            return True
+        rooted = self.rooted[self.order[first]], self.rooted[self.order[second]]
+        if rooted[0] or rooted[1]:
+            return bool(rooted[0] and rooted[1])
+        search = self._search(first, second)
+        while True:
+            try:
+                next(search)
+            except StopIteration as finished:
+                return finished.value is None
+
+    def remove_door(self, row, col, direction):
+        """
+        Updates the components after the door in the given direction of the room at row, col was closed. In a forest
+        the rooms below the door lose their way to the root. Otherwise searches outwards from both sides of the door
+        one room at a time. If one search reaches the other side the rooms are still connected, if one search runs out
+        of rooms first, the rooms it found are split off into a new component.
+        """
+        destination = self.maze.find_destination(row, col, direction)
+        if destination is None:
+            return
+        cols = self.maze.cols
+        start = row * cols + col
+        other = destination.position[0] * cols + destination.position[1]
+        if self.labels[start] != self.labels[other]:
+            return
+        if self.order is not None:
+            below = start if self.order[start] > self.order[other] else other
+            first, end = self.order[below], self.last[below]
+            self.rooted[first:end] = bytes(end - first)
+            return
+        searches = [self._search(start, other), self._search(other, start)]
+        while True:
+            for search in searches:
+                try:
+                    next(search)
+                except StopIteration as finished:
+                    if finished.value is not None:
+                        self._label(finished.value, self._new_label())
+                    return
+
+    def _number_trees(self):
+        """
+        Labels the components and numbers the rooms of each in depth first order, starting with the component holding
+        the exit. order holds the number of each room and last the number after the last room below it, so the rooms
+        below a room are numbered order[cell] to last[cell] - 1 when the open doors form a forest. rooted is indexed by
+        those numbers and starts out all set. Returns the number of components.
+        """
+        maze = self.maze
+        size = len(self.labels)
+        labels = self.labels
+        self.order = order = array('l', [-1]) * size
+        self.last = last = array('l', [0]) * size
+        self.rooted = bytearray(b'\x01' * size)
+        count = 0
+        neighbours = self._neighbours
+        for root in chain([maze.exit.position[0] * maze.cols + maze.exit.position[1]], range(size)):
+            if labels[root] != -1:
+                continue
+            label = self._new_label()
+            stack = [root]
+            while stack:
+                cell = stack.pop()
+                if cell < 0:
+                    last[~cell] = count
+                    continue
+                labels[cell] = label
+                order[cell] = count
+                count += 1
+                stack.append(~cell)
+                for neighbour in neighbours(cell):
+                    if labels[neighbour] == -1:
+                        stack.append(neighbour)
+                        labels[neighbour] = -2
+        return self._next_label
+
+    def _search(self, start, goal):
+        """
+        Generator that explores one room of a breadth first search from start each time it is advanced. Finishes with
+        None if goal was reached, otherwise with the set of rooms that can be reached from start.
+        """
+        seen = {start}
+        queue = deque([start])
+        while queue:
+            for neighbour in self._neighbours(queue.popleft()):
+                if neighbour == goal:
+                    return None
+                if neighbour not in seen:
+                    seen.add(neighbour)
+                    queue.append(neighbour)
+            yield
+        return seen
+
+    def _flood(self, start):
+        """Returns the list of rooms that can be reached from start."""
+        found = [start]
+        self.labels[start] = -2
+        for cell in found:
+            for neighbour in self._neighbours(cell):
+                if self.labels[neighbour] == -1:
+                    self.labels[neighbour] = -2
+                    found.append(neighbour)
+        return found
+
+    def _neighbours(self, cell):
+        """Yields the index of every room that can be entered from the room with the given index."""
+        cols = self.maze.cols
+        flags = self.maze.adjacency[cell]
+        if flags & DOOR_BITS["north"]:
+            yield cell - cols
+        if flags & DOOR_BITS["south"]:
+            yield cell + cols
+        if flags & DOOR_BITS["east"]:
+            yield cell + 1
+        if flags & DOOR_BITS["west"]:
+            yield cell - 1
+
+    def _new_label(self):
+        label = self._next_label
+        self._next_label += 1
+        return label
+
+    def _label(self, cells, label):
+        labels = self.labels
+        for cell in cells:
+            labels[cell] = label
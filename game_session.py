@@ -0,0 +1,144 @@
+import time
+from functools import partial
+from maze import Maze
+from question_database import SQLDatabase, offline_questions
+from question_prefetch import QuestionPrefetcher
+from save_format import SaveJournal, read_save
+
+MOVED = "moved"
+QUESTION = "question"
+BLOCKED = "blocked"
+BUSY = "busy"
+
+PLAYING = "playing"
+WON = "won"
+LOST = "lost"
+
+
+class GameSession:
+    """
+    Runs the flow of a single game without any user interface: starting a game, asking questions when the player
+    tries to enter a new room, handling answers, checking for the end of the game and saving/loading. MazeGUI is a
+    client of this class, and many sessions can be hosted in one process. Sessions can share one question source,
+    any object with a get_random_question method, passed in as questions, or draw from a question server through the
+    QuestionServiceClient passed in as service.
+    """
+    __slots__ = ('maze', 'questions', 'question', 'direction', 'start_time', 'service', '_owns_questions', '_journal')
+
+    def __init__(self, maze=None, questions=None, service=None):
+        self.maze = maze if maze is not None else Maze(4, 4)
+        self.questions = questions
+        self.question = None
+        self.direction = None
+        self.start_time = None
+        self.service = service
+        self._owns_questions = questions is None
+        self._journal = None
+
+    def new_game(self, rows=None, cols=None, difficulty=None, category=None):
+        """Starts a new game. Settings that are passed in replace those of the current maze, the layout is chosen with
+        maze.set_layout beforehand."""
+        if rows is not None and cols is not None:
+            self.maze.resize_maze(rows, cols)
+        if difficulty is not None:
+            self.maze.set_difficulty(difficulty)
+        if category is not None:
+            self.maze.set_category(category)
+        self.maze.construct()
+        self.cancel_question()
+        self.start_clock()
+
+    def prepare_questions(self):
+        """Starts fetching questions for the category and difficulty of the maze in the background and returns
+        immediately. The database asks every question once before repeating any, until its first questions arrive the
+        offline backup questions are used. Does nothing if the session was given a shared question source."""
+        if not self._owns_questions:
+            return
+        if self.questions is not None:
+            self.questions.close()
+        self.questions = QuestionPrefetcher(partial(SQLDatabase, self.maze.category, self.maze.difficulty,
+                                                    self.maze.get_total_doors(), no_repeat=True, service=self.service),
+                                            backup_file=offline_questions(self.maze.category, self.maze.difficulty))
+        self.questions.start()
+
+    def start_clock(self):
+        """Starts counting play time from now."""
+        self.start_time = int(time.time())
+
+    def request_move(self, direction):
+        """
+        Attempts to move the player in the given direction. Returns:
+        MOVED if the room had already been visited and the player moved into it
+        QUESTION if the room is new, the question to answer is then held in question until answer is called
+        BLOCKED if there is no open door in that direction or the game is over
+        BUSY if a question is still waiting for an answer
+        """
+        if self.question is not None:
+            return BUSY
+        row, col = self.maze.player_location[0], self.maze.player_location[1]
+        if self.status() != PLAYING or not self.maze.check_direction(row, col, direction):
+            return BLOCKED
+        destination = self.maze.find_destination(row, col, direction)
+        if self.maze.is_visited(destination.position[0], destination.position[1]):
+            self.maze.move_player(direction)
+            return MOVED
+        self.question = self.questions.get_random_question()
+        self.direction = direction
+        return QUESTION
+
+    def answer(self, answer):
+        """Answers the pending question with the text of the chosen answer. Moves the player if it is correct,
+        otherwise locks the door. Returns True if the answer was correct."""
+        if self.question is None:
+            raise ValueError("There is no question waiting for an answer.")
+        correct = answer == self.question.correct_answer
+        self.maze.record_answer(self.direction, correct)
+        if correct:
+            self.maze.move_player(self.direction)
+        else:
+            self.maze.lock_door(self.direction)
+        self.cancel_question()
+        return correct
+
+    def cancel_question(self):
+        """Drops the pending question without answering it."""
+        self.question = None
+        self.direction = None
+
+    def status(self):
+        """Returns WON if the player reached the exit, LOST if the exit can no longer be reached, PLAYING otherwise."""
+        if self.maze.player_wins():
+            return WON
+        if not self.maze.is_completable():
+            return LOST
+        return PLAYING
+
+    def save(self, filename):
+        """Adds the time played since the clock was last started to the maze and saves the maze to filename in the
+        save format of save_format. Saving the same game to the same file again only appends the moves made since the
+        last save to its journal, see SaveJournal. A pending question is not saved."""
+        self.prepare_save(filename)()
+
+    def prepare_save(self, filename):
+        """Does the part of save that reads the game and returns a function without arguments that writes the save, so
+        the file can be written on another thread while the game goes on, see SaveWorker. The functions returned must
+        be called in the order they were returned in."""
+        now = int(time.time())
+        if self.start_time is not None:
+            self.maze.set_time_elapsed(self.start_time, now)
+        self.start_time = now
+        if self._journal is None or self._journal.filename != filename:
+            self._journal = SaveJournal(filename)
+        return self._journal.prepare(self.maze)[1]
+
+    def load(self, filename):
+        """Replaces the maze with the one saved in filename, a save file or a pickle save from an older version of the
+        game. Raises FileNotFoundError if there is no such file."""
+        self.resume(read_save(filename))
+
+    def resume(self, maze):
+        """Continues the game of a maze that was loaded, see SaveWorker.load."""
+        self.maze = maze
+        self._journal = None
+        self.cancel_question()
+        self.start_clock()
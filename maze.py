@@ -1,3 +1,28 @@
+import random
+from collections import deque
+from array import array
+from connectivity import ConnectivityTracker
+from compact_grid import CompactGrid, DOOR_BITS
+from maze_generator import generate
+
+OFFSETS = {"north": (-1, 0), "south": (1, 0), "east": (0, 1), "west": (0, -1)}
+OPPOSITE = {"north": "south", "south": "north", "west": "east", "east": "west"}
+JOURNAL_MOVE = 0
+JOURNAL_LOCK = 1
+JOURNAL_CORRECT = 2
+JOURNAL_WRONG = 3
+JOURNAL_DIRECTIONS = list(DOOR_BITS)
+JOURNAL_CODES = {direction: code for code, direction in enumerate(JOURNAL_DIRECTIONS)}
+
+
+def format_time(seconds):
+    """Returns a number of seconds in digital clock format: (hour:minute:second)"""
+    hours = seconds // 3600
+    minutes = (seconds - hours * 3600) // 60
+    seconds = (seconds - hours * 3600 - minutes * 60)
+    return f'{str(hours).zfill(2)}:{str(minutes).zfill(2)}:{str(seconds).zfill(2)}'
+
+
 class Room:
 
     def __init__(self, row, column):
@@ -40,16 +65,53 @@ class Room:
 
 class Maze:
 
-    def __init__(self, rows, columns):
+    def __init__(self, rows, columns, compact=False):
+        """
+        rows, columns: dimensions of the maze
+        compact: if True, construct stores the rooms in a CompactGrid instead of a list of lists of Room objects,
+        which is much faster and smaller for large mazes
+        """
         self.rows = rows
         self.cols = columns
+        self.compact = compact
         self._player_location = [1, 1]
         self._difficulty = "easy"
         self._category = None
+        self._layout = None
+        self._seed = None
+        self.maze_seed = None
         self.grid = None
         self.visited_rooms = []
+        self._visited = bytearray()
+        self.adjacency = bytearray()
+        self.locked_doors = []
+        self.journal = bytearray()
         self.stats = {}
         self._time_elapsed = 0
+        self.connectivity = None
+
+    def __getstate__(self):
+        """The connectivity tracker is left out of save files, it is rebuilt the next time it is needed."""
+        state = self.__dict__.copy()
+        state['connectivity'] = None
+        return state
+
+    def __setstate__(self, state):
+        """Fills in fields that are missing from save files made by older versions of the game."""
+        self.__dict__.update(state)
+        self.__dict__.setdefault('connectivity', None)
+        self.__dict__.setdefault('compact', False)
+        self.__dict__.setdefault('_layout', None)
+        self.__dict__.setdefault('_seed', None)
+        self.__dict__.setdefault('maze_seed', None)
+        self.__dict__.setdefault('locked_doors', [])
+        self.__dict__.setdefault('journal', bytearray())
+        if 'adjacency' not in state:
+            self.build_adjacency()
+        if '_visited' not in state:
+            self._visited = bytearray(self.rows * self.cols)
+            for room in self.visited_rooms:
+                self._visited[room.position[0] * self.cols + room.position[1]] = 1
 
     @property
     def player_location(self):
@@ -63,6 +125,10 @@ class Maze:
     def category(self):
         return self._category
 
+    @property
+    def layout(self):
+        return self._layout
+
     def get_total_doors(self):
         return self.rows * (self.cols-1) + self.cols * (self.rows-1)
 
@@ -75,10 +141,7 @@ class Maze:
 
     def get_time(self):
         """Returns the time elapsed in digital clock format: (hour:minute:second)"""
-        hours = self._time_elapsed // 3600
-        minutes = (self._time_elapsed - hours * 3600) // 60
-        seconds = (self._time_elapsed - hours * 3600 - minutes * 60)
-        return f'{str(hours).zfill(2)}:{str(minutes).zfill(2)}:{str(seconds).zfill(2)}'
+        return format_time(self._time_elapsed)
 
     def resize_maze(self, row, col):
         """
@@ -94,19 +157,89 @@ class Maze:
     def set_category(self, category):
         self._category = category
 
+    def set_layout(self, layout, seed=None):
+        """
+        Sets the algorithm construct uses to carve interior walls, one of the names in maze_generator.ALGORITHMS, or
+        None for an open grid with walls only on the border. If seed is None, a new random seed is picked for every
+        maze. The seed actually used is kept in maze_seed so a maze can be generated again.
+        """
+        self._layout = layout
+        self._seed = seed
+
     def set_time_elapsed(self, start, current):
         self._time_elapsed += current - start
 
     def construct(self):
         self.visited_rooms = []
+        self.locked_doors = []
+        self.journal = bytearray()
         self._player_location = [1, 1]
-        self.grid = [[Room(r, c) for c in range(self.cols)] for r in range(self.rows)]
+        if self.compact:
+            self.grid = CompactGrid(self.rows, self.cols)
+        else:
+            self.grid = [[Room(r, c) for c in range(self.cols)] for r in range(self.rows)]
         self.set_borders()
+        if self._layout:
+            self.carve()
+        self.build_adjacency()
         self.exit = self.get_room(self.rows - 1, self.cols - 1)
         row, col = self.player_location[0], self.player_location[1]
         room = self.get_room(row, col)
+        self._visited = bytearray(self.rows * self.cols)
+        self._visited[row * self.cols + col] = 1
         self.visited_rooms.append(room)
         self._time_elapsed = 0
+        self.connectivity = None
+
+    def build_adjacency(self):
+        """
+        Builds the adjacency index, a bytearray with one entry per room indexed by row * cols + col. The entry holds
+        a DOOR_BITS flag for every direction the player can move in from that room, that is the door is open on both
+        sides and leads to a room inside the maze. check_direction reads this index and lock_door keeps it up to date.
+        The door flags of the whole grid are treated as one large integer, one byte per room, so each direction is
+        worked out with a few shifts and masks instead of a loop over the rooms.
+        """
+        rows, cols = self.rows, self.cols
+        if self.compact:
+            doors = self.grid.doors
+        else:
+            doors = bytes(sum(DOOR_BITS[direction] for direction, value in room.doors().items() if value)
+                          for row in self.grid for room in row)
+        north, south, east, west = DOOR_BITS["north"], DOOR_BITS["south"], DOOR_BITS["east"], DOOR_BITS["west"]
+        flags = int.from_bytes(doors, 'little')
+        row_shift = 8 * cols
+
+        def mask(bit, first_col=True, last_col=True):
+            pattern = bytearray([bit]) * cols
+            if not first_col:
+                pattern[0] = 0
+            if not last_col:
+                pattern[-1] = 0
+            return int.from_bytes(bytes(pattern) * rows, 'little')
+
+        # Each term lines up the neighbour's door flags with the current room's byte and moves the neighbour's
+        # facing door bit onto the bit for this direction, e.g. the room above's south bit onto this room's north bit.
+        passable = flags & mask(north) & ((flags << row_shift) >> 1)
+        passable |= flags & mask(south) & ((flags >> row_shift) << 1)
+        passable |= flags & mask(east, last_col=False) & ((flags >> 8) >> 1)
+        passable |= flags & mask(west, first_col=False) & ((flags << 8) << 1)
+        self.adjacency = bytearray(passable.to_bytes(rows * cols, 'little'))
+
+    def carve(self):
+        """Generates a maze with the chosen layout algorithm and locks every door that is not part of a passage. The
+        generated mazes always connect every room, so the exit can be reached from the start."""
+        seed = self._seed if self._seed is not None else random.randrange(2 ** 32)
+        passages = generate(self.rows, self.cols, self._layout, seed)
+        self.maze_seed = seed
+        if self.compact:
+            self.grid.doors[:] = passages
+            return
+        for row in self.grid:
+            for room in row:
+                flags = passages[room.position[0] * self.cols + room.position[1]]
+                for direction, bit in DOOR_BITS.items():
+                    if not flags & bit:
+                        room.lock_door(direction)
 
     def set_borders(self):
         """Sets the door values of the rooms on the edge of the dungeon to be walls."""
@@ -118,10 +251,19 @@ class Maze:
             row[0].lock_door("west")
             row[self.cols - 1].lock_door("east")
 
+    def is_visited(self, row, col):
+        """Returns True if the player has been in the room at the given row and column."""
+        return self._visited[row * self.cols + col] == 1
+
     def move_player(self, direction):
+        """Moves the player to the adjacent room in the given direction. visited_rooms keeps the rooms in the order they
+        were first entered, the _visited bitmap is used to check membership. The move is recorded in the journal."""
         destination = self.find_destination(self.player_location[0], self.player_location[1], direction)
+        self.journal.append(JOURNAL_MOVE << 2 | JOURNAL_CODES[direction])
         self._player_location = destination.position
-        if destination not in self.visited_rooms:
+        row, col = destination.position[0], destination.position[1]
+        if not self.is_visited(row, col):
+            self._visited[row * self.cols + col] = 1
             self.visited_rooms.append(destination)
 
     def player_wins(self):
@@ -131,47 +273,124 @@ class Maze:
         return False
 
     def lock_door(self, direction):
+        """Locks the door in the given direction of the player's room. If the door was open before, updates the
+        adjacency index and the connectivity tracker and records the door in locked_doors as (row, col, direction).
+        The lock is recorded in the journal either way."""
+        row, col = self.player_location[0], self.player_location[1]
+        direction = direction.lower()
+        self.journal.append(JOURNAL_LOCK << 2 | JOURNAL_CODES[direction])
+        was_open = self.check_direction(row, col, direction)
+        self.get_room(row, col).lock_door(direction)
+        if was_open:
+            cell = row * self.cols + col
+            neighbour = cell + OFFSETS[direction][0] * self.cols + OFFSETS[direction][1]
+            self.adjacency[cell] &= ~DOOR_BITS[direction]
+            self.adjacency[neighbour] &= ~DOOR_BITS[OPPOSITE[direction]]
+            self.locked_doors.append((row, col, direction))
+            if self.connectivity is not None:
+                self.connectivity.remove_door(row, col, direction)
+
+    def record_answer(self, direction, correct):
+        """Records the outcome of the question for the door in the given direction of the player's room, in the room's
+        answers and in the journal. Moving through the door or locking it is left to the caller."""
+        direction = direction.lower()
         room = self.get_room(self.player_location[0], self.player_location[1])
-        room.lock_door(direction)
+        room.answers[direction] = 'correct' if correct else 'wrong'
+        self.journal.append((JOURNAL_CORRECT if correct else JOURNAL_WRONG) << 2 | JOURNAL_CODES[direction])
+
+    def replay(self, records):
+        """
+        Applies journal records to the maze, in order, as if the calls that made them were made again. Each record is
+        one byte, the kind of event (JOURNAL_MOVE, JOURNAL_LOCK, JOURNAL_CORRECT or JOURNAL_WRONG) shifted left by two
+        bits and the position of its direction in JOURNAL_DIRECTIONS in the low two bits. Replaying the journal of a
+        game on the maze it started from, constructed with the same layout and seed, repeats the game exactly. The
+        records are appended to the journal of this maze.
+        """
+        for record in records:
+            kind, direction = record >> 2, JOURNAL_DIRECTIONS[record & 3]
+            if kind == JOURNAL_MOVE:
+                self.move_player(direction)
+            elif kind == JOURNAL_LOCK:
+                self.lock_door(direction)
+            else:
+                self.record_answer(direction, kind == JOURNAL_CORRECT)
 
-    def is_completable(self):
-        visited = []
+    def is_completable(self, return_path=False):
+        """
+        Checks if it is possible to reach the exit from the player's current location. The answer comes from the
+        connectivity tracker, which is built on the first call and then kept up to date by lock_door. If return_path is
+        True, the list of [row, col] positions from the player to the exit is returned instead, or None if the exit
+        cannot be reached.
+        """
         row, col = self.player_location[0], self.player_location[1]
-        return self.check_traversal(row, col, visited)
+        if return_path:
+            return self.find_path(row, col)
+        if self.connectivity is None:
+            self.connectivity = ConnectivityTracker(self)
+        return self.connectivity.connected(row, col, self.exit.position[0], self.exit.position[1])
 
-    def check_traversal(self, row, col, visited):
+    def check_traversal(self, row, col, visited=None):
         """
-        Checks if it is possible to reach the exit and all of the pillars from the initial location passed in. Keeps a
-        list of rooms that have been visited to avoid an infinite loop. The list of unique rooms used to place the
-        pillars, entrance, and exit is used to check if the all of the rooms have been visited.
+        Checks if it is possible to reach the exit from the initial location passed in. Rooms that have been visited
+        are flagged in a bytearray with one entry per room, indexed by row * cols + col, to avoid an infinite loop.
+        A buffer can be passed in as visited to be reused between calls, it is cleared before searching.
         """
-        found_path = False
-        if self.grid[row][col] not in visited:
-            visited.append(self.grid[row][col])
-            if self.exit in visited:
-                found_path = True
-            else:
-                if not found_path and self.check_direction(row, col, "north"):
-                    found_path = self.check_traversal(row-1, col, visited)
-                if not found_path and self.check_direction(row, col, "west"):
-                    found_path = self.check_traversal(row, col-1, visited)
-                if not found_path and self.check_direction(row, col, "south"):
-                    found_path = self.check_traversal(row+1, col, visited)
-                if not found_path and self.check_direction(row, col, "east"):
-                    found_path = self.check_traversal(row, col+1, visited)
-        return found_path
+        size = self.rows * self.cols
+        if visited is None:
+            visited = bytearray(size)
+        else:
+            visited[:] = bytes(size)
+        return self._search(row * self.cols + col, visited)
 
-    def check_direction(self, row, col, direction):
-        opposite = {"north": "south", "south": "north", "west": "east", "east": "west"}
-        destination = self.find_destination(row, col, direction)
-        if destination:
-            curr = self.get_room(row, col)
-            doors1 = curr.doors()
-            doors2 = destination.doors()
-            if doors1[direction] and doors2[opposite[direction]]:
+    def find_path(self, row, col):
+        """
+        Finds the shortest path from the location passed in to the exit, returns it as a list of [row, col] positions
+        starting with the location passed in and ending with the exit. Returns None if the exit cannot be reached.
+        """
+        size = self.rows * self.cols
+        visited = bytearray(size)
+        parents = array('l', [-1]) * size
+        if not self._search(row * self.cols + col, visited, parents):
+            return None
+        cell = self.exit.position[0] * self.cols + self.exit.position[1]
+        path = []
+        while cell != -1:
+            path.append(list(divmod(cell, self.cols)))
+            cell = parents[cell]
+        path.reverse()
+        return path
+
+    def _search(self, start, visited, parents=None):
+        """
+        Breadth first search through the open doors starting from the room with index start. Stops as soon as the exit
+        is reached. If parents is passed in, the index of the room each room was reached from is recorded in it.
+        Returns True if the exit was reached.
+        """
+        cols = self.cols
+        target = self.exit.position[0] * cols + self.exit.position[1]
+        adjacency = self.adjacency
+        steps = [(DOOR_BITS[direction], OFFSETS[direction][0] * cols + OFFSETS[direction][1]) for direction in OFFSETS]
+        visited[start] = 1
+        queue = deque([start])
+        while queue:
+            cell = queue.popleft()
+            if cell == target:
                 return True
+            flags = adjacency[cell]
+            for bit, step in steps:
+                neighbour = cell + step
+                if flags & bit and not visited[neighbour]:
+                    visited[neighbour] = 1
+                    if parents is not None:
+                        parents[neighbour] = cell
+                    queue.append(neighbour)
         return False
 
+    def check_direction(self, row, col, direction):
+        """Returns True if the player can move from the room at row, col in the given direction. Answered with a single
+        lookup in the adjacency index."""
+        return bool(self.adjacency[row * self.cols + col] & DOOR_BITS[direction])
+
     def check_game_over(self, row, col):
         room = self.grid[row][col]
         return room.game_over()
@@ -210,9 +429,8 @@ class Maze:
         return f'{A[0]}: {A[1]}\n {B[0]}: {B[1]} \n {C[0]}: {C[1]} \n {D[0]}: {D[1]}'
 
     def find_destination(self, row, col, direction):
-        translation = {"north": [-1, 0], "south": [1, 0], "east": [0, 1], "west": [0, -1]}
-        row += translation[direction][0]
-        col += translation[direction][1]
+        row += OFFSETS[direction][0]
+        col += OFFSETS[direction][1]
         if 0 <= row < self.rows and 0 <= col < self.cols:
             return self.get_room(row, col)
 
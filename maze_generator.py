@@ -0,0 +1,180 @@
+"""
+Maze generation. Each algorithm carves a perfect maze on a padded bytearray or flat lists, in pure Python, so the time
+grows with the number of rooms. ROOM_LIMITS holds, for each algorithm, the number of rooms it generates in about two
+seconds on a typical machine: 1000x1000 for the backtracker and Wilson's algorithm, about 700x700 for Kruskal's, whose
+shuffle of every wall and union-find dominate. generate still builds larger mazes, but warns that they will take longer.
+The game itself caps the board at 500x500.
+"""
+import random
+import warnings
+from itertools import chain, permutations, repeat
+from compact_grid import DOOR_BITS
+
+NORTH, SOUTH, EAST, WEST = DOOR_BITS["north"], DOOR_BITS["south"], DOOR_BITS["east"], DOOR_BITS["west"]
+ROOT = 16
+RANDOM_BLOCK = 1 << 16
+ROOM_LIMITS = {"backtracker": 1000 * 1000, "kruskal": 500 * 1000, "wilson": 1000 * 1000}
+
+
+class SlowGenerationWarning(RuntimeWarning):
+    """Warns that a maze is larger than the ROOM_LIMITS of its algorithm and will take longer to generate."""
+
+
+def generate(rows, cols, algorithm="backtracker", seed=None):
+    """
+    Generates a perfect maze, where every room can reach every other room through exactly one path, so any start and
+    exit are always connected. Returns a bytearray with one entry per room, indexed by row * cols + col, holding the
+    DOOR_BITS of the passages carved out of that room. Doors leading outside the maze are never carved.
+    algorithm: name of the algorithm, one of the keys of ALGORITHMS
+    seed: seed for the random number generator, the same seed and algorithm always produce the same maze
+    Warns with a SlowGenerationWarning if the maze has more rooms than ROOM_LIMITS allows for the algorithm.
+    """
+    if algorithm not in ALGORITHMS:
+        raise ValueError(f'Unknown maze generation algorithm: {algorithm}')
+    if rows * cols > ROOM_LIMITS[algorithm]:
+        warnings.warn(f'{rows}x{cols} is over the {ROOM_LIMITS[algorithm]} rooms {algorithm} generates in about two '
+                      f'seconds, this maze will take longer', SlowGenerationWarning, stacklevel=2)
+    return ALGORITHMS[algorithm](rows, cols, random.Random(seed))
+
+
+def recursive_backtracker(rows, cols, rng):
+    """
+    Depth first search that carves a passage to a random unvisited neighbour and backs up when there is none. Uses
+    an explicit stack instead of recursion so it works on mazes of any size. Produces long winding corridors. Each
+    room only records the direction back to the room it was carved from, a non-zero entry doubles as the visited flag.
+    """
+    width = cols + 2
+    links = _padded(rows, cols)
+    orders = list(permutations([(SOUTH, -width), (NORTH, width), (WEST, 1), (EAST, -1)]))
+    start = (rng.randrange(rows) + 1) * width + rng.randrange(cols) + 1
+    links[start] = ROOT
+    stack = [start]
+    push, pop = stack.append, stack.pop
+    rand = rng.random
+    while stack:
+        cell = stack[-1]
+        for back, offset in orders[int(rand() * 24)]:
+            neighbour = cell + offset
+            if not links[neighbour]:
+                links[neighbour] = back
+                push(neighbour)
+                break
+        else:
+            pop()
+    links[start] = 0
+    return _links_to_passages(_unpad(links, rows, cols), rows, cols)
+
+
+def kruskal(rows, cols, rng):
+    """
+    Randomised Kruskal's algorithm. Every interior wall is visited in random order and removed if the rooms on either
+    side are not yet connected, which is tracked with a union-find structure using path halving and union by size.
+    A removed wall is recorded as an EAST or SOUTH link of the room west or north of it, and the doors on the other
+    side are added at the end by _links_to_passages.
+    """
+    size = rows * cols
+    links = bytearray(size)
+    parent = list(range(size))
+    component_size = [1] * size
+    # Walls are encoded as cell * 2 for the wall to the east of cell and cell * 2 + 1 for the wall to the south.
+    walls = [cell * 2 for cell in range(size) if cell % cols < cols - 1]
+    walls.extend(range(1, (size - cols) * 2, 2))
+    rng.shuffle(walls)
+    steps, bits = (1, cols), (EAST, SOUTH)
+    remaining = size - 1
+    for wall in walls:
+        cell, south = wall >> 1, wall & 1
+        root1 = cell
+        while parent[root1] != root1:
+            parent[root1] = root1 = parent[parent[root1]]
+        root2 = cell + steps[south]
+        while parent[root2] != root2:
+            parent[root2] = root2 = parent[parent[root2]]
+        if root1 == root2:
+            continue
+        if component_size[root1] < component_size[root2]:
+            root1, root2 = root2, root1
+        parent[root2] = root1
+        component_size[root1] += component_size[root2]
+        links[cell] |= bits[south]
+        remaining -= 1
+        if not remaining:
+            break
+    return _links_to_passages(links, rows, cols)
+
+
+def wilson(rows, cols, rng):
+    """
+    Wilson's algorithm, produces a uniformly random spanning tree. Starting from each room outside the tree, performs
+    a random walk until it hits the tree, remembering only the last direction taken out of each room so loops are
+    erased as the walk goes, then adds the loop-erased path to the tree. The remembered direction of a room in the
+    tree is the link to its parent. The walk takes its directions from the low two bits of a stream of random bytes,
+    read in large blocks, instead of asking the generator for each step.
+    """
+    width = cols + 2
+    border = _padded(rows, cols)
+    in_tree = bytearray(border)
+    walk = bytearray(len(border))
+    offsets = [-width, width, 1, -1]
+    bits = [NORTH, SOUTH, EAST, WEST]
+    follow = {NORTH: -width, SOUTH: width, EAST: 1, WEST: -1}
+    in_tree[(rng.randrange(rows) + 1) * width + rng.randrange(cols) + 1] = 1
+    directions = chain.from_iterable(map(rng.randbytes, repeat(RANDOM_BLOCK)))
+    for start in range(width + 1, len(border) - width - 1):
+        if in_tree[start]:
+            continue
+        cell = start
+        for direction in directions:
+            direction &= 3
+            neighbour = cell + offsets[direction]
+            if border[neighbour]:
+                continue
+            walk[cell] = bits[direction]
+            if in_tree[neighbour]:
+                break
+            cell = neighbour
+        cell = start
+        while not in_tree[cell]:
+            in_tree[cell] = 1
+            cell += follow[walk[cell]]
+    return _links_to_passages(_unpad(walk, rows, cols), rows, cols)
+
+
+def _padded(rows, cols):
+    """
+    Returns a bytearray for a grid with an extra ring of rooms around it, with the ring set to 0xff and the rooms
+    inside set to 0. The generators work on padded grids so the ring stops them from leaving the maze without bounds checks.
+    """
+    width = cols + 2
+    row = b'\xff' + bytes(cols) + b'\xff'
+    return bytearray(b'\xff' * width + row * rows + b'\xff' * width)
+
+
+def _unpad(padded, rows, cols):
+    """Strips the ring added by _padded, returns the rooms inside it indexed by row * cols + col."""
+    width = cols + 2
+    return bytearray(b''.join(padded[(row + 1) * width + 1:(row + 1) * width + 1 + cols] for row in range(rows)))
+
+
+def _links_to_passages(links, rows, cols):
+    """
+    Turns a spanning tree stored as one DOOR_BITS link per room, pointing at the room's parent, into passages by adding
+    the matching door on the parent's side. The whole grid is handled as one large integer, one byte per room, so
+    each direction takes a mask and two shifts, e.g. a room linked north gives the room above it a south door.
+    """
+    size = rows * cols
+    flags = int.from_bytes(links, 'little')
+    row_shift = 8 * cols
+
+    def linked(bit):
+        return flags & int.from_bytes(bytes([bit]) * size, 'little')
+
+    passages = flags
+    passages |= (linked(NORTH) >> row_shift) << 1
+    passages |= (linked(SOUTH) << row_shift) >> 1
+    passages |= (linked(EAST) << 8) << 1
+    passages |= (linked(WEST) >> 8) >> 1
+    return bytearray(passages.to_bytes(size, 'little'))
+
+
+ALGORITHMS = {"backtracker": recursive_backtracker, "kruskal": kruskal, "wilson": wilson}
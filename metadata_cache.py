@@ -0,0 +1,59 @@
+import json
+import os
+import threading
+import time
+
+
+class MetadataCache:
+    """
+    Small on-disk cache for trivia api metadata such as the category list and question counts, stored as a json file
+    mapping each key to its value and the time it was stored. Entries older than ttl seconds are stale, get ignores
+    them unless allow_stale is set, which is used as a fallback when the api cannot be reached.
+    path: json file the cache is kept in
+    ttl: number of seconds an entry stays fresh
+    """
+    def __init__(self, path="trivia_metadata.json", ttl=24 * 60 * 60):
+        self.path = path
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = self._read()
+
+    def get(self, key, allow_stale=False):
+        """Returns the value stored under key, or None if there is none or it is stale and allow_stale is False."""
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if not allow_stale and time.time() - entry["stored"] > self.ttl:
+            return None
+        return entry["value"]
+
+    def put(self, key, value):
+        """Stores value under key and writes the cache file."""
+        with self._lock:
+            self._entries[key] = {"stored": time.time(), "value": value}
+            self._write()
+
+    def clear(self):
+        """Removes every entry, so the next lookups go to the api."""
+        with self._lock:
+            self._entries = {}
+            self._write()
+
+    def _read(self):
+        try:
+            with open(self.path, 'r') as cache_file:
+                return json.load(cache_file)
+        except (OSError, ValueError):
+            return {}
+
+    def _write(self):
+        """Writes the entries to a temporary file and renames it over the cache file, so a crash never leaves a half
+        written cache behind."""
+        temp_path = self.path + ".tmp"
+        try:
+            with open(temp_path, 'w') as cache_file:
+                json.dump(self._entries, cache_file)
+            os.replace(temp_path, self.path)
+        except OSError as e:
+            print(e)
@@ -0,0 +1,106 @@
+"""
+Converts questions between SQLite files and question packs.
+
+Examples, from the repository root:
+    python pack_tools.py export backup_questions.db packs
+    python pack_tools.py export trivia_maze_questions.db packs --compress
+    python pack_tools.py import packs/general_knowledge-easy.tmqp trivia_maze_questions.db
+"""
+import argparse
+import os
+import sqlite3
+
+from question_database import SQLDatabase, QUESTION_COLUMNS, DIFFICULTIES, question_hash
+from question_pack import QuestionPack, write_pack, pack_name
+
+
+def export_pack(database_file, pack_file, category=None, difficulty=None, compress=False):
+    """Writes the questions of database_file to one pack and returns the number of questions written. The category and
+    difficulty select questions from a question store, they are only recorded in the pack for an SQLite file without
+    those columns, such as backup_questions.db."""
+    conn = sqlite3.connect(database_file)
+    try:
+        columns = [row[1] for row in conn.execute("PRAGMA table_info(questions)")]
+        conditions, params = [], []
+        for column, value in [("category", category), ("difficulty", difficulty)]:
+            if value is not None and column in columns:
+                conditions.append(column + " = ?")
+                params.append(value)
+        query = "SELECT " + QUESTION_COLUMNS + " FROM questions"
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        rows = conn.execute(query, params).fetchall()
+    finally:
+        conn.close()
+    return write_pack(pack_file, rows, category or "", difficulty or "", compress)
+
+
+def export_packs(database_file, folder, compress=False):
+    """Writes one pack per category and difficulty of a question store into folder, named with pack_name, and returns
+    the paths of the packs. An SQLite file without category and difficulty columns becomes a single pack for any
+    category and difficulty."""
+    os.makedirs(folder, exist_ok=True)
+    conn = sqlite3.connect(database_file)
+    try:
+        columns = [row[1] for row in conn.execute("PRAGMA table_info(questions)")]
+        if "category" in columns:
+            groups = conn.execute("SELECT DISTINCT category, difficulty FROM questions;").fetchall()
+        else:
+            groups = [(None, None)]
+    finally:
+        conn.close()
+    paths = []
+    for category, difficulty in groups:
+        path = os.path.join(folder, pack_name(category, difficulty))
+        export_pack(database_file, path, category, difficulty, compress)
+        paths.append(path)
+    return paths
+
+
+def import_pack(pack_file, database_file, category=None, difficulty=None):
+    """Adds the questions of a pack to the question store in database_file, skipping questions that are already stored.
+    The questions are stored under the category and difficulty recorded in the pack unless others are given. Questions
+    of a pack for any difficulty are stored as the easiest, so games of every difficulty draw them. Returns the number
+    of questions added."""
+    pack = QuestionPack(pack_file)
+    category = category if category is not None else pack.category
+    difficulty = difficulty if difficulty is not None else pack.difficulty or DIFFICULTIES[-1]
+    conn = sqlite3.connect(database_file)
+    try:
+        c = conn.cursor()
+        SQLDatabase.create_store(c)
+        before = c.execute("SELECT COUNT(*) FROM questions;").fetchone()[0]
+        c.executemany("INSERT OR IGNORE INTO questions (hash, category, difficulty, " + QUESTION_COLUMNS +
+                      ") Values (?,?,?,?,?,?,?,?,?)",
+                      ((question_hash(question.text, question.correct_answer), category, difficulty,
+                        question.type, question.text, question.correct_answer,
+                        *(question.answers[1:] + ("",) * (4 - len(question.answers)))) for question in pack))
+        conn.commit()
+        return c.execute("SELECT COUNT(*) FROM questions;").fetchone()[0] - before
+    finally:
+        conn.close()
+        pack.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert questions between SQLite files and question packs.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    export = commands.add_parser("export", help="write one pack per category and difficulty of an SQLite file")
+    export.add_argument("database_file")
+    export.add_argument("folder")
+    export.add_argument("--compress", action="store_true", help="compress every question with zlib")
+    load = commands.add_parser("import", help="add the questions of a pack to a question store")
+    load.add_argument("pack_file")
+    load.add_argument("database_file")
+    load.add_argument("--category", help="category to store the questions under instead of the one of the pack")
+    load.add_argument("--difficulty", help="difficulty to store the questions under instead of the one of the pack")
+    args = parser.parse_args()
+    if args.command == "export":
+        for path in export_packs(args.database_file, args.folder, args.compress):
+            print(path)
+    else:
+        print(f'{import_pack(args.pack_file, args.database_file, args.category, args.difficulty)} questions added')
+
+
+if __name__ == '__main__':
+    main()
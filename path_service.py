@@ -0,0 +1,89 @@
+from maze import OFFSETS
+
+
+class PathService:
+    """
+    Serves the shortest route from the player's location to the exit for the hint feature. The last route found is
+    cached and only searched for again when it stops being usable:
+    - a door along the cached route was locked, locks elsewhere in the maze cannot make it longer or block it
+    - the player stepped off the route, moving along it just drops the rooms behind the player
+    - the maze was constructed again or a different maze was loaded
+    Once the exit cannot be reached it never can again, doors are only ever locked, so that is cached as well.
+    """
+    def __init__(self, maze):
+        self.maze = maze
+        self.searches = 0
+        self._grid = None
+        self._cells = None
+        self._positions = {}
+        self._edges = set()
+        self._locks_seen = 0
+
+    def path(self):
+        """Returns the shortest route from the player to the exit as a list of [row, col] positions, starting at the
+        player's room and ending at the exit. Returns None if the exit cannot be reached."""
+        cells = self._update()
+        if cells is None:
+            return None
+        start = self._positions[self._player_cell()]
+        return [list(divmod(cell, self.maze.cols)) for cell in cells[start:]]
+
+    def length(self):
+        """Returns the number of moves needed to reach the exit, or None if the exit cannot be reached."""
+        cells = self._update()
+        if cells is None:
+            return None
+        return len(cells) - 1 - self._positions[self._player_cell()]
+
+    def next_direction(self):
+        """Returns the direction of the first move along the route, or None if the player is at the exit or the exit
+        cannot be reached."""
+        cells = self._update()
+        if cells is None:
+            return None
+        start = self._positions[self._player_cell()]
+        if start + 1 >= len(cells):
+            return None
+        step = cells[start + 1] - cells[start]
+        cols = self.maze.cols
+        for direction, offset in OFFSETS.items():
+            if offset[0] * cols + offset[1] == step:
+                return direction
+
+    def _update(self):
+        """Checks the cached route against the current state of the maze and searches again if it is no longer usable.
+        Returns the cached route as a list of room indices."""
+        maze = self.maze
+        if maze.grid is not self._grid:
+            self._grid = maze.grid
+            self._locks_seen = 0
+            self._search()
+        new_locks = maze.locked_doors[self._locks_seen:]
+        self._locks_seen = len(maze.locked_doors)
+        if self._cells is not None and any(self._edge(*lock) in self._edges for lock in new_locks):
+            self._search()
+        elif self._cells is not None and self._player_cell() not in self._positions:
+            self._search()
+        return self._cells
+
+    def _search(self):
+        self.searches += 1
+        maze = self.maze
+        path = maze.find_path(maze.player_location[0], maze.player_location[1])
+        if path is None:
+            self._cells = None
+            self._positions = {}
+            self._edges = set()
+            return
+        self._cells = [row * maze.cols + col for row, col in path]
+        self._positions = {cell: i for i, cell in enumerate(self._cells)}
+        self._edges = {(min(a, b), max(a, b)) for a, b in zip(self._cells, self._cells[1:])}
+
+    def _edge(self, row, col, direction):
+        cols = self.maze.cols
+        cell = row * cols + col
+        neighbour = cell + OFFSETS[direction][0] * cols + OFFSETS[direction][1]
+        return min(cell, neighbour), max(cell, neighbour)
+
+    def _player_cell(self):
+        return self.maze.player_location[0] * self.maze.cols + self.maze.player_location[1]
@@ -2,17 +2,76 @@ import requests
 import sqlite3
 from sqlite3 import Error
 import html
+import hashlib
+import os
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from trivia_api import TriviaAPIError, default_client
+from metadata_cache import MetadataCache
+from question_sampler import QuestionSampler
+from question_pack import find_packs, open_questions
+
+DIFFICULTIES = ["hard", "medium", "easy"]
+QUESTION_COLUMNS = "type, question, correct_answer, incorrect1, incorrect2, incorrect3"
+STORE_VERSION = 1
+STOP_POLL = 0.1
+BACKUP_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "backup_questions.db")
+PACK_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "packs")
+
+
+def question_hash(question, correct_answer):
+    """Returns the content hash a question is stored under, based on its decoded text and correct answer."""
+    content = question + "\x1f" + correct_answer
+    return hashlib.sha1(content.encode("utf-8")).hexdigest()
+
+
+def offline_questions(category, difficulty, pack_folder=PACK_FOLDER, backup_file=BACKUP_FILE):
+    """Returns where the offline questions for a category and difficulty are drawn from, for open_questions: the paths
+    of the question packs in pack_folder for the difficulty and every easier one, as a game draws from, as a tuple if
+    there are any, otherwise backup_file."""
+    difficulties = DIFFICULTIES[DIFFICULTIES.index(difficulty):] if difficulty in DIFFICULTIES else [difficulty]
+    return tuple(find_packs(pack_folder, category, difficulties)) or backup_file
 
 
 class SQLDatabase:
 
-    def __init__(self, category=None, difficulty="easy", target=180):
+    def __init__(self, category=None, difficulty="easy", target=180, api=None, database_file="trivia_maze_questions.db",
+                 workers=4, commit_every=4, metadata=None, no_repeat=False, backup_file=BACKUP_FILE,
+                 pack_folder=PACK_FOLDER, service=None):
+        """
+        api: TriviaAPIClient used for all requests, the client shared by all databases is used if None
+        database_file: SQLite file the questions are stored in
+        workers: number of question requests that may be in flight at once while building the database
+        commit_every: number of fetched batches written to the database per transaction
+        metadata: MetadataCache holding the category list and question counts, the default cache file is used if None
+        no_repeat: if True, every question is asked once before any question is repeated
+        backup_file: SQLite file or question pack with the questions used when the api cannot be reached and there is
+        no question pack for the category and difficulty
+        pack_folder: folder holding the question packs, named with question_pack.pack_name
+        service: QuestionServiceClient of a question server, if given the database runs in client mode, questions and
+        the category list come from the server, which owns the question store, and the api is never queried
+        """
         self.category = category
         self.difficulty = difficulty
+        self.requested_target = target
         self.target = (target//10 + 1) * 20
+        self.api = api if api is not None else default_client()
+        self.database_file = database_file
+        self.workers = workers
+        self.commit_every = commit_every
+        self.metadata = metadata if metadata is not None else MetadataCache()
+        self.no_repeat = no_repeat
+        self.backup_file = backup_file
+        self.pack_folder = pack_folder
+        self._sampler = None
+        self._sampler_file = None
+        self.service = service
         self.online = True
+        if service is not None:
+            self.category_list = service.categories()
+            self.total_question_count = {}
+            return
         self.category_list = self.request_category_list()
-        if self.online and category:
+        if self.category_list and category in self.category_list:
             self.category_id = self.category_list[self.category]
         self.total_question_count = self.request_total_question_count()
 
@@ -21,32 +80,45 @@ class SQLDatabase:
         finds the question total for the current difficulty and category."""
         self.category = category
         self.category_id = self.category_list[self.category]
-        self.total_question_count = self.request_total_question_count()
+        if self.service is None:
+            self.total_question_count = self.request_total_question_count()
 
     def set_difficulty(self, difficulty):
         """Sets the difficulty to the passed in value, finds the question total for current difficulty and category."""
         self.difficulty = difficulty
-        self.total_question_count = self.request_total_question_count()
+        if self.service is None:
+            self.total_question_count = self.request_total_question_count()
 
     def request_category_list(self):
-        """Queries the api for the categories and corresponding category id's. Converts that to a dictionary and returns
-        it."""
+        """Returns a dictionary of the category names and corresponding category id's. Served from the metadata cache
+        while it is fresh, otherwise queries the api and caches the result. If the api cannot be reached, the database
+        is marked as offline and the last cached list is returned even if it is stale, or None if there is none."""
+        category_list = self.metadata.get("categories")
+        if category_list is not None:
+            return category_list
         try:
-            c_response = requests.get("https://opentdb.com/api_category.php")
-            categories = c_response.json()
+            categories = self.api.get_json("/api_category.php", rate_limited=False, retries=0)
             category_list = {}
             for item in categories["trivia_categories"]:
                 category_list[item["name"]] = str(item["id"])
+            self.metadata.put("categories", category_list)
             return category_list
-        except requests.exceptions.ConnectionError:
+        except (requests.exceptions.RequestException, TriviaAPIError, ValueError):
             self.online = False
-            return None
+            return self.metadata.get("categories", allow_stale=True)
+
+    def refresh_metadata(self):
+        """Clears the metadata cache and requests the category list and question counts from the api again."""
+        self.metadata.clear()
+        self.online = True
+        self.category_list = self.request_category_list()
+        self.total_question_count = self.request_total_question_count()
 
     def request_total_question_count(self):
         """Determines the total number of questions for a given category. If no category is specified, returns 200 for
         each difficulty. With a specified category, gets total number of questions of equal or lesser difficulty and
-        returns it as a dictionary."""
-        if self.category:
+        returns it as a dictionary. Offline, or when the category is unknown, the defaults for no category are used."""
+        if self.category and self.category_list and self.category in self.category_list:
             difficulty = self.difficulty
             total_question_count = {}
             if difficulty == "hard":
@@ -63,112 +135,225 @@ class SQLDatabase:
         return total_question_count
 
     def request_question_count(self, difficulty):
-        """Queries the api for the number of questions in the specified difficulty in the current category, rounds
-        that number to lowest multiple of 10 and returns it."""
-        category_lookup = "https://opentdb.com/api_count.php?category=" + self.category_id
-        q_count_response = requests.get(category_lookup)
-        q_count = q_count_response.json()
-        difficulty = "total_" + difficulty + "_question_count"
-        question_count = q_count["category_question_count"][difficulty]
+        """Finds the number of questions in the specified difficulty in the current category, rounds that number to
+        lowest multiple of 10 and returns it. The counts of all difficulties of a category come from one api request,
+        which is kept in the metadata cache. Falls back to a stale cached count, or 0, if the api cannot be reached."""
+        key = "counts:" + self.category_id
+        counts = self.metadata.get(key)
+        if counts is None:
+            try:
+                q_count = self.api.get_json("/api_count.php", {"category": self.category_id}, rate_limited=False,
+                                            retries=0)
+                counts = q_count["category_question_count"]
+                self.metadata.put(key, counts)
+            except (requests.exceptions.RequestException, TriviaAPIError, ValueError):
+                self.online = False
+                counts = self.metadata.get(key, allow_stale=True) or {}
+        question_count = counts.get("total_" + difficulty + "_question_count", 0)
         question_count = question_count//10 * 10
         return question_count
 
     def request_questions(self, amount, difficulty):
         """Queries the api for the the specified number of questions of the category(if one is specified) and
-        difficulty. Formats the response into a list of tuples and returns it."""
-        amount_url = "&amount=" + str(amount)
-        category_url = ""
+        difficulty. Decodes the special characters of every field once, so questions are stored as plain text, and
+        formats the response into a list of tuples ready to be stored, each starting with the question's content hash,
+        category and difficulty, and returns it."""
+        params = {"amount": amount, "difficulty": difficulty}
         if self.category:
-            category_url = "&category=" + self.category_id
-        difficulty_url = "&difficulty=" + difficulty
-        trivia_url = "https://opentdb.com/api.php?" + amount_url + category_url + difficulty_url
-        q_response = requests.get(trivia_url).json()
+            params["category"] = self.category_id
+        q_response = self.api.get_json("/api.php", params)
         questions = q_response["results"]
         sql_str = []
         for question in questions:
-            if question["type"] == "boolean":
-                content = (question["type"], question["question"], question["correct_answer"],
-                           question["incorrect_answers"][0], "", "")
-            else:
-                content = (question["type"], question["question"], question["correct_answer"],
-                           question["incorrect_answers"][0], question["incorrect_answers"][1],
-                           question["incorrect_answers"][2])
-            sql_str.append(content)
+            text = html.unescape(question["question"])
+            correct_answer = html.unescape(question["correct_answer"])
+            incorrect = [html.unescape(answer) for answer in question["incorrect_answers"]]
+            incorrect += [""] * (3 - len(incorrect))
+            key = (question_hash(text, correct_answer), self.category or html.unescape(question["category"]),
+                   difficulty)
+            sql_str.append(key + (question["type"], text, correct_answer, *incorrect[:3]))
         return sql_str
 
-    def build_database(self):
-        """Creates the SQLite database and clears out any questions left over from a prior session and creates a new
-        table. Determines the number of questions required (either the value that was passed in or the total number of
-        questions available in the current category and difficulty) and starts pulling question and adding them to the
-        database, starting from the highest possible difficulty and moving to easier ones."""
+    def build_database(self, on_batch=None, should_stop=None):
+        """Makes sure the question store holds enough questions for the current category and difficulty. The store
+        is kept between games, every question is stored once under its content hash along with its category and
+        difficulty. Counts the questions already stored for this game, works out the requests for the missing ones with
+        plan_requests and sends them from a pool of worker threads sharing the api client's connection pool. Questions
+        are written as the responses come in, commit_every batches per transaction, questions that are already stored
+        are ignored. A request that still fails after its retries is skipped. If there are no questions for this game
+        at all, the database switches to the offline backup questions.
+        on_batch: optional callable given every batch of fetched questions, as the tuples returned by request_questions,
+        once it has been written. In client mode the server is asked to build its database instead, on_batch is
+        not called.
+        should_stop: optional callable checked while the responses come in. Once it returns True, the requests that
+        have not been sent yet are cancelled, so they take no turn of the api's rate limit, and the responses still
+        coming in are dropped. The requests already sent are not waited for."""
+        if self.service is not None:
+            self.close()
+            self.service.prepare(self.category, self.difficulty, self.requested_target)
+            return
         if not self.online:
             return
+        self.close()
         try:
-            conn = sqlite3.connect(r"trivia_maze_questions.db")
+            conn = sqlite3.connect(self.database_file)
         except Error as e:
             print(e)
-        if conn:
-            try:
-                c = conn.cursor()
-                c.execute("DROP TABLE IF EXISTS questions;")
-            except Error as e:
-                print(e)
-        if conn:
-            try:
-                c.execute("""CREATE TABLE IF NOT EXISTS questions (
-                            type text,
-                            question text,
-                            correct_answer text,
-                            incorrect1 text,
-                            incorrect2 text,
-                            incorrect3 text
-                            );""")
-            except Error as e:
-                print(e)
-        database_question_count = 0
-        difficulty = self.difficulty
-        if sum(self.total_question_count.values()) < self.target:
-            self.target = sum(self.total_question_count.values())
-        if difficulty == "hard" and database_question_count < self.target:
-            database_question_count = self.add_questions(difficulty, database_question_count, c)
-            difficulty = "medium"
-        if difficulty == "medium" and database_question_count < self.target:
-            database_question_count = self.add_questions(difficulty, database_question_count, c)
-            difficulty = "easy"
-        if difficulty == "easy" and database_question_count < self.target:
-            self.add_questions(difficulty, database_question_count, c)
+            return
+        c = conn.cursor()
+        try:
+            self.create_store(c)
+        except Error as e:
+            print(e)
+            conn.close()
+            return
+        stored = self.stored_question_count(c)
+        pending = 0
+        pool = ThreadPoolExecutor(max_workers=self.workers)
+        try:
+            remaining = {pool.submit(self.request_questions, amount, difficulty)
+                         for amount, difficulty in self.plan_requests(stored)}
+            requested = bool(remaining)
+            while remaining:
+                if should_stop is not None and should_stop():
+                    conn.commit()
+                    conn.close()
+                    return
+                done, remaining = wait(remaining, timeout=STOP_POLL, return_when=FIRST_COMPLETED)
+                for future in done:
+                    try:
+                        questions = future.result()
+                    except (requests.exceptions.RequestException, TriviaAPIError, ValueError) as e:
+                        print(e)
+                        continue
+                    c.executemany("INSERT OR IGNORE INTO questions (hash, category, difficulty, " +
+                                  QUESTION_COLUMNS + ") Values (?,?,?,?,?,?,?,?,?)", questions)
+                    pending += 1
+                    if pending == self.commit_every:
+                        conn.commit()
+                        pending = 0
+                    if on_batch is not None:
+                        on_batch(questions)
+        finally:
+            pool.shutdown(wait=False, cancel_futures=True)
         conn.commit()
-        c.execute("VACUUM")
+        if requested:
+            stored = self.stored_question_count(c)
         conn.close()
+        if not sum(stored.values()):
+            self.online = False
+
+    @staticmethod
+    def create_store(c):
+        """Creates the questions table and its indexes if they do not exist yet. The (category, difficulty) and
+        (difficulty) indexes also hold the rowid, so counting and sampling the questions of a game only reads an
+        index. A questions table from older versions of the game, which was rebuilt every game, is dropped, and the
+        questions of a store that still holds html escaped text are decoded once."""
+        columns = [row[1] for row in c.execute("PRAGMA table_info(questions)")]
+        if columns and "hash" not in columns:
+            c.execute("DROP TABLE questions;")
+            columns = []
+        if columns and c.execute("PRAGMA user_version;").fetchone()[0] < STORE_VERSION:
+            rows = c.execute("SELECT rowid, category, " + QUESTION_COLUMNS + " FROM questions;").fetchall()
+            c.executemany("UPDATE questions SET category = ?, question = ?, correct_answer = ?, incorrect1 = ?, "
+                          "incorrect2 = ?, incorrect3 = ? WHERE rowid = ?",
+                          [[html.unescape(item) for item in row[1:2] + row[3:]] + [row[0]] for row in rows])
+        c.execute("""CREATE TABLE IF NOT EXISTS questions (
+                    hash text PRIMARY KEY,
+                    category text,
+                    difficulty text,
+                    type text,
+                    question text,
+                    correct_answer text,
+                    incorrect1 text,
+                    incorrect2 text,
+                    incorrect3 text
+                    );""")
+        c.execute("CREATE INDEX IF NOT EXISTS questions_by_category ON questions (category, difficulty);")
+        c.execute("CREATE INDEX IF NOT EXISTS questions_by_difficulty ON questions (difficulty);")
+        c.execute(f"PRAGMA user_version = {STORE_VERSION};")
+
+    def difficulties(self):
+        """Returns the difficulties questions are drawn from, the current difficulty and every easier one."""
+        return DIFFICULTIES[DIFFICULTIES.index(self.difficulty):]
+
+    def question_filter(self):
+        """Returns the WHERE clause and its parameters selecting the stored questions of the current game."""
+        difficulties = self.difficulties()
+        where = "difficulty IN (" + ",".join("?" * len(difficulties)) + ")"
+        if self.category:
+            return "category = ? AND " + where, [self.category] + difficulties
+        return where, difficulties
+
+    def stored_question_count(self, c):
+        """Returns a dictionary with the number of questions stored for each difficulty of the current game."""
+        where, params = self.question_filter()
+        return dict(c.execute("SELECT difficulty, COUNT(*) FROM questions WHERE " + where + " GROUP BY difficulty;",
+                              params).fetchall())
+
+    def plan_requests(self, stored=None):
+        """Determines the requests needed to reach the target number of questions, starting from the highest possible
+        difficulty and moving to easier ones. Questions already in the store, given as a dictionary of counts per
+        difficulty, are used first. Returns a list of (amount, difficulty) tuples."""
+        if sum(self.total_question_count.values()) < self.target:
+            self.target = sum(self.total_question_count.values())
+        stored = stored or {}
+        planned = []
+        database_question_count = 0
+        for difficulty in self.difficulties():
+            if database_question_count >= self.target:
+                break
+            database_question_count = self.add_questions(difficulty, database_question_count, planned,
+                                                         stored.get(difficulty, 0))
+        return planned
 
-    def add_questions(self, difficulty, db_question_count, c):
-        """Determines the highest possible amount of questions that can be obtained from the desired difficulty that
-        maximizes the total number of questions and requests them. Adds these into the database. Returns the total
-        number of questions pulled."""
+    def add_questions(self, difficulty, db_question_count, planned, stored=0):
+        """Counts the stored questions of the desired difficulty towards the target, then determines the highest
+        possible amount of questions that can still be obtained from the api for that difficulty that maximizes the
+        total number of questions and adds the requests for them to planned. Returns the total number of questions
+        stored or planned."""
         amounts = [50, 40, 30, 20, 10]
-        remaining = self.total_question_count[difficulty]
+        db_question_count += min(stored, self.target - db_question_count)
+        remaining = self.total_question_count[difficulty] - stored
         for amount in amounts:
             while db_question_count + amount <= self.target and remaining - amount >= 0:
-                questions = self.request_questions(amount, difficulty)
-                c.executemany("INSERT INTO questions Values (?,?,?,?,?,?)", questions)
+                planned.append((amount, difficulty))
                 remaining -= amount
                 db_question_count += amount
         return db_question_count
 
     def get_random_question(self):
-        """Connects to a database, depending on whether the user could connect to the api or not. Selects a random
-        entry from the questions table, decodes special characters and returns an array containing the contents of the
-        question entry."""
-        if self.online:
-            conn = sqlite3.connect(r"trivia_maze_questions.db")
-        else:
-            conn = sqlite3.connect(r"backup_questions.db")
-        c = conn.cursor()
-        c.execute("SELECT * FROM questions ORDER BY RANDOM() LIMIT 1;")
-        question = []
-        for item in c.fetchone():
-            question.append(html.unescape(item))
-        return question
+        """Draws a random question from the questions table of the database, or from the offline questions if the user
+        could not connect to the api, and returns it as a Question."""
+        return self.sampler().draw()
+
+    def sampler(self):
+        """Returns the question source currently in use: a QuestionSampler limited to the questions of the current game
+        when drawing from the question store, a ServiceSampler in client mode, otherwise the source opened by
+        open_questions for the offline questions.
+        It is opened on first use and kept, along with its connection or mapping, until the database is rebuilt or
+        closed."""
+        if self.service is not None:
+            if self._sampler is None:
+                self._sampler = self.service.sampler(self.category, self.difficulty)
+            return self._sampler
+        database_file = self.database_file if self.online else offline_questions(self.category, self.difficulty,
+                                                                                 self.pack_folder, self.backup_file)
+        if self._sampler is None or self._sampler_file != database_file:
+            self.close()
+            if self.online:
+                where, params = self.question_filter()
+                self._sampler = QuestionSampler(database_file, self.no_repeat, where=where, params=params)
+            else:
+                self._sampler = open_questions(database_file, self.no_repeat)
+            self._sampler_file = database_file
+        return self._sampler
+
+    def close(self):
+        """Closes the connection or mapping held by the question source."""
+        if self._sampler is not None:
+            self._sampler.close()
+            self._sampler = None
 
 # if __name__ == '__main__':
 #     db = SQLDatabase()
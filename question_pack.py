@@ -0,0 +1,214 @@
+"""
+Question packs, a compact read-only file format for offline questions. A pack holds the questions of one category and
+difficulty and is read through mmap, so opening one only parses its header and drawing a question only touches two
+entries of the offset table and the record itself, however many questions the pack holds.
+
+Packs are named with pack_name. A game draws from its difficulty and every easier one, so offline it opens the pack
+of each of those difficulties, for its category or else for any category, together as one PackSet, see find_packs.
+The pack for any category and difficulty, such as the one made from backup_questions.db, is used when there is none
+of them.
+
+Layout, all integers little endian:
+    header      magic b"TMQP", version u16, flags u16, question count u32, category length u16, difficulty length u16
+    names       category and difficulty as UTF-8, an empty category means questions of any category
+    padding     zero bytes up to a multiple of 8
+    offsets     count + 1 u64 offsets of the records, relative to the start of the records
+    records     type, question, correct answer and three incorrect answers as UTF-8 joined by RECORD_SEPARATOR, each
+                record compressed on its own with zlib if the FLAG_ZLIB flag is set
+"""
+import mmap
+import os
+import random
+import re
+import struct
+import threading
+import zlib
+from array import array
+from bisect import bisect_right
+from question_sampler import Question, QuestionSampler
+
+MAGIC = b"TMQP"
+VERSION = 1
+FLAG_ZLIB = 1
+PACK_SUFFIX = ".tmqp"
+RECORD_SEPARATOR = "\x1f"
+# Stands for any category or difficulty in pack names, slugs of real names never start with "_".
+ANY = "_all"
+HEADER = struct.Struct("<4sHHIHH")
+OFFSET = struct.Struct("<QQ")
+
+
+class QuestionPackError(Exception):
+    """Raised when a file is not a question pack or uses a newer version of the format."""
+
+
+def write_pack(pack_file, questions, category="", difficulty="", compress=False):
+    """
+    Writes the questions to pack_file, each question being a sequence of type, question, correct answer and three
+    incorrect answers. The pack is written to a temporary file first and then renamed, so readers never see half a
+    pack. Returns the number of questions written.
+    """
+    records = []
+    for question in questions:
+        record = RECORD_SEPARATOR.join(question).encode("utf-8")
+        records.append(zlib.compress(record) if compress else record)
+    names = category.encode("utf-8") + difficulty.encode("utf-8")
+    header = HEADER.pack(MAGIC, VERSION, FLAG_ZLIB if compress else 0, len(records), len(category.encode("utf-8")),
+                         len(difficulty.encode("utf-8"))) + names
+    header += b"\0" * (-len(header) % 8)
+    offsets = [0]
+    for record in records:
+        offsets.append(offsets[-1] + len(record))
+    temp_file = pack_file + ".tmp"
+    with open(temp_file, 'wb') as handle:
+        handle.write(header)
+        handle.write(struct.pack(f'<{len(offsets)}Q', *offsets))
+        for record in records:
+            handle.write(record)
+    os.replace(temp_file, pack_file)
+    return len(records)
+
+
+def pack_name(category, difficulty):
+    """Returns the file name of the pack for a category and difficulty, None meaning any category or difficulty."""
+    slug = re.sub(r'[^a-z0-9]+', '_', category.lower()).strip("_") if category else ANY
+    return f'{slug}-{difficulty or ANY}{PACK_SUFFIX}'
+
+
+def find_packs(folder, category, difficulties):
+    """Returns the paths of the packs in folder holding the questions of a category and difficulties, for each
+    difficulty the pack for the category or else the pack for any category. Falls back to the pack for any category and
+    difficulty if there is none of them, and returns an empty list if there is not that either."""
+    paths = []
+    for difficulty in difficulties:
+        for name in [pack_name(category, difficulty), pack_name(None, difficulty)]:
+            path = os.path.join(folder, name)
+            if os.path.exists(path):
+                paths.append(path)
+                break
+    if not paths:
+        path = os.path.join(folder, pack_name(None, None))
+        if os.path.exists(path):
+            paths.append(path)
+    return paths
+
+
+def open_questions(path, no_repeat=False):
+    """Opens a question source for the offline questions in path, a QuestionPack for pack files, a QuestionSampler
+    for SQLite files and a PackSet for a list or tuple of pack files."""
+    if isinstance(path, (list, tuple)):
+        return PackSet(path, no_repeat)
+    if path.endswith(PACK_SUFFIX):
+        return QuestionPack(path, no_repeat)
+    return QuestionSampler(path, no_repeat)
+
+
+class QuestionPack:
+    """
+    Draws random questions from a question pack, with the same interface as QuestionSampler. The file is mapped into
+    memory rather than read, so opening a pack takes the same time for any number of questions and only the pages of
+    the questions actually drawn are loaded.
+    In no_repeat mode every question is drawn once before any question is drawn again, using the same one step at a
+    time Fisher-Yates shuffle as QuestionSampler. Its index array is only created on the first draw.
+    path: pack file to read
+    no_repeat: if True, questions are not repeated until all of them have been drawn
+    rng: random.Random used for the draws, a new one is created if None
+    """
+    def __init__(self, path, no_repeat=False, rng=None):
+        self.path = path
+        self.no_repeat = no_repeat
+        self.rng = rng if rng is not None else random.Random()
+        self._lock = threading.Lock()
+        self._order = None
+        with open(path, 'rb') as handle:
+            if os.fstat(handle.fileno()).st_size < HEADER.size:
+                raise QuestionPackError(f'{path} is not a question pack')
+            self._map = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, flags, self.count, category_length, difficulty_length = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC:
+            self._map.close()
+            raise QuestionPackError(f'{path} is not a question pack')
+        if version > VERSION:
+            self._map.close()
+            raise QuestionPackError(f'{path} uses version {version} of the pack format, only {VERSION} is supported')
+        self.compressed = bool(flags & FLAG_ZLIB)
+        start = HEADER.size
+        self.category = self._map[start:start + category_length].decode("utf-8")
+        start += category_length
+        self.difficulty = self._map[start:start + difficulty_length].decode("utf-8")
+        start += difficulty_length
+        self._offsets = start + (-start % 8)
+        self._records = self._offsets + (self.count + 1) * 8
+
+    def __len__(self):
+        return self.count
+
+    def question(self, index):
+        """Returns the question stored at index as a Question."""
+        start, end = OFFSET.unpack_from(self._map, self._offsets + index * 8)
+        record = self._map[self._records + start:self._records + end]
+        if self.compressed:
+            record = zlib.decompress(record)
+        return Question.from_row(record.decode("utf-8").split(RECORD_SEPARATOR))
+
+    def __iter__(self):
+        for index in range(self.count):
+            yield self.question(index)
+
+    def draw(self):
+        """Returns a random question as a Question, or None if the pack is empty."""
+        with self._lock:
+            if not self.count:
+                return None
+            if not self.no_repeat:
+                index = self.rng.randrange(self.count)
+            else:
+                if self._order is None:
+                    self._order = array('I', range(self.count))
+                    self._left = self.count
+                if not self._left:
+                    self._left = self.count
+                i = self.rng.randrange(self._left)
+                self._left -= 1
+                order = self._order
+                order[i], order[self._left] = order[self._left], order[i]
+                index = order[self._left]
+            return self.question(index)
+
+    def close(self):
+        self._map.close()
+
+
+class PackSet(QuestionPack):
+    """
+    Draws random questions from several question packs as if they were one, every question having the same chance,
+    used for the packs of the difficulties a game draws from. Questions are numbered across the packs in order.
+    paths: pack files to read
+    """
+    def __init__(self, paths, no_repeat=False, rng=None):
+        self.paths = list(paths)
+        self.no_repeat = no_repeat
+        self.rng = rng if rng is not None else random.Random()
+        self._lock = threading.Lock()
+        self._order = None
+        self.packs = []
+        try:
+            for path in self.paths:
+                self.packs.append(QuestionPack(path))
+        except Exception:
+            self.close()
+            raise
+        self._starts = []
+        self.count = 0
+        for pack in self.packs:
+            self._starts.append(self.count)
+            self.count += pack.count
+
+    def question(self, index):
+        """Returns the question at index across the packs as a Question."""
+        pack = bisect_right(self._starts, index) - 1
+        return self.packs[pack].question(index - self._starts[pack])
+
+    def close(self):
+        for pack in self.packs:
+            pack.close()
@@ -0,0 +1,96 @@
+import queue
+import threading
+from question_sampler import Question
+from question_database import BACKUP_FILE
+from question_pack import open_questions
+
+
+class QuestionPrefetcher:
+    """
+    Keeps a bounded queue of Question records ready for the game, filled by a background thread, so starting a game
+    and opening a door never wait on the trivia api. The thread creates the question database, builds it and feeds
+    the queue with every batch of questions as soon as it has been fetched, then keeps the queue topped up from the
+    question store. The questions offered from the batches are skipped once when the store draws them, so a game asks
+    every question once before repeating any when the store does not repeat questions either. Until the first questions
+    arrive, get_random_question falls back to the offline backup questions.
+    make_database: callable returning the SQLDatabase to fetch from, called on the background thread because creating
+    it may query the api
+    size: maximum number of questions kept ready
+    backup_file: SQLite file, question pack or tuple of packs, see offline_questions, with the questions used while the
+    queue is empty
+    """
+    def __init__(self, make_database, size=20, backup_file=BACKUP_FILE):
+        self.make_database = make_database
+        self.ready = queue.Queue(maxsize=size)
+        self.backup_file = backup_file
+        self.built = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._backup = None
+        self._offered = set()
+
+    def start(self):
+        """Starts the background thread, returns immediately."""
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def get_random_question(self):
+        """Returns a ready question without blocking, taken from the queue or from the backup questions if the queue
+        is empty."""
+        try:
+            return self.ready.get_nowait()
+        except queue.Empty:
+            pass
+        if self._backup is None:
+            self._backup = open_questions(self.backup_file)
+        return self._backup.draw()
+
+    def close(self):
+        """Stops the background thread. The requests for questions that were not sent yet are cancelled and the
+        responses still coming in are dropped, the thread closes the question database itself, so this never waits on
+        the api."""
+        self._stop.set()
+        if self._backup is not None:
+            self._backup.close()
+            self._backup = None
+
+    def _run(self):
+        database = None
+        try:
+            database = self.make_database()
+            database.build_database(on_batch=self._offer, should_stop=self._stop.is_set)
+            self.built.set()
+            if self._stop.is_set():
+                return
+            sampler = database.sampler()
+            if not len(sampler):
+                return
+            while not self._stop.is_set():
+                question = sampler.draw()
+                key = (question.text, question.correct_answer)
+                if key in self._offered:
+                    self._offered.discard(key)
+                    continue
+                while not self._stop.is_set():
+                    try:
+                        self.ready.put(question, timeout=0.1)
+                        break
+                    except queue.Full:
+                        pass
+        finally:
+            self.built.set()
+            if database is not None:
+                database.close()
+
+    def _offer(self, questions):
+        """Adds a freshly fetched batch of questions to the queue, as many as fit, and remembers them."""
+        for question in questions:
+            if self._stop.is_set():
+                return
+            question = Question.from_row(question[3:])
+            try:
+                self.ready.put_nowait(question)
+            except queue.Full:
+                return
+            self._offered.add((question.text, question.correct_answer))
+
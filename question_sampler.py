@@ -0,0 +1,66 @@
+import random
+import sqlite3
+import threading
+from array import array
+from collections import namedtuple
+
+COLUMNS = "type, question, correct_answer, incorrect1, incorrect2, incorrect3"
+
+
+class Question(namedtuple('Question', ['type', 'text', 'correct_answer', 'answers'])):
+    """A question ready to be asked, with decoded text. answers holds every answer choice, the correct answer first."""
+    __slots__ = ()
+
+    @classmethod
+    def from_row(cls, row):
+        """Creates a Question from the type, question, correct answer and incorrect answer columns of a stored
+        question, empty incorrect answers are left out."""
+        question_type, text, correct_answer, *incorrect = row
+        return cls(question_type, text, correct_answer, (correct_answer, *(answer for answer in incorrect if answer)))
+
+
+class QuestionSampler:
+    """
+    Draws random rows from the questions table of an SQLite file over one long-lived connection. The rowids of the
+    table are read once when the sampler is created, after that every draw picks a rowid in O(1) and fetches that
+    single row by its primary key, instead of sorting the whole table with ORDER BY RANDOM().
+    In no_repeat mode every question is drawn once before any question is drawn again. This uses a Fisher-Yates
+    shuffle done one draw at a time, so there is no upfront shuffle and each draw stays O(1).
+    database_file: SQLite file holding the questions table
+    no_repeat: if True, questions are not repeated until all of them have been drawn
+    rng: random.Random used for the draws, a new one is created if None
+    where, params: optional WHERE clause and parameters limiting which questions are drawn
+    """
+    def __init__(self, database_file, no_repeat=False, rng=None, where=None, params=()):
+        self.database_file = database_file
+        self.no_repeat = no_repeat
+        self.rng = rng if rng is not None else random.Random()
+        self.conn = sqlite3.connect(database_file, check_same_thread=False)
+        self._lock = threading.Lock()
+        query = "SELECT rowid FROM questions" + (" WHERE " + where if where else "")
+        self._rowids = array('q', (row[0] for row in self.conn.execute(query, params)))
+        self._left = len(self._rowids)
+
+    def __len__(self):
+        return len(self._rowids)
+
+    def draw(self):
+        """Returns a random question as a Question, or None if there are no questions to draw from."""
+        with self._lock:
+            if not self._rowids:
+                return None
+            if not self.no_repeat:
+                rowid = self._rowids[self.rng.randrange(len(self._rowids))]
+            else:
+                if not self._left:
+                    self._left = len(self._rowids)
+                i = self.rng.randrange(self._left)
+                self._left -= 1
+                rowids = self._rowids
+                rowids[i], rowids[self._left] = rowids[self._left], rowids[i]
+                rowid = rowids[self._left]
+            row = self.conn.execute("SELECT " + COLUMNS + " FROM questions WHERE rowid = ?", (rowid,)).fetchone()
+        return Question.from_row(row)
+
+    def close(self):
+        self.conn.close()
@@ -0,0 +1,271 @@
+"""
+Local question service. One server process owns the question store and the connection to the trivia api, and many
+games draw questions from it, so the store is only written by one process and a warm store feeds every game.
+
+The protocol is one json object per line in each direction over a localhost TCP connection. A request names an op:
+    {"op": "categories"}
+        -> {"categories": {name: id, ...} or null}
+    {"op": "prepare", "category": ..., "difficulty": ..., "target": ...}
+        -> {"count": number of questions available, "online": true/false}
+    {"op": "draw", "category": ..., "difficulty": ..., "count": ...}
+        -> {"questions": [[type, text, correct answer, [answers]], ...]}
+Failed requests are answered with {"error": message}.
+
+Example, from the repository root:
+    python question_server.py --port 47613
+and in the games:
+    SQLDatabase(category, difficulty, target, service=QuestionServiceClient(port=47613))
+"""
+import argparse
+import asyncio
+import json
+import queue
+import socket
+import threading
+from collections import deque
+
+from question_database import SQLDatabase
+from question_sampler import Question
+
+DEFAULT_PORT = 47613
+
+
+class QuestionServiceError(Exception):
+    """Raised when the question service cannot be reached or answers a request with an error."""
+
+
+class QuestionServer:
+    """
+    asyncio server handing out questions to game clients. Keeps one SQLDatabase per category and difficulty, all
+    writing to the same question store, built the first time a game asks for them and rebuilt when a game needs more
+    questions. Builds run one at a time on a worker thread, so clients keep being served while the api is queried.
+    Every database asks each of its questions once before repeating any, across all the clients drawing from it.
+    make_database: callable taking category, difficulty and target and returning the SQLDatabase to serve
+    host, port: address to listen on, port 0 picks a free port
+    """
+    def __init__(self, make_database=None, host="127.0.0.1", port=DEFAULT_PORT):
+        self.make_database = make_database if make_database is not None else self._default_database
+        self.host = host
+        self.port = port
+        self.databases = {}
+        self._targets = {}
+        self._build_lock = None
+        self._server = None
+        self._loop = None
+        self._thread = None
+
+    @staticmethod
+    def _default_database(category, difficulty, target):
+        return SQLDatabase(category, difficulty, target, no_repeat=True)
+
+    async def start(self):
+        """Starts listening, the port actually used is stored in port."""
+        self._build_lock = asyncio.Lock()
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def serve_forever(self):
+        await self.start()
+        async with self._server:
+            await self._server.serve_forever()
+
+    def start_background(self):
+        """Runs the server on an event loop in a daemon thread and returns once it is listening."""
+        started = threading.Event()
+
+        def run():
+            self._loop = asyncio.new_event_loop()
+            self._loop.run_until_complete(self.start())
+            started.set()
+            self._loop.run_forever()
+            self._server.close()
+            tasks = asyncio.all_tasks(self._loop)
+            for task in tasks:
+                task.cancel()
+            self._loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+            self._loop.run_until_complete(self._server.wait_closed())
+            self._loop.close()
+
+        self._thread = threading.Thread(target=run, daemon=True)
+        self._thread.start()
+        started.wait()
+        return self
+
+    def stop(self):
+        """Stops a server started with start_background and closes its databases."""
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        for database in self.databases.values():
+            database.close()
+
+    async def _handle(self, reader, writer):
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    response = await self._respond(json.loads(line))
+                except Exception as e:
+                    response = {"error": f'{type(e).__name__}: {e}'}
+                writer.write(json.dumps(response).encode("utf-8") + b"\n")
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def _respond(self, request):
+        op = request.get("op")
+        if op == "categories":
+            return {"categories": await self._categories()}
+        if op == "prepare":
+            database = await self._prepare(request.get("category"), request["difficulty"], request.get("target", 0))
+            return {"count": len(database.sampler()), "online": database.online}
+        if op == "draw":
+            database = await self._prepare(request.get("category"), request["difficulty"], 0)
+            questions = [database.get_random_question() for _ in range(request.get("count", 1))]
+            return {"questions": [[question.type, question.text, question.correct_answer, question.answers]
+                                  for question in questions if question is not None]}
+        raise ValueError(f'unknown op {op!r}')
+
+    async def _categories(self):
+        loop = asyncio.get_running_loop()
+        database = await loop.run_in_executor(None, self.make_database, None, "easy", 0)
+        return database.category_list
+
+    async def _prepare(self, category, difficulty, target):
+        """Returns the database for the category and difficulty, building it first if it has never been built or was
+        built for a smaller target."""
+        key = (category, difficulty)
+        if key in self.databases and target <= self._targets[key]:
+            return self.databases[key]
+        async with self._build_lock:
+            if key not in self.databases or target > self._targets[key]:
+                loop = asyncio.get_running_loop()
+                database = await loop.run_in_executor(None, self._build, category, difficulty, target)
+                old = self.databases.get(key)
+                self.databases[key] = database
+                self._targets[key] = target
+                if old is not None:
+                    old.close()
+        return self.databases[key]
+
+    def _build(self, category, difficulty, target):
+        database = self.make_database(category, difficulty, target)
+        database.build_database()
+        return database
+
+
+class QuestionServiceClient:
+    """
+    Client for a QuestionServer, safe to share between threads and sessions. Keeps up to pool_size connections open
+    and reuses them, a request takes an idle connection or opens a new one while fewer than pool_size are in use.
+    host, port: address of the server
+    pool_size: maximum number of connections open at once
+    timeout: seconds to wait for the server before a request fails, building a database may take a while
+    """
+    def __init__(self, host="127.0.0.1", port=DEFAULT_PORT, pool_size=4, timeout=120):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(pool_size)
+
+    def request(self, op, **fields):
+        """Sends a request and returns the decoded response. Raises QuestionServiceError if the server cannot be
+        reached or answers with an error."""
+        fields["op"] = op
+        with self._slots:
+            try:
+                connection = self._idle.get_nowait()
+            except queue.Empty:
+                connection = None
+            try:
+                if connection is None:
+                    sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+                    connection = sock, sock.makefile('rb')
+                connection[0].sendall(json.dumps(fields).encode("utf-8") + b"\n")
+                line = connection[1].readline()
+                if not line:
+                    raise ConnectionError("the question service closed the connection")
+            except OSError as e:
+                if connection is not None:
+                    self._discard(connection)
+                raise QuestionServiceError(f'question service at {self.host}:{self.port}: {e}') from e
+            self._idle.put(connection)
+        response = json.loads(line)
+        if "error" in response:
+            raise QuestionServiceError(response["error"])
+        return response
+
+    def categories(self):
+        return self.request("categories")["categories"]
+
+    def prepare(self, category, difficulty, target):
+        """Asks the server to make at least target questions available, returns the response."""
+        return self.request("prepare", category=category, difficulty=difficulty, target=target)
+
+    def draw(self, category, difficulty, count):
+        """Returns a list of up to count Question records."""
+        questions = self.request("draw", category=category, difficulty=difficulty, count=count)["questions"]
+        return [Question(question_type, text, correct_answer, tuple(answers))
+                for question_type, text, correct_answer, answers in questions]
+
+    def sampler(self, category, difficulty, batch_size=10):
+        return ServiceSampler(self, category, difficulty, batch_size)
+
+    def close(self):
+        """Closes the idle connections."""
+        while True:
+            try:
+                self._discard(self._idle.get_nowait())
+            except queue.Empty:
+                return
+
+    @staticmethod
+    def _discard(connection):
+        connection[1].close()
+        connection[0].close()
+
+
+class ServiceSampler:
+    """Question source drawing from a QuestionServer with the interface of QuestionSampler. Questions are fetched
+    batch_size at a time, so most draws do not touch the network."""
+    def __init__(self, client, category, difficulty, batch_size=10):
+        self.client = client
+        self.category = category
+        self.difficulty = difficulty
+        self.batch_size = batch_size
+        self._ready = deque()
+        self._lock = threading.Lock()
+        self.count = client.prepare(category, difficulty, 0)["count"]
+
+    def __len__(self):
+        return self.count
+
+    def draw(self):
+        """Returns a question as a Question, or None if the server has no questions to give."""
+        with self._lock:
+            if not self._ready:
+                self._ready.extend(self.client.draw(self.category, self.difficulty, self.batch_size))
+            return self._ready.popleft() if self._ready else None
+
+    def close(self):
+        self._ready.clear()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve trivia questions to trivia maze games.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    args = parser.parse_args()
+    server = QuestionServer(host=args.host, port=args.port)
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
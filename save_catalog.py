@@ -0,0 +1,195 @@
+"""
+Save catalog, an SQLite index of the saved games. Each save has a row with what the load screen shows, its name, the
+summary from its header and a small thumbnail of the maze, so the load screen reads one page of rows through an index
+instead of opening save files, however many saves there are. The catalog is written after each save, see
+SaveCatalog.prepare_entry.
+"""
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import namedtuple
+from maze import format_time
+from save_format import SAVE_SUFFIX, JOURNAL_SUFFIX, read_header, save_path
+
+SAVE_FOLDER = "saves"
+CATALOG_FILE = "catalog.db"
+LEGACY_SLOTS = ["save_file_1", "save_file_2", "save_file_3"]
+PAGE_SIZE = 5
+THUMBNAIL_SIZE = 32
+UNVISITED, VISITED, PLAYER, EXIT = 0, 1, 2, 3
+SORTS = {
+    "recent": "saved_at DESC, rowid DESC",
+    "oldest": "saved_at, rowid",
+    "name": "name COLLATE NOCASE, rowid",
+    "time": "time_elapsed DESC, rowid DESC",
+    "size": "rows * cols DESC, rowid DESC",
+}
+ENTRY_COLUMNS = "filename, name, rows, cols, difficulty, category, player_row, player_col, time_elapsed, saved_at, " \
+                "thumb_width, thumb_height, thumbnail"
+
+Thumbnail = namedtuple('Thumbnail', 'width height pixels')
+SavePage = namedtuple('SavePage', 'entries number more')
+
+
+class SaveEntry(namedtuple('SaveEntry', 'filename name rows cols difficulty category position time_elapsed saved_at '
+                                        'thumbnail')):
+    """A save listed in the catalog. position is [row, col], saved_at the time of the last save as returned by
+    time.time() and thumbnail a Thumbnail or None."""
+    __slots__ = ()
+
+    @classmethod
+    def from_row(cls, row):
+        (filename, name, rows, cols, difficulty, category, player_row, player_col, time_elapsed, saved_at, width,
+         height, pixels) = row
+        thumbnail = Thumbnail(width, height, pixels) if pixels is not None else None
+        return cls(filename, name, rows, cols, difficulty, category, [player_row, player_col], time_elapsed, saved_at,
+                   thumbnail)
+
+    def get_time(self):
+        return format_time(self.time_elapsed)
+
+
+def make_thumbnail(rows, cols, visited, position, size=THUMBNAIL_SIZE):
+    """
+    Returns a Thumbnail of a maze at most size pixels wide and high, one byte per pixel. A pixel covers a block of
+    rooms and is VISITED if any of them was visited, UNVISITED otherwise, the pixels holding the player and the exit
+    are PLAYER and EXIT.
+    rows, cols: size of the maze
+    visited: bytes with one entry per room indexed by row * cols + col, 1 for visited rooms, as in Maze._visited
+    position: [row, col] of the player
+    """
+    width, height = min(cols, size), min(rows, size)
+    pixels = bytearray(width * height)
+    for y in range(height):
+        for row in range(y * rows // height, (y + 1) * rows // height):
+            start = row * cols
+            for x in range(width):
+                pixel = y * width + x
+                if not pixels[pixel] and 1 in visited[start + x * cols // width:start + (x + 1) * cols // width]:
+                    pixels[pixel] = VISITED
+    pixels[-1] = EXIT
+    pixels[position[0] * height // rows * width + position[1] * width // cols] = PLAYER
+    return Thumbnail(width, height, bytes(pixels))
+
+
+class SaveCatalog:
+    """
+    Index of the saved games in folder, kept in an SQLite file in the same folder over one connection that can be
+    shared between threads. Saves are identified by their file name.
+    folder: folder holding the saves and the catalog, created if needed
+    catalog_file: name of the catalog file in folder
+    """
+    def __init__(self, folder=SAVE_FOLDER, catalog_file=CATALOG_FILE):
+        self.folder = folder
+        os.makedirs(folder, exist_ok=True)
+        self.conn = sqlite3.connect(os.path.join(folder, catalog_file), check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self.conn:
+            self.conn.execute("CREATE TABLE IF NOT EXISTS saves (filename TEXT PRIMARY KEY, name TEXT, rows INTEGER, "
+                              "cols INTEGER, difficulty TEXT, category TEXT, player_row INTEGER, player_col INTEGER, "
+                              "time_elapsed INTEGER, saved_at REAL, thumb_width INTEGER, thumb_height INTEGER, "
+                              "thumbnail BLOB)")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS saves_by_saved_at ON saves (saved_at)")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS saves_by_name ON saves (name COLLATE NOCASE)")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS saves_by_time ON saves (time_elapsed)")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS saves_by_size ON saves (rows * cols)")
+
+    def new_filename(self):
+        """Returns the file name for a new save, unique without asking the catalog."""
+        return os.path.join(self.folder, uuid.uuid4().hex + SAVE_SUFFIX)
+
+    def prepare_entry(self, filename, maze, name=None):
+        """Copies what the catalog shows of the maze and returns a function without arguments that writes it to the
+        catalog entry of filename, so the entry can be written on another thread after the save, see SaveWorker. A
+        save that is already listed keeps its name unless name is given, a new one is named after the time it was
+        first saved."""
+        rows, cols, position = maze.rows, maze.cols, list(maze.player_location)
+        summary = (rows, cols, maze.difficulty, maze.category, position, maze._time_elapsed)
+        visited = bytes(maze._visited)
+
+        def write():
+            self.record(filename, *summary, thumbnail=make_thumbnail(rows, cols, visited, position), name=name)
+        return write
+
+    def record(self, filename, rows, cols, difficulty, category, position, time_elapsed, thumbnail=None, name=None,
+               saved_at=None):
+        """Adds the save in filename to the catalog, or updates its entry."""
+        saved_at = time.time() if saved_at is None else saved_at
+        default_name = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(saved_at))
+        width, height, pixels = thumbnail if thumbnail is not None else (None, None, None)
+        with self._lock, self.conn:
+            self.conn.execute(
+                "INSERT INTO saves (" + ENTRY_COLUMNS + ") VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (filename) DO UPDATE SET name = COALESCE(?, name), rows = excluded.rows, "
+                "cols = excluded.cols, difficulty = excluded.difficulty, category = excluded.category, "
+                "player_row = excluded.player_row, player_col = excluded.player_col, "
+                "time_elapsed = excluded.time_elapsed, saved_at = excluded.saved_at, "
+                "thumb_width = excluded.thumb_width, thumb_height = excluded.thumb_height, "
+                "thumbnail = excluded.thumbnail",
+                (filename, name or default_name, rows, cols, difficulty, category, position[0], position[1],
+                 time_elapsed, saved_at, width, height, pixels, name))
+
+    def page(self, number=0, size=PAGE_SIZE, sort="recent", search=None):
+        """
+        Returns page number, counting from 0, of the saves as a SavePage, whose more field tells if there is a page
+        after it. Only the rows of the page are read, through the index of the sort order.
+        sort: one of the keys of SORTS
+        search: text the name, category or difficulty of the saves listed must contain, ignoring case
+        """
+        if sort not in SORTS:
+            raise ValueError(f'Unknown sort order: {sort}')
+        query = "SELECT " + ENTRY_COLUMNS + " FROM saves"
+        params = []
+        if search:
+            pattern = "%" + search.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+            query += " WHERE name LIKE ? ESCAPE '\\' OR category LIKE ? ESCAPE '\\' OR difficulty LIKE ? ESCAPE '\\'"
+            params = [pattern] * 3
+        query += " ORDER BY " + SORTS[sort] + " LIMIT ? OFFSET ?"
+        params += [size + 1, number * size]
+        with self._lock:
+            rows = self.conn.execute(query, params).fetchall()
+        return SavePage([SaveEntry.from_row(row) for row in rows[:size]], number, len(rows) > size)
+
+    def get(self, filename):
+        """Returns the SaveEntry of filename, or None if it is not in the catalog."""
+        with self._lock:
+            row = self.conn.execute("SELECT " + ENTRY_COLUMNS + " FROM saves WHERE filename = ?",
+                                    (filename,)).fetchone()
+        return SaveEntry.from_row(row) if row is not None else None
+
+    def rename(self, filename, name):
+        with self._lock, self.conn:
+            self.conn.execute("UPDATE saves SET name = ? WHERE filename = ?", (name, filename))
+
+    def delete(self, filename):
+        """Removes the save in filename from the catalog and deletes its files."""
+        with self._lock, self.conn:
+            self.conn.execute("DELETE FROM saves WHERE filename = ?", (filename,))
+        for path in [filename, filename + JOURNAL_SUFFIX]:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def import_saves(self, names=LEGACY_SLOTS):
+        """Adds the saves of the fixed save slots of older versions of the game that are not in the catalog yet, names
+        being the save files without their extension. They are listed under their slot name, without a thumbnail.
+        Returns the number of saves added."""
+        added = 0
+        for name in names:
+            filename = save_path(name)
+            if not os.path.exists(filename) or self.get(filename) is not None:
+                continue
+            try:
+                header = read_header(filename)
+            except Exception as e:
+                print(f'{filename} could not be added to the save catalog: {e}')
+                continue
+            self.record(filename, *header, name=os.path.basename(name), saved_at=os.path.getmtime(filename))
+            added += 1
+        return added
+
+    def close(self):
+        self.conn.close()
@@ -0,0 +1,414 @@
+"""
+Save files. A save starts with a small fixed header holding what the load menu shows, the size of the maze, the
+difficulty, the category, the player's position and the time played, so listing saves never decodes a maze. The body
+after it holds the state of every room packed into bytes, one byte of door flags and one byte of answer states per
+room as in CompactGrid, followed by the visited rooms, the locked doors and the journal of the game, see Maze.replay.
+
+Layout, all integers little endian:
+    header      magic b"TMSV", version u16, flags u16, rows u32, columns u32, player row u32, player column u32,
+                time played in seconds u64, difficulty length u16, category length u16, snapshot id u64
+    names       difficulty and category as UTF-8
+    body        zlib compressed:
+                compact u8, maze seed i64, layout seed i64, layout length u16, visited count u32, locked count u32,
+                journal length u32, layout as UTF-8, door flags and answer states of every room by row * cols + col,
+                the visited rooms as u32 room indexes in the order they were entered, the locked doors as u32 room
+                index * 4 + the position of the direction in DOOR_BITS, the journal records
+The seeds are only meaningful if their FLAG_MAZE_SEED and FLAG_SEED flags are set, a category is only stored if
+FLAG_CATEGORY is set. Version 1 saves have no snapshot id and no journal.
+
+A save file is a snapshot of the game. Saving the same game again appends the journal records made since then to a
+journal file next to it, so a save only writes what changed, and loading replays them on the snapshot. SaveJournal
+decides between the two and writes a new snapshot, which empties the journal, once enough records have piled up.
+
+Journal layout, all integers little endian:
+    header      magic b"TMJL", version u16, flags u16, id of the snapshot the journal belongs to u64
+    chunks      one per save: record count u32, the records, then time played in seconds u64, player row u32,
+                player column u32 and the end marker b"TMJE"
+A journal whose snapshot id does not match its save file is left over from an older snapshot and ignored, as is a
+chunk that was cut short.
+
+Saves made by older versions of the game are pickled Maze objects, read_header and read_save still read them.
+"""
+import os
+import pickle
+import random
+import struct
+import sys
+import zlib
+from array import array
+from collections import namedtuple
+from compact_grid import CompactGrid, DOOR_BITS, ANSWER_SHIFTS, ANSWER_STATES
+from maze import Maze, Room, format_time
+
+MAGIC = b"TMSV"
+VERSION = 2
+FLAG_CATEGORY = 1
+FLAG_MAZE_SEED = 2
+FLAG_SEED = 4
+SAVE_SUFFIX = ".tmsave"
+PICKLE_SUFFIX = ".pkl"
+JOURNAL_SUFFIX = ".journal"
+JOURNAL_MAGIC = b"TMJL"
+JOURNAL_VERSION = 1
+CHUNK_END = b"TMJE"
+COMPACT_AFTER = 4096
+HEADER_V1 = struct.Struct("<4sHHIIIIQHH")
+HEADER = struct.Struct("<4sHHIIIIQHHQ")
+BODY_V1 = struct.Struct("<BqqHII")
+BODY = struct.Struct("<BqqHIII")
+JOURNAL_HEADER = struct.Struct("<4sHHQ")
+CHUNK = struct.Struct("<I")
+TRAILER = struct.Struct("<QII4s")
+DIRECTIONS = list(DOOR_BITS)
+ANSWER_CODES = [packed for packed in range(256)
+                if all((packed >> shift) & 3 < len(ANSWER_STATES) for shift in ANSWER_SHIFTS.values())]
+
+
+class SaveFormatError(Exception):
+    """Raised when a file is not a save file or uses a newer version of the format."""
+
+
+class SaveHeader(namedtuple('SaveHeader', 'rows cols difficulty category position time_elapsed')):
+    """Summary of a save read from its header, position is [row, col] and time_elapsed the seconds played."""
+    __slots__ = ()
+
+    def get_time(self):
+        return format_time(self.time_elapsed)
+
+
+def save_path(name):
+    """Returns the file of the save called name, its save file if there is one, otherwise the pickle file written by
+    older versions of the game if there is one, otherwise the save file to write."""
+    if not os.path.exists(name + SAVE_SUFFIX) and os.path.exists(name + PICKLE_SUFFIX):
+        return name + PICKLE_SUFFIX
+    return name + SAVE_SUFFIX
+
+
+def write_save(filename, maze):
+    """Writes a snapshot of the maze to filename and removes its journal file, returns the id of the snapshot. The
+    save is written to a temporary file first and then renamed, so an interrupted save never replaces a good one with
+    half a file."""
+    snapshot, write = prepare_save(filename, maze)
+    write()
+    return snapshot
+
+
+def prepare_save(filename, maze):
+    """
+    Splits write_save in two. Copies the state of the maze into bytes and returns the id of the snapshot and a function
+    without arguments that compresses them and writes them to filename. Only the function touches the file, and it
+    no longer reads the maze, so it can be called on another thread while the game goes on.
+    """
+    if maze.compact:
+        doors, answers = bytes(maze.grid.doors), bytes(maze.grid.answers)
+    else:
+        door_flags = {tuple(_door_states(flags).values()): flags for flags in range(16)}
+        answer_flags = {tuple(_answer_states(packed).values()): packed for packed in ANSWER_CODES}
+        doors = bytes(door_flags[tuple(room.doors()[direction] for direction in DIRECTIONS)]
+                      for row in maze.grid for room in row)
+        answers = bytes(answer_flags[tuple(room.answers[direction] for direction in DIRECTIONS)]
+                        for row in maze.grid for room in row)
+    visited = array('I', (room.position[0] * maze.cols + room.position[1] for room in maze.visited_rooms))
+    locked = array('I', ((row * maze.cols + col) * 4 + DIRECTIONS.index(direction)
+                         for row, col, direction in maze.locked_doors))
+    layout = (maze.layout or "").encode("utf-8")
+    body = [BODY.pack(maze.compact, maze.maze_seed or 0, maze._seed or 0, len(layout), len(visited), len(locked),
+                      len(maze.journal)), layout, doors, answers, _little_endian(visited), _little_endian(locked),
+            bytes(maze.journal)]
+    flags = 0
+    for flag, value in [(FLAG_CATEGORY, maze.category), (FLAG_MAZE_SEED, maze.maze_seed), (FLAG_SEED, maze._seed)]:
+        if value is not None:
+            flags |= flag
+    difficulty = maze.difficulty.encode("utf-8")
+    category = (maze.category or "").encode("utf-8")
+    snapshot = random.getrandbits(64) | 1
+    header = HEADER.pack(MAGIC, VERSION, flags, maze.rows, maze.cols, maze.player_location[0],
+                         maze.player_location[1], maze._time_elapsed, len(difficulty), len(category), snapshot)
+
+    def write():
+        _replace(filename, header + difficulty + category + zlib.compress(b"".join(body)))
+        try:
+            os.remove(filename + JOURNAL_SUFFIX)
+        except FileNotFoundError:
+            pass
+    return snapshot, write
+
+
+def append_journal(filename, maze, snapshot, records):
+    """Appends records, journal records of the maze made since it was last saved, to the journal of the save file
+    filename, together with the time played and the player's position. snapshot is the id returned by write_save for
+    the snapshot in filename, a journal left over from another snapshot is started over."""
+    prepare_append(filename, maze, snapshot, records)()
+
+
+def prepare_append(filename, maze, snapshot, records):
+    """Splits append_journal in two like prepare_save, returns a function without arguments that appends the records
+    to the journal."""
+    chunk = CHUNK.pack(len(records)) + bytes(records) + TRAILER.pack(maze._time_elapsed, maze.player_location[0],
+                                                                     maze.player_location[1], CHUNK_END)
+
+    def write():
+        path = filename + JOURNAL_SUFFIX
+        try:
+            with open(path, 'rb') as handle:
+                current = _journal_snapshot(handle)
+        except FileNotFoundError:
+            current = None
+        if current != snapshot:
+            _replace(path, JOURNAL_HEADER.pack(JOURNAL_MAGIC, JOURNAL_VERSION, 0, snapshot) + chunk)
+            return
+        with open(path, 'ab') as handle:
+            handle.write(chunk)
+            handle.flush()
+            os.fsync(handle.fileno())
+    return write
+
+
+class SaveJournal:
+    """
+    Keeps one save file up to date with a game. The first save writes a snapshot, later saves of the same game only
+    append the journal records made since the previous save, until more than compact_after records have been appended
+    since the snapshot and the next save writes a new snapshot instead, so loading never replays more than that many
+    records. A maze that was constructed again or replaced by another one also gets a new snapshot.
+    filename: save file to keep up to date
+    compact_after: number of appended journal records after which a new snapshot is written
+    """
+    def __init__(self, filename, compact_after=COMPACT_AFTER):
+        self.filename = filename
+        self.compact_after = compact_after
+        self.snapshot = None
+        self._grid = None
+        self._base = 0
+        self._written = 0
+
+    def save(self, maze):
+        """Saves the maze, returns True if a snapshot was written and False if the journal was appended to."""
+        snapshot, write = self.prepare(maze)
+        write()
+        return snapshot
+
+    def prepare(self, maze):
+        """Splits save in two like prepare_save. Returns whether the save is a snapshot and the function writing it.
+        The functions returned must be called in order. If one fails, the next save writes a snapshot."""
+        length = len(maze.journal)
+        if self.snapshot is None or maze.grid is not self._grid or length < self._written \
+                or length - self._base > self.compact_after:
+            self.snapshot, write = prepare_save(self.filename, maze)
+            self._grid = maze.grid
+            self._base = self._written = length
+            snapshot = True
+        else:
+            write = prepare_append(self.filename, maze, self.snapshot, maze.journal[self._written:])
+            self._written = length
+            snapshot = False
+
+        def write_or_reset():
+            try:
+                write()
+            except Exception:
+                self.snapshot = None
+                raise
+        return snapshot, write_or_reset
+
+
+def read_header(filename):
+    """Returns the SaveHeader of a save file, reading only its header. A pickle save is read in full. Raises
+    FileNotFoundError if there is no such file and SaveFormatError if it is not a save."""
+    with open(filename, 'rb') as handle:
+        header = handle.read(HEADER.size)
+        if not header.startswith(MAGIC):
+            maze = _unpickle(filename, header + handle.read())
+            return SaveHeader(maze.rows, maze.cols, maze.difficulty, maze.category, list(maze.player_location),
+                              maze._time_elapsed)
+        fields, size = _unpack_header(filename, header)
+        handle.seek(size)
+        header = _save_header(fields, handle.read(fields[8] + fields[9]))
+    latest = _journal_tail(filename, fields[10])
+    if latest is not None:
+        header = header._replace(time_elapsed=latest[0], position=[latest[1], latest[2]])
+    return header
+
+
+def read_save(filename):
+    """Returns the Maze saved in filename, in a save file or a pickle save. Raises FileNotFoundError if there is no
+    such file and SaveFormatError if it is not a save. The records in the journal of a save file are replayed on its
+    snapshot."""
+    with open(filename, 'rb') as handle:
+        data = handle.read()
+    if not data.startswith(MAGIC):
+        return _unpickle(filename, data)
+    fields, start = _unpack_header(filename, data)
+    header = _save_header(fields, data[start:start + fields[8] + fields[9]])
+    flags = fields[2]
+    body = zlib.decompress(data[start + fields[8] + fields[9]:])
+    if fields[1] == 1:
+        compact, maze_seed, seed, layout_length, visited_count, locked_count = BODY_V1.unpack_from(body, 0)
+        journal_length, start = 0, BODY_V1.size
+    else:
+        compact, maze_seed, seed, layout_length, visited_count, locked_count, journal_length = BODY.unpack_from(body, 0)
+        start = BODY.size
+    rows, cols = header.rows, header.cols
+    size = rows * cols
+    layout = body[start:start + layout_length].decode("utf-8") or None
+    start += layout_length
+    doors, answers = body[start:start + size], body[start + size:start + 2 * size]
+    start += 2 * size
+    visited = _read_cells(body, start, visited_count)
+    locked = _read_cells(body, start + visited_count * 4, locked_count)
+
+    maze = Maze(rows, cols, compact=bool(compact))
+    maze.set_difficulty(header.difficulty)
+    maze.set_category(header.category)
+    maze.set_layout(layout, seed if flags & FLAG_SEED else None)
+    maze.maze_seed = maze_seed if flags & FLAG_MAZE_SEED else None
+    if compact:
+        maze.grid = CompactGrid(rows, cols)
+        maze.grid.doors[:] = doors
+        maze.grid.answers[:] = answers
+    else:
+        door_states = [_door_states(flags) for flags in range(16)]
+        answer_states = {packed: _answer_states(packed) for packed in ANSWER_CODES}
+        maze.grid = [[Room(r, c) for c in range(cols)] for r in range(rows)]
+        for row in maze.grid:
+            for room in row:
+                cell = room.position[0] * cols + room.position[1]
+                room.doors().update(door_states[doors[cell]])
+                room.answers.update(answer_states[answers[cell]])
+    maze.build_adjacency()
+    maze.exit = maze.get_room(rows - 1, cols - 1)
+    maze._player_location = header.position
+    maze._visited = bytearray(size)
+    for cell in visited:
+        maze._visited[cell] = 1
+        maze.visited_rooms.append(maze.get_room(*divmod(cell, cols)))
+    maze.locked_doors = [divmod(cell, cols) + (DIRECTIONS[direction],)
+                         for cell, direction in (divmod(door, 4) for door in locked)]
+    start += (visited_count + locked_count) * 4
+    maze.journal = bytearray(body[start:start + journal_length])
+    maze._time_elapsed = header.time_elapsed
+    for records, time_elapsed, row, col in _journal_chunks(filename, fields[10]):
+        maze.replay(records)
+        if maze.player_location != [row, col]:
+            raise SaveFormatError(f'the journal of {filename} does not match its save')
+        maze._time_elapsed = time_elapsed
+    return maze
+
+
+def _door_states(flags):
+    return {direction: bool(flags & DOOR_BITS[direction]) for direction in DIRECTIONS}
+
+
+def _answer_states(packed):
+    return {direction: ANSWER_STATES[(packed >> ANSWER_SHIFTS[direction]) & 3] for direction in DIRECTIONS}
+
+
+def _unpack_header(filename, data):
+    """Returns the header fields, with a snapshot id of 0 for version 1, and the size of the header."""
+    if len(data) < HEADER_V1.size:
+        raise SaveFormatError(f'{filename} is not a save file')
+    version = HEADER_V1.unpack_from(data, 0)[1]
+    if version > VERSION:
+        raise SaveFormatError(f'{filename} uses version {version} of the save format, only {VERSION} is supported')
+    if version == 1:
+        return HEADER_V1.unpack_from(data, 0) + (0,), HEADER_V1.size
+    if len(data) < HEADER.size:
+        raise SaveFormatError(f'{filename} is not a save file')
+    return HEADER.unpack_from(data, 0), HEADER.size
+
+
+def _save_header(fields, names):
+    _, _, flags, rows, cols, row, col, time_elapsed, difficulty_length, category_length, _ = fields
+    difficulty = names[:difficulty_length].decode("utf-8")
+    category = names[difficulty_length:difficulty_length + category_length].decode("utf-8")
+    return SaveHeader(rows, cols, difficulty, category if flags & FLAG_CATEGORY else None, [row, col], time_elapsed)
+
+
+def _replace(filename, data):
+    """Writes data to a temporary file, flushes it to the disk and renames it to filename, so filename always holds
+    either its old or its new contents."""
+    temp_file = filename + ".tmp"
+    with open(temp_file, 'wb') as handle:
+        handle.write(data)
+        handle.flush()
+        os.fsync(handle.fileno())
+    os.replace(temp_file, filename)
+
+
+def _journal_snapshot(handle):
+    """Returns the snapshot id in the header of an open journal file, or None if it has no valid header."""
+    header = handle.read(JOURNAL_HEADER.size)
+    if len(header) < JOURNAL_HEADER.size:
+        return None
+    magic, version, _, snapshot = JOURNAL_HEADER.unpack(header)
+    if magic != JOURNAL_MAGIC or version > JOURNAL_VERSION:
+        return None
+    return snapshot
+
+
+def _journal_chunks(filename, snapshot):
+    """Returns the complete chunks of the journal of filename as (records, time played, row, col) tuples, or an empty
+    list if there is no journal for this snapshot."""
+    try:
+        with open(filename + JOURNAL_SUFFIX, 'rb') as handle:
+            if not snapshot or _journal_snapshot(handle) != snapshot:
+                return []
+            data = handle.read()
+    except FileNotFoundError:
+        return []
+    chunks = []
+    start = 0
+    while start + CHUNK.size <= len(data):
+        count = CHUNK.unpack_from(data, start)[0]
+        end = start + CHUNK.size + count + TRAILER.size
+        if end > len(data):
+            break
+        time_elapsed, row, col, marker = TRAILER.unpack_from(data, end - TRAILER.size)
+        if marker != CHUNK_END:
+            break
+        chunks.append((data[start + CHUNK.size:end - TRAILER.size], time_elapsed, row, col))
+        start = end
+    return chunks
+
+
+def _journal_tail(filename, snapshot):
+    """Returns the time played and the player's position, as (time, row, col), saved in the last chunk of the journal
+    of filename, or None if there is no journal for this snapshot. Reads only the end of the journal, unless the last
+    chunk was cut short."""
+    try:
+        with open(filename + JOURNAL_SUFFIX, 'rb') as handle:
+            if not snapshot or _journal_snapshot(handle) != snapshot:
+                return None
+            end = handle.seek(0, os.SEEK_END)
+            if end >= JOURNAL_HEADER.size + CHUNK.size + TRAILER.size:
+                handle.seek(end - TRAILER.size)
+                time_elapsed, row, col, marker = TRAILER.unpack(handle.read(TRAILER.size))
+                if marker == CHUNK_END:
+                    return time_elapsed, row, col
+    except FileNotFoundError:
+        return None
+    chunks = _journal_chunks(filename, snapshot)
+    return chunks[-1][1:] if chunks else None
+
+
+def _unpickle(filename, data):
+    try:
+        maze = pickle.loads(data)
+    except (pickle.UnpicklingError, EOFError, ValueError) as e:
+        raise SaveFormatError(f'{filename} is not a save file') from e
+    if not isinstance(maze, Maze):
+        raise SaveFormatError(f'{filename} is not a save file')
+    return maze
+
+
+def _little_endian(cells):
+    if sys.byteorder == 'big':
+        cells.byteswap()
+    return cells.tobytes()
+
+
+def _read_cells(data, start, count):
+    cells = array('I')
+    cells.frombytes(data[start:start + count * 4])
+    if sys.byteorder == 'big':
+        cells.byteswap()
+    return cells
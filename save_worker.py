@@ -0,0 +1,121 @@
+import queue
+import threading
+from functools import partial
+from save_format import read_header, read_save
+
+
+class SaveTask:
+    """
+    A save, load or other piece of file work queued on a SaveWorker. Cancelling a task that has not started yet keeps
+    it from running, cancelling one that is running lets it finish but drops its result, so its callbacks are never
+    called either way.
+    """
+    __slots__ = ('work', 'on_done', 'on_error', 'result', 'error', '_cancelled', '_finished')
+
+    def __init__(self, work, on_done=None, on_error=None):
+        self.work = work
+        self.on_done = on_done
+        self.on_error = on_error
+        self.result = None
+        self.error = None
+        self._cancelled = False
+        self._finished = threading.Event()
+
+    def cancel(self):
+        self._cancelled = True
+
+    @property
+    def cancelled(self):
+        return self._cancelled
+
+    def done(self):
+        """Returns True once the task has run or was skipped because it was cancelled."""
+        return self._finished.is_set()
+
+    def wait(self, timeout=None):
+        """Waits until the task is done, returns False if the timeout ran out first."""
+        return self._finished.wait(timeout)
+
+
+class SaveWorker:
+    """
+    Runs saves and loads on a background thread, one at a time and in the order they were submitted, so the game
+    never waits on the disk. What a save writes is captured when it is submitted, see GameSession.prepare_save, so the
+    game can go on while it is written. Callbacks are never called on the worker thread: finished tasks are queued
+    and their callbacks are called by run_callbacks, which the GUI calls from root.after, so they can update widgets.
+    """
+    def __init__(self):
+        self._tasks = queue.Queue()
+        self._finished = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def submit(self, work, on_done=None, on_error=None):
+        """Queues work, a function without arguments, and returns its SaveTask. Once it has run, on_done is called
+        with its result, or on_error with the exception it raised."""
+        task = SaveTask(work, on_done, on_error)
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+        self._tasks.put(task)
+        return task
+
+    def save(self, session, filename, on_done=None, on_error=None, catalog=None):
+        """Saves the game of session to filename and, if a SaveCatalog is passed in, updates its entry in the catalog
+        once the file is written. The state of the game is captured before returning."""
+        write = session.prepare_save(filename)
+        record = catalog.prepare_entry(filename, session.maze) if catalog is not None else None
+
+        def work():
+            write()
+            if record is not None:
+                record()
+        return self.submit(work, on_done, on_error)
+
+    def load(self, filename, on_done=None, on_error=None):
+        """Reads the maze saved in filename, on_done is called with the Maze."""
+        return self.submit(partial(read_save, filename), on_done, on_error)
+
+    def read_header(self, filename, on_done=None, on_error=None):
+        """Reads the header of the save in filename, on_done is called with the SaveHeader."""
+        return self.submit(partial(read_header, filename), on_done, on_error)
+
+    def run_callbacks(self):
+        """Calls the callbacks of the tasks that finished since the last call, on the calling thread. Returns the
+        number of tasks handled."""
+        handled = 0
+        while True:
+            try:
+                task = self._finished.get_nowait()
+            except queue.Empty:
+                return handled
+            handled += 1
+            if task.cancelled:
+                continue
+            if task.error is not None:
+                if task.on_error is not None:
+                    task.on_error(task.error)
+            elif task.on_done is not None:
+                task.on_done(task.result)
+
+    def close(self, timeout=None):
+        """Finishes the queued tasks and stops the worker thread."""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._tasks.put(None)
+            thread.join(timeout)
+
+    def _run(self):
+        while True:
+            task = self._tasks.get()
+            if task is None:
+                return
+            if not task.cancelled:
+                try:
+                    task.result = task.work()
+                except Exception as e:
+                    task.error = e
+            self._finished.put(task)
+            task._finished.set()
@@ -0,0 +1,161 @@
+"""
+Monte Carlo simulation of trivia maze games, used to tune board size and difficulty. Games are played directly on Maze
+objects with a simulated player, so there is no Tk, pygame or SQLite involved. Batches of games are spread over a
+process pool and every worker only sends back totals, so the cost grows linearly with the number of games and shrinks
+with the number of cores.
+
+Example, from the repository root:
+    python simulation.py --games 100000 --size 4x4 --size 8x8 --accuracy 0.6 --accuracy 0.8
+"""
+import argparse
+import os
+import random
+from collections import namedtuple
+from multiprocessing import Pool
+
+from maze import Maze
+from path_service import PathService
+
+SimulationConfig = namedtuple('SimulationConfig', ['rows', 'cols', 'accuracy', 'layout', 'difficulty'],
+                              defaults=[None, "easy"])
+SimulationResult = namedtuple('SimulationResult', ['config', 'games', 'wins', 'moves', 'questions', 'doors_locked'])
+
+
+class FixedAccuracy:
+    """Accuracy model where every question is answered correctly with the same probability."""
+    def __init__(self, probability):
+        self.probability = probability
+
+    def __call__(self, rng, maze):
+        return rng.random() < self.probability
+
+
+class DifficultyAccuracy:
+    """Accuracy model with a different probability of answering correctly for each question difficulty."""
+    def __init__(self, probabilities):
+        self.probabilities = probabilities
+
+    def __call__(self, rng, maze):
+        return rng.random() < self.probabilities[maze.difficulty]
+
+
+def play_game(config, seed):
+    """
+    Plays one game and returns (won, moves, questions, doors_locked). The simulated player always heads for the exit
+    along the shortest open route. Entering a new room asks a question, which is answered correctly according to the
+    accuracy of the config, either a probability or a callable taking a random.Random and the maze, whose questions
+    have the difficulty of the config.
+    """
+    rng = random.Random(seed)
+    accuracy = config.accuracy
+    if not callable(accuracy):
+        accuracy = FixedAccuracy(accuracy)
+    maze = Maze(config.rows, config.cols, compact=True)
+    maze.set_difficulty(config.difficulty)
+    maze.set_layout(config.layout, seed)
+    maze.construct()
+    hints = PathService(maze)
+    moves = questions = locked = 0
+    while not maze.player_wins():
+        direction = hints.next_direction()
+        if direction is None:
+            return False, moves, questions, locked
+        row, col = maze.player_location[0], maze.player_location[1]
+        destination = maze.find_destination(row, col, direction).position
+        if not maze.is_visited(destination[0], destination[1]):
+            questions += 1
+            if not accuracy(rng, maze):
+                maze.lock_door(direction)
+                locked += 1
+                continue
+        maze.move_player(direction)
+        moves += 1
+    return True, moves, questions, locked
+
+
+def _play_batch(args):
+    """Plays the games with the given seeds and returns the totals, run inside the worker processes."""
+    index, config, seeds = args
+    totals = [0, 0, 0, 0]
+    for seed in seeds:
+        won, moves, questions, locked = play_game(config, seed)
+        totals[0] += won
+        totals[1] += moves
+        totals[2] += questions
+        totals[3] += locked
+    return index, len(seeds), totals
+
+
+def simulate(configs, games, workers=None, seed=0, batch_size=1000):
+    """
+    Plays the given number of games for every config and returns a list of SimulationResult in the same order. Game
+    number i of every config uses seed + i, so results are reproducible for a given seed and do not depend on the
+    number of workers. workers=1 runs everything in the current process. Batches are matched to their config by its
+    index, as a config coming back from a worker is a copy, and equal configs are counted separately.
+    """
+    jobs = []
+    for index, config in enumerate(configs):
+        for start in range(0, games, batch_size):
+            jobs.append((index, config, range(seed + start, seed + min(start + batch_size, games))))
+    totals = [[0, 0, 0, 0, 0] for _ in configs]
+    if workers == 1:
+        batches = map(_play_batch, jobs)
+    else:
+        pool = Pool(workers)
+        batches = pool.imap_unordered(_play_batch, jobs)
+    try:
+        for index, played, batch in batches:
+            total = totals[index]
+            total[0] += played
+            for i in range(4):
+                total[i + 1] += batch[i]
+    finally:
+        if workers != 1:
+            pool.close()
+            pool.join()
+    return [SimulationResult(config, *total) for config, total in zip(configs, totals)]
+
+
+def format_results(results):
+    """Returns the results as a table with win rate and averages per game, shown as - for a config without games."""
+    lines = [f'{"size":>9} {"layout":>12} {"accuracy":>9} {"level":>7} {"games":>9} {"win rate":>9} {"moves":>8} '
+             f'{"questions":>10} {"locked":>8}']
+    for result in results:
+        config, games = result.config, result.games
+        accuracy = config.accuracy if not callable(config.accuracy) else type(config.accuracy).__name__
+        line = (f'{config.rows:>4}x{config.cols:<4} {str(config.layout or "open"):>12} {accuracy:>9} '
+                f'{config.difficulty:>7} {games:>9} ')
+        if games:
+            line += (f'{result.wins / games:>9.1%} {result.moves / games:>8.2f} {result.questions / games:>10.2f} '
+                     f'{result.doors_locked / games:>8.2f}')
+        else:
+            line += f'{"-":>9} {"-":>8} {"-":>10} {"-":>8}'
+        lines.append(line)
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulate trivia maze games.")
+    parser.add_argument("--games", type=int, default=10000, help="number of games per configuration")
+    parser.add_argument("--size", action="append", help="maze size as ROWSxCOLS, can be repeated")
+    parser.add_argument("--accuracy", type=float, action="append", help="chance of a correct answer, can be repeated")
+    parser.add_argument("--layout", action="append", help="maze layout algorithm or 'open', can be repeated")
+    parser.add_argument("--difficulty", action="append", help="question difficulty, can be repeated")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="number of worker processes")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    if args.games < 1:
+        parser.error("--games must be at least 1")
+    configs = []
+    for size in args.size or ["4x4"]:
+        rows, cols = (int(value) for value in size.lower().split("x"))
+        for accuracy in args.accuracy or [0.7]:
+            for layout in args.layout or ["open"]:
+                for difficulty in args.difficulty or ["easy"]:
+                    configs.append(SimulationConfig(rows, cols, accuracy, None if layout == "open" else layout,
+                                                    difficulty))
+    print(format_results(simulate(configs, args.games, args.workers, args.seed)))
+
+
+if __name__ == '__main__':
+    main()
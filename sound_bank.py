@@ -0,0 +1,81 @@
+import os
+import time
+
+try:
+    import pygame
+except ImportError:
+    pygame = None
+
+SFX_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "sfx")
+CHANNELS = {
+    "walk": 0,
+    "walk_short": 0,
+    "door_lock": 1,
+    "save_tone": 2,
+    "load_tone": 2,
+    "game_win": 3,
+    "game_lose": 3,
+}
+
+
+class SoundBank:
+    """
+    Sound effects of the game, decoded once when the bank is created instead of being read from disk on every event.
+    Each kind of event plays on its own reserved mixer channel, so a footstep never cuts off a door locking and playing
+    a sound never waits for another to finish. The time every play call takes is recorded per sound, see latency.
+    The bank is muted, and never touches pygame, if muted is set, pygame is not installed or there is no audio device,
+    which is how the game runs headless.
+    folder: folder with the sounds as .wav files, each played by its file name without the extension
+    muted: if True, no sound is loaded or played
+    """
+    def __init__(self, folder=SFX_FOLDER, muted=False):
+        self.folder = folder
+        self.sounds = {}
+        self.channels = {}
+        self.load_seconds = 0.0
+        self._latency = {}
+        self.muted = muted or pygame is None
+        if not self.muted:
+            self.muted = not self._load()
+
+    def _load(self):
+        """Starts the mixer if needed and decodes every sound. Returns False if there is no audio device."""
+        start = time.perf_counter()
+        try:
+            if not pygame.mixer.get_init():
+                pygame.mixer.init()
+            names = sorted(name[:-4] for name in os.listdir(self.folder) if name.endswith(".wav"))
+            reserved = max(CHANNELS.values()) + 1
+            if pygame.mixer.get_num_channels() < reserved:
+                pygame.mixer.set_num_channels(reserved)
+            pygame.mixer.set_reserved(reserved)
+            for name in names:
+                self.sounds[name] = pygame.mixer.Sound(os.path.join(self.folder, name + ".wav"))
+                self.channels[name] = pygame.mixer.Channel(CHANNELS.get(name, 0))
+        except pygame.error as e:
+            print(e)
+            self.sounds = {}
+            self.channels = {}
+            return False
+        self.load_seconds = time.perf_counter() - start
+        return True
+
+    def play(self, name):
+        """Starts playing the sound called name on its channel and returns immediately. Does nothing when muted.
+        Raises KeyError for a sound that is not in the bank, unless the bank is muted."""
+        start = time.perf_counter()
+        if not self.muted:
+            self.channels[name].play(self.sounds[name])
+        elapsed = time.perf_counter() - start
+        stats = self._latency.get(name)
+        if stats is None:
+            stats = self._latency[name] = [0, 0.0, 0.0]
+        stats[0] += 1
+        stats[1] += elapsed
+        stats[2] = max(stats[2], elapsed)
+
+    def latency(self):
+        """Returns, for every sound played so far, the number of plays and the average and longest time a play call
+        took in seconds, as a dictionary of dictionaries with the keys count, average and max."""
+        return {name: {"count": count, "average": total / count, "max": longest}
+                for name, (count, total, longest) in self._latency.items()}
@@ -0,0 +1,206 @@
+import threading
+import time
+import requests
+from requests.adapters import HTTPAdapter
+
+DEFAULT_URL = "https://opentdb.com"
+RATE_LIMITED = 5
+
+_default_client = None
+_default_client_lock = threading.Lock()
+
+
+class TriviaAPIError(Exception):
+    """Raised when the trivia api keeps failing or rate limiting a request after all retries."""
+
+
+class TokenBucket:
+    """
+    Token bucket spacing out requests: tokens are added at rate per second up to capacity, every request takes one.
+    A request that finds the bucket empty reserves the next token and waits for it, so waiting requests are served in
+    the order they arrived.
+    rate: tokens added per second, None for no limit
+    capacity: largest number of requests that may be sent in a burst
+    """
+    def __init__(self, rate, capacity=1):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self):
+        """Takes a token and returns the number of seconds to wait before it may be used."""
+        if self.rate is None:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+
+class ClientMetrics:
+    """Counts what a TriviaAPIClient did: requests sent and their latency, retries, rate limit responses, failed calls,
+    calls answered by another identical call in flight, and the time spent waiting for the token bucket."""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.retries = 0
+        self.rate_limited = 0
+        self.failures = 0
+        self.coalesced = 0
+        self.throttled_seconds = 0.0
+        self.latency_total = 0.0
+        self.latency_max = 0.0
+
+    def add(self, **counts):
+        """Adds the given amounts to the counters."""
+        with self._lock:
+            for name, amount in counts.items():
+                setattr(self, name, getattr(self, name) + amount)
+
+    def add_latency(self, seconds):
+        with self._lock:
+            self.requests += 1
+            self.latency_total += seconds
+            self.latency_max = max(self.latency_max, seconds)
+
+    def snapshot(self):
+        """Returns the counters as a dictionary, along with the average latency."""
+        with self._lock:
+            counts = {name: value for name, value in vars(self).items() if not name.startswith("_")}
+        counts["latency_average"] = counts["latency_total"] / counts["requests"] if counts["requests"] else 0.0
+        return counts
+
+
+class _Call:
+    """A request in flight that identical requests wait on instead of sending their own."""
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class TriviaAPIClient:
+    """
+    Client for the Open Trivia Database api, the single place SQLDatabase talks to the network through. Keeps one
+    pooled requests.Session for all calls, so connections are reused across requests and threads, and every request has
+    a timeout. Question requests take a token from a token bucket, refilled once every min_interval seconds, to respect
+    the upstream rate limit. Failed and rate limited requests are retried with exponential backoff, or after the delay
+    asked for by the server. Identical metadata requests made while one is in flight share its response instead of
+    being sent again. What the client did is counted in metrics.
+    base_url: address of the api, can point at a local server for testing
+    min_interval: number of seconds between two rate limited requests once the burst is used up
+    retries: number of times a failed request is retried
+    backoff: delay before the first retry in seconds, doubled on every further retry
+    timeout: seconds to wait for the server before a request fails
+    pool_size: maximum number of connections kept open to the server
+    burst: number of rate limited requests that may be sent at once after the client has been idle
+    """
+    def __init__(self, base_url=DEFAULT_URL, min_interval=5.0, retries=3, backoff=1.0, timeout=10, pool_size=4,
+                 burst=1):
+        self.base_url = base_url.rstrip("/")
+        self.min_interval = min_interval
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.bucket = TokenBucket(1 / min_interval if min_interval else None, burst)
+        self.metrics = ClientMetrics()
+        self._lock = threading.Lock()
+        self._in_flight = {}
+
+    def get_json(self, path, params=None, rate_limited=True, retries=None, coalesce=None):
+        """
+        Requests path from the api and returns the decoded json response. Rate limited requests wait for their turn
+        first. Connection errors, timeouts, server errors and rate limit responses are retried, if every attempt fails
+        the last error is raised, as a TriviaAPIError for rate limit and server errors.
+        coalesce: if True, a call identical to one in flight waits for that call and shares its response, by default
+        only requests that are not rate limited are coalesced, question requests return different questions each time
+        """
+        if coalesce is None:
+            coalesce = not rate_limited
+        if not coalesce:
+            return self._get_json(path, params, rate_limited, retries)
+        key = (path, tuple(sorted((params or {}).items())), rate_limited, retries)
+        with self._lock:
+            call = self._in_flight.get(key)
+            owner = call is None
+            if owner:
+                call = self._in_flight[key] = _Call()
+        if not owner:
+            self.metrics.add(coalesced=1)
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+        try:
+            call.result = self._get_json(path, params, rate_limited, retries)
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+            call.done.set()
+
+    def _get_json(self, path, params, rate_limited, retries):
+        retries = self.retries if retries is None else retries
+        for attempt in range(retries + 1):
+            if rate_limited:
+                self._wait_turn()
+            delay = self.backoff * 2 ** attempt
+            start = time.monotonic()
+            try:
+                try:
+                    response = self.session.get(self.base_url + path, params=params, timeout=self.timeout)
+                finally:
+                    self.metrics.add_latency(time.monotonic() - start)
+                if response.status_code == 429:
+                    self.metrics.add(rate_limited=1)
+                    delay = max(delay, _retry_after(response))
+                    raise TriviaAPIError(f'{path} returned status 429')
+                if response.status_code >= 500:
+                    raise TriviaAPIError(f'{path} returned status {response.status_code}')
+                data = response.json()
+                if data.get("response_code") == RATE_LIMITED:
+                    self.metrics.add(rate_limited=1)
+                    raise TriviaAPIError(f'{path} was rate limited')
+                return data
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout, TriviaAPIError):
+                if attempt == retries:
+                    self.metrics.add(failures=1)
+                    raise
+                self.metrics.add(retries=1)
+                time.sleep(delay)
+
+    def _wait_turn(self):
+        """Blocks until the token bucket allows another rate limited request."""
+        wait = self.bucket.reserve()
+        if wait > 0:
+            self.metrics.add(throttled_seconds=wait)
+            time.sleep(wait)
+
+
+def _retry_after(response):
+    """Returns the number of seconds the Retry-After header of a response asks to wait, 0 if there is none."""
+    try:
+        return float(response.headers.get("Retry-After", 0))
+    except ValueError:
+        return 0.0
+
+
+def default_client():
+    """Returns the client for the public api shared by the whole process, so the rate limit is respected across
+    every SQLDatabase. The client is created on first use."""
+    global _default_client
+    with _default_client_lock:
+        if _default_client is None:
+            _default_client = TriviaAPIClient()
+        return _default_client
@@ -1,6 +1,113 @@
 import unittest
+import time
+import os
+import tempfile
+import json
+import sqlite3
+import threading
+import warnings
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+import pickle
+import random
+import requests
 from maze import Maze, Room
+from compact_grid import CompactGrid
+from maze_generator import generate, ALGORITHMS, ROOM_LIMITS, SlowGenerationWarning
+from path_service import PathService
+from simulation import simulate, play_game, format_results, SimulationConfig, DifficultyAccuracy
+from question_database import SQLDatabase, question_hash, offline_questions
+from trivia_api import TriviaAPIClient, TriviaAPIError
+from metadata_cache import MetadataCache
+from question_sampler import QuestionSampler, Question
+from question_prefetch import QuestionPrefetcher
+from question_pack import QuestionPack, QuestionPackError, PackSet, pack_name, write_pack, open_questions
+from pack_tools import export_pack, export_packs, import_pack
+from question_server import QuestionServer, QuestionServiceClient, QuestionServiceError
+from game_session import GameSession, MOVED, QUESTION, BLOCKED, BUSY, PLAYING, WON, LOST
 from TriviaMazeGUI import MazeGUI
+from MazeDrawer import Drawer
+from benchmarks.rendering import StubCanvas
+from sound_bank import SoundBank
+from save_format import write_save, read_save, read_header, save_path, SaveFormatError, SaveJournal
+from save_worker import SaveWorker
+from save_catalog import SaveCatalog, make_thumbnail, VISITED, UNVISITED, PLAYER, EXIT
+import pygame
+
+
+class FixedQuestions:
+    """Question source for tests that always returns the same question."""
+    def get_random_question(self):
+        return Question("multiple", "Which one?", "right", ("right", "wrong1", "wrong2", "wrong3"))
+
+
+class FakeTriviaServer:
+    """
+    Local stand in for the trivia api, serving categories, question counts and generated questions over http on a
+    free port. Responses listed in failures are sent for the first question requests, either an http status code or
+    a response_code for the json body. Every request path is recorded in requests. Every response is sent after delay
+    seconds, and 429 responses ask to retry after retry_after seconds if it is set.
+    """
+    counts = {"total_easy_question_count": 57, "total_medium_question_count": 33, "total_hard_question_count": 12}
+
+    def __init__(self, failures=()):
+        self.failures = list(failures)
+        self.requests = []
+        self.served = 0
+        self.delay = 0
+        self.retry_after = None
+        self.lock = threading.Lock()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                url = urlparse(self.path)
+                params = {key: value[0] for key, value in parse_qs(url.query).items()}
+                with server.lock:
+                    server.requests.append(url.path)
+                    status, body = server.respond(url.path, params)
+                time.sleep(server.delay)
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                if status == 429 and server.retry_after is not None:
+                    self.send_header("Retry-After", str(server.retry_after))
+                self.end_headers()
+                self.wfile.write(json.dumps(body).encode())
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f'http://127.0.0.1:{self.httpd.server_address[1]}'
+        threading.Thread(target=self.httpd.serve_forever, args=(0.05,), daemon=True).start()
+
+    def respond(self, path, params):
+        if path == "/api_category.php":
+            return 200, {"trivia_categories": [{"id": 9, "name": "General Knowledge"},
+                                               {"id": 18, "name": "Science: Computers"}]}
+        if path == "/api_count.php":
+            return 200, {"category_id": int(params["category"]), "category_question_count": self.counts}
+        if self.failures:
+            failure = self.failures.pop(0)
+            if failure >= 100:
+                return failure, {}
+            return 200, {"response_code": failure, "results": []}
+        results = []
+        for _ in range(int(params["amount"])):
+            self.served += 1
+            results.append({"type": "multiple", "difficulty": params["difficulty"], "category": "General Knowledge",
+                            "question": f'Question &quot;{self.served}&quot;', "correct_answer": "A &amp; B",
+                            "incorrect_answers": ["C", "D", "E"]})
+        return 200, {"response_code": 0, "results": results}
+
+    def client(self, **settings):
+        settings.setdefault("min_interval", 0)
+        settings.setdefault("backoff", 0)
+        return TriviaAPIClient(self.url, **settings)
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
 
 
 class UnitTests(unittest.TestCase):
@@ -21,6 +128,47 @@ class UnitTests(unittest.TestCase):
             room.lock_door(direction)
             self.assertFalse(room.doors()[direction])
 
+    # CompactGrid
+    def test_compact_room_view_defaults(self):
+        room = CompactGrid(2, 2)[1][0]
+        self.assertEqual(room.position, [1, 0])
+        self.assertEqual(room.doors(), Room(1, 0).doors())
+        self.assertEqual(dict(room.answers), Room(1, 0).answers)
+
+    def test_compact_room_view_lock_door_and_answers(self):
+        grid = CompactGrid(2, 2)
+        grid[0][1].lock_door("East")
+        grid[0][1].answers["south"] = 'wrong'
+        room = grid[0][1]
+        self.assertFalse(room.doors()["east"])
+        self.assertTrue(room.doors()["south"])
+        self.assertEqual(room.answers["south"], 'wrong')
+        self.assertEqual(room.answers["north"], 'not set')
+        self.assertEqual(room, grid[0][1])
+        self.assertNotEqual(room, grid[1][1])
+
+    def test_compact_maze_matches_room_maze(self):
+        mazes = [Maze(4, 5), Maze(4, 5, compact=True)]
+        for maze in mazes:
+            maze.construct()
+            maze.move_player("east")
+            maze.lock_door("south")
+            maze.move_player("north")
+        for row in range(4):
+            for col in range(5):
+                self.assertEqual(mazes[0].get_room(row, col).doors(), mazes[1].get_room(row, col).doors())
+        self.assertEqual([room.position for room in mazes[0].visited_rooms],
+                         [room.position for room in mazes[1].visited_rooms])
+        self.assertEqual(mazes[0].is_completable(), mazes[1].is_completable())
+
+    def test_compact_maze_pickle(self):
+        maze = Maze(3, 3, compact=True)
+        maze.construct()
+        maze.lock_door("north")
+        loaded = pickle.loads(pickle.dumps(maze))
+        self.assertFalse(loaded.check_direction(1, 1, "north"))
+        self.assertEqual(loaded.visited_rooms, [loaded.get_room(1, 1)])
+
     #Maze
     def test_player_default_location(self):
         maze = Maze(3, 3)
@@ -119,6 +267,25 @@ class UnitTests(unittest.TestCase):
         maze.lock_door("north")
         self.assertFalse(maze.check_direction(0, 1, "south"))
 
+    def test_adjacency_index_matches_rebuild(self):
+        for compact in [False, True]:
+            maze = Maze(4, 5, compact=compact)
+            maze.construct()
+            maze.lock_door("east")
+            maze.move_player("south")
+            maze.lock_door("west")
+            maintained = bytes(maze.adjacency)
+            maze.build_adjacency()
+            self.assertEqual(maintained, bytes(maze.adjacency))
+
+    def test_adjacency_index_borders(self):
+        maze = Maze(3, 4)
+        maze.construct()
+        self.assertFalse(maze.check_direction(0, 3, "east"))
+        self.assertFalse(maze.check_direction(2, 0, "west"))
+        self.assertFalse(maze.check_direction(2, 3, "south"))
+        self.assertTrue(maze.check_direction(2, 3, "west"))
+
     def test_maze_lock_door(self):
         maze = Maze(3, 3)
         maze.construct()
@@ -169,6 +336,25 @@ class UnitTests(unittest.TestCase):
         maze.move_player("east")
         self.assertEqual(maze.visited_rooms, [maze.get_room(1, 1), maze.get_room(0, 1), maze.get_room(1, 2)])
 
+    def test_is_visited(self):
+        maze = Maze(3, 3)
+        maze.construct()
+        maze.move_player("north")
+        self.assertTrue(maze.is_visited(0, 1))
+        self.assertTrue(maze.is_visited(1, 1))
+        self.assertFalse(maze.is_visited(1, 2))
+
+    def test_visited_rooms_rebuilt_for_old_saves(self):
+        maze = Maze(3, 3)
+        maze.construct()
+        maze.move_player("east")
+        state = maze.__dict__.copy()
+        del state['_visited']
+        loaded = Maze.__new__(Maze)
+        loaded.__setstate__(state)
+        self.assertTrue(loaded.is_visited(1, 2))
+        self.assertFalse(loaded.is_visited(0, 0))
+
     def test_maze_is_completable_true1(self):
         maze = Maze(3, 3)
         maze.construct()
@@ -200,6 +386,74 @@ class UnitTests(unittest.TestCase):
             maze.lock_door(direction)
         self.assertFalse(maze.is_completable())
 
+    def test_maze_is_completable_large(self):
+        maze = Maze(150, 150)
+        maze.construct()
+        self.assertTrue(maze.is_completable())
+
+    def test_maze_is_completable_return_path(self):
+        maze = Maze(3, 3)
+        maze.construct()
+        maze.lock_door("south")
+        self.assertEqual(maze.is_completable(return_path=True), [[1, 1], [1, 2], [2, 2]])
+
+    def test_maze_is_completable_return_path_none(self):
+        maze = Maze(3, 3)
+        maze.construct()
+        for direction in ["south", "north", "west", "east"]:
+            maze.lock_door(direction)
+        self.assertIsNone(maze.is_completable(return_path=True))
+
+    def test_check_traversal_reuses_visited(self):
+        maze = Maze(3, 3)
+        maze.construct()
+        visited = bytearray(b'\x01' * 9)
+        self.assertTrue(maze.check_traversal(0, 0, visited))
+
+    def test_maze_is_completable_after_locks_matches_search(self):
+        rng = random.Random(3)
+        maze = Maze(6, 6)
+        maze.construct()
+        self.assertTrue(maze.is_completable())
+        for _ in range(60):
+            maze._player_location = [rng.randrange(6), rng.randrange(6)]
+            maze.lock_door(rng.choice(["north", "south", "east", "west"]))
+            row, col = maze.player_location
+            self.assertEqual(maze.is_completable(), maze.check_traversal(row, col))
+        self.assertFalse(maze.connectivity.forest)
+
+    def test_connectivity_in_generated_maze(self):
+        rng = random.Random(5)
+        directions = ["north", "south", "east", "west"]
+        maze = Maze(7, 8, compact=True)
+        maze.set_layout("wilson", seed=4)
+        maze.construct()
+        self.assertTrue(maze.is_completable())
+        self.assertTrue(maze.connectivity.forest)
+        for _ in range(40):
+            maze._player_location = [rng.randrange(7), rng.randrange(8)]
+            maze.lock_door(rng.choice(directions))
+            row, col = maze.player_location
+            self.assertEqual(maze.is_completable(), maze.check_traversal(row, col))
+            reachable, rooms = {(row, col)}, [(row, col)]
+            for room in rooms:
+                for direction in directions:
+                    if maze.check_direction(*room, direction):
+                        neighbour = tuple(maze.find_destination(*room, direction).position)
+                        if neighbour not in reachable:
+                            reachable.add(neighbour)
+                            rooms.append(neighbour)
+            other = (rng.randrange(7), rng.randrange(8))
+            self.assertEqual(maze.connectivity.connected(row, col, *other), other in reachable)
+
+    def test_maze_pickle_drops_connectivity(self):
+        maze = Maze(3, 3)
+        maze.construct()
+        maze.is_completable()
+        loaded = pickle.loads(pickle.dumps(maze))
+        self.assertIsNone(loaded.connectivity)
+        self.assertTrue(loaded.is_completable())
+
     def test_player_wins_false(self):
         maze = Maze(3, 3)
         maze.construct()
@@ -212,3 +466,1012 @@ class UnitTests(unittest.TestCase):
         maze.move_player("east")
         self.assertTrue(maze.player_wins())
 
+    # Maze generation
+    def test_generate_is_spanning_tree(self):
+        for algorithm in ALGORITHMS:
+            passages = generate(6, 9, algorithm, seed=7)
+            doors = sum(bin(flags).count("1") for flags in passages)
+            self.assertEqual(doors // 2, 6 * 9 - 1, algorithm)
+
+    def test_generate_is_reproducible(self):
+        for algorithm in ALGORITHMS:
+            self.assertEqual(generate(8, 8, algorithm, seed=3), generate(8, 8, algorithm, seed=3))
+
+    def test_generate_unknown_algorithm(self):
+        with self.assertRaises(ValueError):
+            generate(3, 3, "prim")
+
+    def test_generate_warns_above_room_limit(self):
+        limit = ROOM_LIMITS["kruskal"]
+        ROOM_LIMITS["kruskal"] = 20
+        try:
+            with self.assertWarns(SlowGenerationWarning):
+                generate(5, 5, "kruskal", seed=1)
+            with warnings.catch_warnings():
+                warnings.simplefilter("error")
+                generate(4, 5, "kruskal", seed=1)
+        finally:
+            ROOM_LIMITS["kruskal"] = limit
+
+    def test_generated_maze_is_completable(self):
+        for compact in [False, True]:
+            for algorithm in ALGORITHMS:
+                maze = Maze(7, 5, compact=compact)
+                maze.set_layout(algorithm, seed=11)
+                maze.construct()
+                self.assertTrue(maze.is_completable())
+                self.assertIsNotNone(maze.find_path(0, 0))
+                self.assertEqual(maze.maze_seed, 11)
+
+    def test_generated_maze_same_for_both_backends(self):
+        mazes = [Maze(5, 6), Maze(5, 6, compact=True)]
+        for maze in mazes:
+            maze.set_layout("wilson", seed=2)
+            maze.construct()
+        self.assertEqual(mazes[0].adjacency, mazes[1].adjacency)
+
+    # PathService
+    def test_path_service_path_and_length(self):
+        maze = Maze(3, 3)
+        maze.construct()
+        hints = PathService(maze)
+        self.assertEqual(hints.length(), 2)
+        self.assertEqual(hints.path()[0], [1, 1])
+        self.assertEqual(hints.path()[-1], [2, 2])
+        self.assertIn(hints.next_direction(), ["south", "east"])
+
+    def test_path_service_reuses_path_when_moving_along_it(self):
+        maze = Maze(5, 5)
+        maze.construct()
+        hints = PathService(maze)
+        path = hints.path()
+        maze.move_player(hints.next_direction())
+        self.assertEqual(hints.path(), path[1:])
+        self.assertEqual(hints.searches, 1)
+
+    def test_path_service_ignores_locks_off_path(self):
+        maze = Maze(5, 5)
+        maze.construct()
+        hints = PathService(maze)
+        on_path = hints.next_direction()
+        maze.lock_door([d for d in ["north", "south", "east", "west"] if d != on_path][0])
+        self.assertEqual(hints.length(), 6)
+        self.assertEqual(hints.searches, 1)
+        maze.lock_door(on_path)
+        self.assertEqual(hints.length(), 6)
+        self.assertEqual(hints.searches, 2)
+        self.assertEqual(hints.path(), maze.find_path(1, 1))
+
+    def test_path_service_unreachable(self):
+        maze = Maze(3, 3)
+        maze.construct()
+        hints = PathService(maze)
+        for direction in ["south", "north", "west", "east"]:
+            maze.lock_door(direction)
+        self.assertIsNone(hints.path())
+        self.assertIsNone(hints.length())
+        self.assertIsNone(hints.next_direction())
+
+    # Drawer
+    def test_drawer_update_matches_full_draw(self):
+        rng = random.Random(4)
+        maze = Maze(6, 7, compact=True)
+        maze.construct()
+        canvas = StubCanvas()
+        drawer = Drawer(maze, canvas, player_image="player", exit_image="exit")
+        drawer.hint = PathService(maze)
+        drawer.draw()
+        for _ in range(60):
+            row, col = maze.player_location[0], maze.player_location[1]
+            directions = [direction for direction in ["north", "south", "east", "west"]
+                          if maze.check_direction(row, col, direction)]
+            if not directions:
+                break
+            if rng.random() < 0.2:
+                maze.lock_door(rng.choice(directions))
+            else:
+                maze.move_player(rng.choice(directions))
+            drawer.update()
+            full = StubCanvas()
+            full_drawer = Drawer(maze, full, player_image="player", exit_image="exit")
+            full_drawer.hint = drawer.hint
+            full_drawer.draw()
+            self.assertEqual(sorted(canvas.items.values()), sorted(full.items.values()))
+
+    def test_drawer_update_cost_independent_of_size(self):
+        calls = []
+        for size in [5, 30]:
+            maze = Maze(size, size)
+            maze.construct()
+            canvas = StubCanvas()
+            drawer = Drawer(maze, canvas, player_image="player", exit_image="exit")
+            drawer.draw()
+            canvas.calls = 0
+            maze.move_player("east")
+            drawer.update()
+            maze.lock_door("south")
+            drawer.update()
+            calls.append(canvas.calls)
+        self.assertEqual(calls[0], calls[1])
+
+    def test_drawer_viewport_follows_player(self):
+        maze = Maze(200, 300, compact=True)
+        maze.construct()
+        canvas = StubCanvas()
+        drawer = Drawer(maze, canvas, player_image="player", exit_image="exit", view=(8, 10))
+        drawer.draw()
+        self.assertEqual(len(canvas.tagged["wall"]), 80)
+        self.assertEqual((drawer.top, drawer.left), (0, 0))
+        for _ in range(20):
+            maze.move_player("east")
+            drawer.update()
+            self.assertTrue(drawer.left + 1 <= maze.player_location[1] < drawer.left + 9)
+        self.assertEqual(len(canvas.tagged["wall"]), 80)
+        full = StubCanvas()
+        full_drawer = Drawer(maze, full, player_image="player", exit_image="exit", view=(8, 10))
+        full_drawer.top, full_drawer.left = drawer.top, drawer.left
+        full_drawer.draw()
+        self.assertEqual(sorted(canvas.items.values()), sorted(full.items.values()))
+
+    def test_drawer_hint_clipped_to_viewport(self):
+        maze = Maze(200, 300, compact=True)
+        maze.construct()
+        canvas = StubCanvas()
+        drawer = Drawer(maze, canvas, player_image="player", exit_image="exit", view=(8, 10))
+        drawer.hint = PathService(maze)
+        drawer.draw()
+        lines = [canvas.items[item][1] for item in canvas.tagged["hint"]]
+        self.assertEqual(len(lines), 1)
+        self.assertLessEqual(len(lines[0]), 2 * (8 + 10))
+        self.assertTrue(all(-50 <= value <= 1050 for value in lines[0]))
+        hint = set(canvas.tagged["hint"])
+        drawer.update()
+        self.assertEqual(canvas.tagged["hint"], hint)
+        maze.move_player("east")
+        drawer.update()
+        self.assertNotEqual(canvas.tagged["hint"], hint)
+
+    def test_drawer_minimap_level_of_detail(self):
+        maze = Maze(300, 300, compact=True)
+        maze.construct()
+        for _ in range(50):
+            maze.move_player("east")
+        canvas = StubCanvas()
+        drawer = Drawer(maze, canvas, player_image="player", exit_image="exit", view=(8, 10))
+        drawer.set_minimap(True)
+        self.assertEqual(drawer.room_unit, 2)
+        self.assertFalse(drawer.detailed)
+        self.assertNotIn("wall", canvas.tagged)
+        self.assertEqual(len(canvas.tagged["highlight"]), 1)
+        maze.move_player("south")
+        drawer.update()
+        self.assertEqual(len(canvas.tagged["highlight"]), 2)
+        self.assertEqual(canvas.items[drawer._player][1], (102, 4, 104, 6))
+        drawer.set_minimap(False)
+        self.assertEqual(len(canvas.tagged["wall"]), 80)
+
+    # SoundBank
+    def test_sound_bank_muted(self):
+        sounds = SoundBank(muted=True)
+        self.assertEqual(sounds.sounds, {})
+        for _ in range(3):
+            sounds.play("walk")
+        sounds.play("door_lock")
+        latency = sounds.latency()
+        self.assertEqual(latency["walk"]["count"], 3)
+        self.assertEqual(latency["door_lock"]["count"], 1)
+        self.assertLessEqual(latency["walk"]["average"], latency["walk"]["max"])
+
+    def test_sound_bank_decodes_once(self):
+        driver = os.environ.get("SDL_AUDIODRIVER")
+        os.environ["SDL_AUDIODRIVER"] = "dummy"
+        try:
+            sounds = SoundBank()
+            self.assertFalse(sounds.muted)
+            self.assertEqual(set(sounds.sounds), {name[:-4] for name in os.listdir("sfx")})
+            walk = sounds.sounds["walk"]
+            sounds.play("walk")
+            sounds.play("walk")
+            self.assertIs(sounds.sounds["walk"], walk)
+            self.assertIsNot(sounds.channels["walk"], sounds.channels["door_lock"])
+            self.assertEqual(sounds.latency()["walk"]["count"], 2)
+            with self.assertRaises(KeyError):
+                sounds.play("applause")
+        finally:
+            pygame.mixer.quit()
+            if driver is None:
+                del os.environ["SDL_AUDIODRIVER"]
+            else:
+                os.environ["SDL_AUDIODRIVER"] = driver
+
+    # GameSession
+    def new_session(self):
+        session = GameSession(Maze(3, 3), FixedQuestions())
+        session.new_game()
+        return session
+
+    def test_session_new_game_settings(self):
+        session = GameSession(Maze(3, 3), FixedQuestions())
+        session.new_game(5, 6, difficulty="hard", category="Science: Computers")
+        self.assertEqual(session.maze.get_size(), [5, 6])
+        self.assertEqual(session.maze.difficulty, "hard")
+        self.assertEqual(session.maze.category, "Science: Computers")
+        self.assertEqual(session.status(), PLAYING)
+
+    def test_session_question_then_correct_answer(self):
+        session = self.new_session()
+        self.assertEqual(session.request_move("east"), QUESTION)
+        self.assertEqual(session.request_move("south"), BUSY)
+        self.assertTrue(session.answer("right"))
+        self.assertEqual(session.maze.player_location, [1, 2])
+        self.assertEqual(session.maze.get_room(1, 1).answers["east"], 'correct')
+        self.assertEqual(session.request_move("west"), MOVED)
+
+    def test_session_wrong_answer_locks_door(self):
+        session = self.new_session()
+        session.request_move("north")
+        self.assertFalse(session.answer("wrong2"))
+        self.assertEqual(session.maze.player_location, [1, 1])
+        self.assertEqual(session.request_move("north"), BLOCKED)
+
+    def test_session_answer_without_question(self):
+        session = self.new_session()
+        with self.assertRaises(ValueError):
+            session.answer("right")
+
+    def test_session_win_and_lose(self):
+        session = self.new_session()
+        for direction in ["south", "east"]:
+            session.request_move(direction)
+            session.answer("right")
+        self.assertEqual(session.status(), WON)
+        session = self.new_session()
+        for direction in ["north", "south", "east", "west"]:
+            session.request_move(direction)
+            session.answer("wrong1")
+        self.assertEqual(session.status(), LOST)
+        self.assertEqual(session.request_move("east"), BLOCKED)
+
+    def test_session_save_and_load(self):
+        session = self.new_session()
+        session.request_move("east")
+        session.answer("right")
+        with tempfile.TemporaryDirectory() as folder:
+            filename = os.path.join(folder, "save.pkl")
+            session.save(filename)
+            other = GameSession(questions=FixedQuestions())
+            other.load(filename)
+        self.assertEqual(other.maze.player_location, [1, 2])
+        self.assertTrue(other.maze.is_visited(1, 2))
+
+    def assert_same_maze(self, maze, loaded):
+        self.assertEqual(loaded.get_size(), maze.get_size())
+        self.assertEqual(loaded.compact, maze.compact)
+        self.assertEqual((loaded.difficulty, loaded.category), (maze.difficulty, maze.category))
+        self.assertEqual((loaded.layout, loaded.maze_seed), (maze.layout, maze.maze_seed))
+        self.assertEqual(loaded.player_location, maze.player_location)
+        self.assertEqual(loaded.get_time(), maze.get_time())
+        self.assertEqual(loaded.adjacency, maze.adjacency)
+        self.assertEqual(loaded.locked_doors, maze.locked_doors)
+        self.assertEqual([room.position for room in loaded.visited_rooms],
+                         [room.position for room in maze.visited_rooms])
+        for row in range(maze.rows):
+            for col in range(maze.cols):
+                self.assertEqual(loaded.is_visited(row, col), maze.is_visited(row, col))
+                self.assertEqual(loaded.get_room(row, col).doors(), maze.get_room(row, col).doors())
+                self.assertEqual(dict(loaded.get_room(row, col).answers), dict(maze.get_room(row, col).answers))
+        self.assertEqual(loaded.is_completable(), maze.is_completable())
+
+    def test_save_format_round_trip(self):
+        for compact in [False, True]:
+            maze = Maze(5, 6, compact=compact)
+            maze.set_layout("kruskal", seed=3)
+            maze.set_category("Science: Computers")
+            maze.construct()
+            session = GameSession(maze, FixedQuestions())
+            session.start_clock()
+            for direction in ["east", "south", "east", "south"]:
+                if session.request_move(direction) == QUESTION:
+                    session.answer("right" if direction == "east" else "wrong1")
+            maze.set_time_elapsed(0, 3725)
+            with tempfile.TemporaryDirectory() as folder:
+                filename = os.path.join(folder, "save.tmsave")
+                write_save(filename, maze)
+                loaded = read_save(filename)
+                header = read_header(filename)
+            self.assert_same_maze(maze, loaded)
+            self.assertEqual(header.get_time(), "01:02:05")
+            self.assertEqual(header[:5], (5, 6, "easy", "Science: Computers", maze.player_location))
+
+    def test_save_format_reads_pickle_saves(self):
+        maze = Maze(4, 4)
+        maze.construct()
+        maze.move_player("east")
+        maze.lock_door("south")
+        with tempfile.TemporaryDirectory() as folder:
+            name = os.path.join(folder, "save_file_1")
+            with open(name + ".pkl", 'wb') as handle:
+                pickle.dump(maze, handle)
+            self.assertEqual(save_path(name), name + ".pkl")
+            self.assertEqual(read_header(save_path(name)).position, [1, 2])
+            self.assert_same_maze(maze, read_save(save_path(name)))
+            write_save(name + ".tmsave", maze)
+            self.assertEqual(save_path(name), name + ".tmsave")
+            with open(name + ".pkl", 'wb') as handle:
+                handle.write(b"not a save")
+            with self.assertRaises(SaveFormatError):
+                read_header(name + ".pkl")
+
+    def play_moves(self, maze, directions):
+        for direction in directions:
+            row, col = maze.player_location
+            if maze.check_direction(row, col, direction):
+                maze.record_answer(direction, True)
+                maze.move_player(direction)
+            else:
+                maze.record_answer(direction, False)
+                maze.lock_door(direction)
+
+    def test_maze_journal_replay(self):
+        for compact in [False, True]:
+            maze = Maze(6, 6, compact=compact)
+            maze.set_layout("wilson", seed=5)
+            maze.construct()
+            self.play_moves(maze, ["east", "south", "west", "south", "east", "east", "north", "south"])
+            self.assertEqual(len(maze.journal), 16)
+            replayed = Maze(6, 6, compact=compact)
+            replayed.set_layout("wilson", seed=5)
+            replayed.construct()
+            replayed.replay(maze.journal)
+            self.assert_same_maze(maze, replayed)
+            self.assertEqual(replayed.journal, maze.journal)
+
+    def test_save_journal_appends_and_compacts(self):
+        maze = Maze(8, 8, compact=True)
+        maze.set_layout("kruskal", seed=2)
+        maze.construct()
+        with tempfile.TemporaryDirectory() as folder:
+            filename = os.path.join(folder, "save.tmsave")
+            journal = SaveJournal(filename, compact_after=12)
+            self.assertTrue(journal.save(maze))
+            with open(filename, 'rb') as handle:
+                snapshot = handle.read()
+            self.play_moves(maze, ["east", "south", "east"])
+            maze.set_time_elapsed(0, 90)
+            self.assertFalse(journal.save(maze))
+            self.play_moves(maze, ["south", "west"])
+            self.assertFalse(journal.save(maze))
+            with open(filename, 'rb') as handle:
+                self.assertEqual(handle.read(), snapshot)
+            self.assertTrue(os.path.exists(filename + ".journal"))
+            header = read_header(filename)
+            self.assertEqual((header.position, header.time_elapsed), (maze.player_location, 90))
+            self.assert_same_maze(maze, read_save(filename))
+            with open(filename + ".journal", 'ab') as handle:
+                handle.write(b"\x03\x00\x00\x00\x01")
+            self.assertEqual(read_header(filename).position, maze.player_location)
+            self.assert_same_maze(maze, read_save(filename))
+            self.play_moves(maze, ["north", "east", "south", "south", "east", "west", "north"])
+            self.assertTrue(journal.save(maze))
+            self.assertFalse(os.path.exists(filename + ".journal"))
+            self.assert_same_maze(maze, read_save(filename))
+            maze.construct()
+            self.assertTrue(journal.save(maze))
+            self.assert_same_maze(maze, read_save(filename))
+
+    def test_save_journal_ignored_for_other_snapshot(self):
+        maze = Maze(4, 4)
+        maze.construct()
+        with tempfile.TemporaryDirectory() as folder:
+            filename = os.path.join(folder, "save.tmsave")
+            journal = SaveJournal(filename)
+            journal.save(maze)
+            maze.move_player("east")
+            journal.save(maze)
+            os.rename(filename + ".journal", filename + ".old")
+            saved = Maze(4, 4)
+            saved.construct()
+            write_save(filename, saved)
+            os.rename(filename + ".old", filename + ".journal")
+            self.assertEqual(read_header(filename).position, [1, 1])
+            self.assertEqual(read_save(filename).player_location, [1, 1])
+
+    def test_session_save_appends_to_journal(self):
+        session = self.new_session()
+        with tempfile.TemporaryDirectory() as folder:
+            filename = os.path.join(folder, "save.tmsave")
+            session.save(filename)
+            session.request_move("east")
+            session.answer("right")
+            session.save(filename)
+            self.assertTrue(os.path.exists(filename + ".journal"))
+            other = GameSession(questions=FixedQuestions())
+            other.load(filename)
+        self.assertEqual(other.maze.player_location, [1, 2])
+        self.assertEqual(other.maze.get_room(1, 1).answers["east"], 'correct')
+
+    def test_save_worker_saves_state_at_submit(self):
+        session = self.new_session()
+        worker = SaveWorker()
+        release = threading.Event()
+        done = []
+        with tempfile.TemporaryDirectory() as folder:
+            filename = os.path.join(folder, "save.tmsave")
+            worker.submit(release.wait)
+            saved = worker.save(session, filename, on_done=done.append)
+            session.request_move("east")
+            session.answer("right")
+            release.set()
+            self.assertTrue(saved.wait(5))
+            self.assertEqual(done, [])
+            self.assertEqual(worker.run_callbacks(), 2)
+            self.assertEqual(done, [None])
+            loaded = worker.load(filename, on_done=done.append)
+            self.assertTrue(loaded.wait(5))
+            worker.run_callbacks()
+        self.assertEqual(done[1].player_location, [1, 1])
+        session.resume(done[1])
+        self.assertEqual(session.maze.player_location, [1, 1])
+        worker.close()
+
+    def test_save_worker_cancel_and_errors(self):
+        worker = SaveWorker()
+        release = threading.Event()
+        done, errors = [], []
+        with tempfile.TemporaryDirectory() as folder:
+            filename = os.path.join(folder, "save.tmsave")
+            maze = Maze(3, 3)
+            maze.construct()
+            write_save(filename, maze)
+            worker.submit(release.wait)
+            loading = worker.load(filename, on_done=done.append)
+            missing = worker.load(os.path.join(folder, "missing.tmsave"), on_done=done.append, on_error=errors.append)
+            loading.cancel()
+            release.set()
+            self.assertTrue(missing.wait(5))
+            worker.run_callbacks()
+        self.assertTrue(loading.done())
+        self.assertIsNone(loading.result)
+        self.assertEqual(done, [])
+        self.assertIsInstance(errors[0], FileNotFoundError)
+        worker.close()
+
+    def test_save_journal_failed_write_takes_new_snapshot(self):
+        maze = Maze(3, 3)
+        maze.construct()
+        with tempfile.TemporaryDirectory() as folder:
+            journal = SaveJournal(os.path.join(folder, "missing", "save.tmsave"))
+            with self.assertRaises(FileNotFoundError):
+                journal.save(maze)
+            journal.filename = os.path.join(folder, "save.tmsave")
+            self.assertTrue(journal.save(maze))
+
+    def test_make_thumbnail(self):
+        maze = Maze(100, 60, compact=True)
+        maze.construct()
+        for _ in range(30):
+            maze.move_player("south")
+        thumbnail = make_thumbnail(maze.rows, maze.cols, maze._visited, maze.player_location, size=10)
+        self.assertEqual((thumbnail.width, thumbnail.height), (10, 10))
+        self.assertEqual([thumbnail.pixels[y * 10] for y in range(5)], [VISITED, VISITED, VISITED, PLAYER, UNVISITED])
+        self.assertEqual(thumbnail.pixels[1], UNVISITED)
+        self.assertEqual(thumbnail.pixels[-1], EXIT)
+        small = make_thumbnail(2, 3, bytes([1, 0, 0, 0, 0, 0]), [0, 0])
+        self.assertEqual(small.pixels, bytes([PLAYER, UNVISITED, UNVISITED, UNVISITED, UNVISITED, EXIT]))
+
+    def test_save_catalog_pages_sorts_and_searches(self):
+        with tempfile.TemporaryDirectory() as folder:
+            catalog = SaveCatalog(folder)
+            for i in range(12):
+                catalog.record(f'save{i}', 4 + i, 4, ["easy", "hard"][i % 2], "Science: Computers" if i < 3 else None,
+                               [1, i], 100 - i, saved_at=1000 + i)
+            page = catalog.page(0, 5)
+            self.assertEqual([entry.filename for entry in page.entries], [f'save{i}' for i in range(11, 6, -1)])
+            self.assertTrue(page.more)
+            last = catalog.page(2, 5)
+            self.assertEqual([entry.filename for entry in last.entries], ["save1", "save0"])
+            self.assertFalse(last.more)
+            self.assertEqual(catalog.page(0, 3, sort="time").entries[0].filename, "save0")
+            self.assertEqual(catalog.page(0, 3, sort="size").entries[0].rows, 15)
+            self.assertEqual(len(catalog.page(0, 20, search="HARD").entries), 6)
+            self.assertEqual([entry.filename for entry in catalog.page(0, 20, sort="oldest",
+                                                                       search="computers").entries],
+                             ["save0", "save1", "save2"])
+            self.assertEqual(catalog.page(0, 20, search="%").entries, [])
+            with self.assertRaises(ValueError):
+                catalog.page(sort="rowid; DROP TABLE saves")
+            catalog.rename("save3", "Before the exit")
+            catalog.record("save3", 7, 4, "hard", None, [2, 2], 200)
+            entry = catalog.get("save3")
+            self.assertEqual((entry.name, entry.position, entry.get_time()), ("Before the exit", [2, 2], "00:03:20"))
+            self.assertEqual(catalog.page(0, 20, sort="name").entries[-1].filename, "save3")
+            catalog.close()
+
+    def test_save_catalog_with_worker(self):
+        session = self.new_session()
+        worker = SaveWorker()
+        with tempfile.TemporaryDirectory() as folder:
+            catalog = SaveCatalog(folder)
+            filename = catalog.new_filename()
+            self.assertTrue(filename.startswith(folder))
+            worker.save(session, filename, catalog=catalog).wait(5)
+            session.request_move("east")
+            session.answer("right")
+            worker.save(session, filename, catalog=catalog).wait(5)
+            entries = catalog.page().entries
+            self.assertEqual(len(entries), 1)
+            self.assertEqual(entries[0].position, [1, 2])
+            self.assertEqual(entries[0].thumbnail.pixels, bytes([UNVISITED, UNVISITED, UNVISITED,
+                                                                 UNVISITED, VISITED, PLAYER,
+                                                                 UNVISITED, UNVISITED, EXIT]))
+            self.assertEqual(read_save(filename).player_location, [1, 2])
+            catalog.delete(filename)
+            self.assertEqual(catalog.page().entries, [])
+            self.assertFalse(os.path.exists(filename))
+            self.assertFalse(os.path.exists(filename + ".journal"))
+            catalog.close()
+        worker.close()
+
+    def test_save_catalog_imports_old_slots(self):
+        maze = Maze(4, 5)
+        maze.construct()
+        with tempfile.TemporaryDirectory() as folder:
+            slots = [os.path.join(folder, f'save_file_{i}') for i in range(1, 4)]
+            with open(slots[0] + ".pkl", 'wb') as handle:
+                pickle.dump(maze, handle)
+            write_save(slots[2] + ".tmsave", maze)
+            catalog = SaveCatalog(os.path.join(folder, "saves"))
+            self.assertEqual(catalog.import_saves(slots), 2)
+            self.assertEqual(catalog.import_saves(slots), 0)
+            entries = catalog.page(sort="name").entries
+            self.assertEqual([entry.name for entry in entries], ["save_file_1", "save_file_3"])
+            self.assertEqual([entry.filename for entry in entries], [slots[0] + ".pkl", slots[2] + ".tmsave"])
+            self.assertEqual(entries[0].cols, 5)
+            self.assertIsNone(entries[0].thumbnail)
+            catalog.close()
+
+    # Simulation
+    def test_play_game_perfect_accuracy(self):
+        won, moves, questions, locked = play_game(SimulationConfig(4, 4, 1.0), seed=1)
+        self.assertTrue(won)
+        self.assertEqual(moves, 4)
+        self.assertEqual(questions, 4)
+        self.assertEqual(locked, 0)
+
+    def test_play_game_zero_accuracy(self):
+        won, moves, questions, locked = play_game(SimulationConfig(4, 4, DifficultyAccuracy({"easy": 0.0})), seed=1)
+        self.assertFalse(won)
+        self.assertEqual(moves, 0)
+        self.assertEqual(questions, locked)
+
+    def test_simulate_independent_of_workers(self):
+        configs = [SimulationConfig(4, 4, 0.7), SimulationConfig(5, 5, 0.5, "kruskal")]
+        serial = simulate(configs, 40, workers=1, batch_size=7)
+        parallel = simulate(configs, 40, workers=2, batch_size=7)
+        self.assertEqual(serial, parallel)
+        self.assertEqual([result.games for result in serial], [40, 40])
+
+    def test_simulate_accuracy_by_difficulty(self):
+        accuracy = DifficultyAccuracy({"easy": 1.0, "hard": 0.0})
+        configs = [SimulationConfig(4, 4, accuracy), SimulationConfig(4, 4, accuracy, difficulty="hard"),
+                   SimulationConfig(4, 4, accuracy)]
+        easy, hard, again = simulate(configs, 20, workers=2, batch_size=3)
+        self.assertEqual((easy.games, easy.wins), (20, 20))
+        self.assertEqual((hard.games, hard.wins), (20, 0))
+        self.assertEqual(again.games, 20)
+
+    def test_format_results_without_games(self):
+        results = simulate([SimulationConfig(4, 4, 0.7)], 0, workers=1)
+        self.assertEqual(results[0].games, 0)
+        self.assertTrue(format_results(results).splitlines()[1].endswith(" -"))
+
+
+class QuestionDatabaseTests(unittest.TestCase):
+
+    def setUp(self):
+        self.server = FakeTriviaServer()
+        self.folder = tempfile.TemporaryDirectory()
+        self.database_file = os.path.join(self.folder.name, "questions.db")
+        self.metadata = MetadataCache(os.path.join(self.folder.name, "metadata.json"))
+
+    def tearDown(self):
+        self.server.close()
+        self.folder.cleanup()
+
+    def database(self, *args, api=None, **settings):
+        """Creates an SQLDatabase using the fake server and the temporary files."""
+        return SQLDatabase(*args, api=api or self.server.client(), database_file=self.database_file,
+                           metadata=self.metadata, **settings)
+
+    def stored_questions(self):
+        conn = sqlite3.connect(self.database_file)
+        count = conn.execute("SELECT COUNT(*) FROM questions").fetchone()[0]
+        conn.close()
+        return count
+
+    def test_category_list(self):
+        db = self.database()
+        self.assertEqual(db.category_list, {"General Knowledge": "9", "Science: Computers": "18"})
+
+    def test_plan_requests(self):
+        db = self.database("General Knowledge", "medium", 50)
+        self.assertEqual(db.total_question_count, {"medium": 30, "easy": 50})
+        self.assertEqual(db.plan_requests(), [(30, "medium"), (50, "easy")])
+
+    def test_build_database_concurrently(self):
+        db = self.database(difficulty="hard", target=180, workers=4, commit_every=2)
+        db.build_database()
+        self.assertEqual(self.stored_questions(), 380)
+        self.assertEqual(self.server.requests.count("/api.php"), len(db.plan_requests()))
+
+    def test_build_database_stops_sending_requests(self):
+        self.server.delay = 0.2
+        db = self.database(difficulty="hard", target=180, workers=1)
+        stop = threading.Event()
+        start = time.monotonic()
+        db.build_database(on_batch=lambda questions: stop.set(), should_stop=stop.is_set)
+        self.assertLess(time.monotonic() - start, 2)
+        self.assertLess(self.server.requests.count("/api.php"), len(db.plan_requests({})))
+        self.assertTrue(db.online)
+
+    def test_build_database_fetches_only_missing(self):
+        self.database(difficulty="hard", target=40, workers=1).build_database()
+        fetched = self.server.served
+        db = self.database(difficulty="hard", target=40, workers=1)
+        db.build_database()
+        self.assertEqual(self.server.served, fetched)
+        self.assertEqual(self.stored_questions(), fetched)
+
+    def test_store_keeps_categories_apart(self):
+        self.database(difficulty="easy", target=10).build_database()
+        self.database("Science: Computers", "easy", 10).build_database()
+        databases = [self.database(category, "easy", 10) for category in [None, "General Knowledge", "Science: Computers"]]
+        self.assertEqual([len(db.sampler()) for db in databases], [80, 40, 40])
+        self.assertEqual(self.stored_questions(), 80)
+        for db in databases:
+            db.close()
+
+    def test_questions_decoded_at_ingest(self):
+        questions = self.database(target=10).request_questions(10, "easy")
+        self.assertEqual(questions[0][4:], ('Question "1"', "A & B", "C", "D", "E"))
+        self.assertEqual(questions[0][0], question_hash('Question "1"', "A & B"))
+        self.assertNotEqual(question_hash("Question 1", "A"), question_hash("Question 1", "B"))
+
+    def test_escaped_store_decoded_once(self):
+        conn = sqlite3.connect(self.database_file)
+        conn.execute("CREATE TABLE questions (hash text PRIMARY KEY, category text, difficulty text, type text, "
+                     "question text, correct_answer text, incorrect1 text, incorrect2 text, incorrect3 text);")
+        conn.execute("INSERT INTO questions Values (?,?,?,?,?,?,?,?,?)",
+                     (question_hash("Q & A", "B"), "General Knowledge", "easy", "boolean", "Q &amp; A", "B",
+                      "&lt;C&gt;", "", ""))
+        conn.commit()
+        conn.close()
+        db = self.database(target=10)
+        db.build_database()
+        db.close()
+        conn = sqlite3.connect(self.database_file)
+        row = conn.execute("SELECT question, incorrect1 FROM questions WHERE hash = ?",
+                           (question_hash("Q & A", "B"),)).fetchone()
+        conn.close()
+        self.assertEqual(row, ("Q & A", "<C>"))
+
+    def test_question_record(self):
+        question = Question.from_row(("boolean", "True?", "True", "False", "", ""))
+        self.assertEqual(question.answers, ("True", "False"))
+        self.assertEqual(question.correct_answer, "True")
+
+    def test_old_question_table_replaced(self):
+        self.fill_questions(5)
+        self.database(target=10).build_database()
+        conn = sqlite3.connect(self.database_file)
+        columns = [row[1] for row in conn.execute("PRAGMA table_info(questions)")]
+        conn.close()
+        self.assertIn("hash", columns)
+        self.assertEqual(self.stored_questions(), 40)
+
+    def test_build_database_retries(self):
+        self.server.failures = [500, 5, 429]
+        db = self.database(target=40, workers=1)
+        db.build_database()
+        self.assertEqual(self.stored_questions(), 100)
+
+    def test_build_database_skips_failed_requests(self):
+        self.server.failures = [500, 500]
+        db = self.database(target=40, api=self.server.client(retries=1), workers=1)
+        db.build_database()
+        self.assertEqual(self.stored_questions(), 50)
+
+    def test_client_gives_up_after_retries(self):
+        self.server.failures = [5, 5, 5]
+        with self.assertRaises(TriviaAPIError):
+            self.server.client(retries=2).get_json("/api.php", {"amount": 10, "difficulty": "easy"})
+
+    def test_client_spaces_rate_limited_requests(self):
+        client = self.server.client(min_interval=0.05)
+        start = time.monotonic()
+        for _ in range(3):
+            client.get_json("/api.php", {"amount": 1, "difficulty": "easy"})
+        self.assertGreaterEqual(time.monotonic() - start, 0.1)
+
+    def test_client_token_bucket_allows_burst(self):
+        client = self.server.client(min_interval=0.2, burst=3)
+        start = time.monotonic()
+        for _ in range(3):
+            client.get_json("/api.php", {"amount": 1, "difficulty": "easy"})
+        self.assertLess(time.monotonic() - start, 0.15)
+        client.get_json("/api.php", {"amount": 1, "difficulty": "easy"})
+        self.assertGreaterEqual(time.monotonic() - start, 0.15)
+        self.assertGreater(client.metrics.snapshot()["throttled_seconds"], 0)
+
+    def test_client_coalesces_identical_count_requests(self):
+        self.server.delay = 0.1
+        client = self.server.client()
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(
+            client.get_json("/api_count.php", {"category": 9}, rate_limited=False))) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(self.server.requests, ["/api_count.php"])
+        self.assertEqual(len(results), 5)
+        self.assertEqual(client.metrics.snapshot()["coalesced"], 4)
+
+    def test_client_honours_retry_after(self):
+        self.server.failures = [429]
+        self.server.retry_after = 0.1
+        client = self.server.client()
+        start = time.monotonic()
+        client.get_json("/api.php", {"amount": 1, "difficulty": "easy"})
+        self.assertGreaterEqual(time.monotonic() - start, 0.1)
+        metrics = client.metrics.snapshot()
+        self.assertEqual((metrics["requests"], metrics["retries"], metrics["rate_limited"]), (2, 1, 1))
+
+    def test_client_times_out(self):
+        self.server.delay = 0.5
+        client = self.server.client(timeout=0.05, retries=1)
+        with self.assertRaises(requests.exceptions.Timeout):
+            client.get_json("/api_category.php", rate_limited=False)
+        self.assertEqual(client.metrics.snapshot()["failures"], 1)
+
+    def test_offline(self):
+        db = self.database(api=TriviaAPIClient("http://127.0.0.1:9", timeout=1))
+        self.assertFalse(db.online)
+        self.assertIsNone(db.category_list)
+        self.assertEqual(db.total_question_count, {"hard": 200, "medium": 200, "easy": 200})
+
+    def test_metadata_cached_between_databases(self):
+        self.database("General Knowledge", "hard")
+        self.database("General Knowledge", "hard")
+        self.assertEqual(self.server.requests, ["/api_category.php", "/api_count.php"])
+
+    def test_metadata_stale_entries_refetched(self):
+        self.database()
+        self.metadata.ttl = -1
+        self.database()
+        self.assertEqual(self.server.requests, ["/api_category.php", "/api_category.php"])
+
+    def test_metadata_persisted_to_disk(self):
+        self.database("Science: Computers")
+        cache = MetadataCache(self.metadata.path)
+        self.assertEqual(cache.get("categories")["Science: Computers"], "18")
+        self.assertEqual(cache.get("counts:18"), FakeTriviaServer.counts)
+
+    def test_metadata_stale_fallback_when_offline(self):
+        self.database("General Knowledge")
+        self.metadata.ttl = -1
+        db = self.database("General Knowledge", api=TriviaAPIClient("http://127.0.0.1:9", timeout=1))
+        self.assertFalse(db.online)
+        self.assertEqual(db.category_list["General Knowledge"], "9")
+        self.assertEqual(db.total_question_count, {"easy": 50})
+
+    def test_refresh_metadata(self):
+        db = self.database()
+        db.refresh_metadata()
+        self.assertEqual(self.server.requests, ["/api_category.php", "/api_category.php"])
+
+    def fill_questions(self, count, database_file=None):
+        conn = sqlite3.connect(database_file or self.database_file)
+        conn.execute("CREATE TABLE questions (type text, question text, correct_answer text, incorrect1 text, "
+                     "incorrect2 text, incorrect3 text);")
+        conn.executemany("INSERT INTO questions Values (?,?,?,?,?,?)",
+                         [("boolean", f'Question {i}', "True", "False", "", "") for i in range(count)])
+        conn.commit()
+        conn.close()
+
+    def test_sampler_draws_rows(self):
+        self.fill_questions(20)
+        sampler = QuestionSampler(self.database_file, rng=random.Random(1))
+        self.assertEqual(len(sampler), 20)
+        for _ in range(50):
+            self.assertIn(sampler.draw().text, {f'Question {i}' for i in range(20)})
+        sampler.close()
+
+    def test_sampler_no_repeat(self):
+        self.fill_questions(10)
+        sampler = QuestionSampler(self.database_file, no_repeat=True, rng=random.Random(2))
+        first = {sampler.draw().text for _ in range(10)}
+        second = {sampler.draw().text for _ in range(10)}
+        self.assertEqual(len(first), 10)
+        self.assertEqual(first, second)
+        sampler.close()
+
+    def test_sampler_empty_table(self):
+        self.fill_questions(0)
+        sampler = QuestionSampler(self.database_file)
+        self.assertIsNone(sampler.draw())
+        sampler.close()
+
+    def test_get_random_question_reuses_connection(self):
+        db = self.database(target=10, no_repeat=True)
+        db.build_database()
+        questions = {db.get_random_question().text for _ in range(40)}
+        self.assertIs(db.sampler(), db.sampler())
+        self.assertEqual(len(questions), 40)
+        self.assertIn('Question "1"', questions)
+        db.close()
+
+    def test_prefetch_uses_backup_until_questions_arrive(self):
+        backup_file = os.path.join(self.folder.name, "backup.db")
+        self.fill_questions(3, backup_file)
+        prefetcher = QuestionPrefetcher(lambda: self.database(target=10), backup_file=backup_file)
+        self.assertEqual(prefetcher.get_random_question().correct_answer, "True")
+        prefetcher.close()
+
+    def test_prefetch_survives_failing_database(self):
+        def fail():
+            raise sqlite3.OperationalError("unable to open database file")
+        prefetcher = QuestionPrefetcher(fail)
+        errors = []
+        excepthook, threading.excepthook = threading.excepthook, errors.append
+        try:
+            prefetcher.start()
+            self.assertTrue(prefetcher.built.wait(5))
+            prefetcher._thread.join(1)
+        finally:
+            threading.excepthook = excepthook
+        self.assertEqual(len(errors), 1)
+        prefetcher.close()
+
+    def test_prefetch_fills_queue_in_background(self):
+        prefetcher = QuestionPrefetcher(lambda: self.database(target=10), size=5)
+        prefetcher.start()
+        self.assertTrue(prefetcher.built.wait(5))
+        deadline = time.monotonic() + 5
+        while not prefetcher.ready.full() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        questions = [prefetcher.get_random_question() for _ in range(5)]
+        self.assertEqual({question.correct_answer for question in questions}, {"A & B"})
+        self.assertTrue(all(question.text.startswith('Question "') for question in questions))
+        prefetcher.close()
+        prefetcher._thread.join(1)
+        self.assertFalse(prefetcher._thread.is_alive())
+
+    def test_prefetch_does_not_repeat_offered_questions(self):
+        prefetcher = QuestionPrefetcher(lambda: self.database(target=60, no_repeat=True), size=10)
+        prefetcher.start()
+        questions = [prefetcher.ready.get(timeout=5).text for _ in range(60)]
+        self.assertEqual(len(set(questions)), 60)
+        prefetcher.close()
+
+    def test_pack_round_trip(self):
+        self.fill_questions(20)
+        for compress in [False, True]:
+            pack_file = os.path.join(self.folder.name, f'questions-{compress}.tmqp')
+            self.assertEqual(export_pack(self.database_file, pack_file, difficulty="easy", compress=compress), 20)
+            pack = QuestionPack(pack_file)
+            self.assertEqual(len(pack), 20)
+            self.assertEqual((pack.category, pack.difficulty, pack.compressed), ("", "easy", compress))
+            self.assertEqual([question.text for question in pack], [f'Question {i}' for i in range(20)])
+            self.assertEqual(pack.draw().answers, ("True", "False"))
+            pack.close()
+
+    def test_pack_no_repeat(self):
+        self.fill_questions(10)
+        pack_file = os.path.join(self.folder.name, "questions.tmqp")
+        export_pack(self.database_file, pack_file)
+        pack = QuestionPack(pack_file, no_repeat=True)
+        first = {pack.draw().text for _ in range(10)}
+        second = {pack.draw().text for _ in range(10)}
+        self.assertEqual(len(first), 10)
+        self.assertEqual(first, second)
+        pack.close()
+
+    def test_pack_rejects_other_files(self):
+        self.fill_questions(1)
+        with self.assertRaises(QuestionPackError):
+            QuestionPack(self.database_file)
+
+    def test_export_and_import_packs(self):
+        self.database(difficulty="easy", target=10).build_database()
+        self.database("Science: Computers", "easy", 10).build_database()
+        paths = export_packs(self.database_file, os.path.join(self.folder.name, "packs"), compress=True)
+        self.assertEqual(sorted(os.path.basename(path) for path in paths),
+                         ["general_knowledge-easy.tmqp", "science_computers-easy.tmqp"])
+        store = os.path.join(self.folder.name, "store.db")
+        self.assertEqual(sum(import_pack(path, store) for path in paths), 80)
+        self.assertEqual(import_pack(paths[0], store), 0)
+        conn = sqlite3.connect(store)
+        groups = conn.execute("SELECT category, difficulty, COUNT(*) FROM questions GROUP BY category;").fetchall()
+        conn.close()
+        self.assertEqual(groups, [("General Knowledge", "easy", 40), ("Science: Computers", "easy", 40)])
+
+    def test_backup_questions_pack(self):
+        self.fill_questions(5)
+        packs = os.path.join(self.folder.name, "packs")
+        paths = export_packs(self.database_file, packs)
+        self.assertEqual([os.path.basename(path) for path in paths], [pack_name(None, None)])
+        self.assertEqual(offline_questions("History", "hard", packs, self.database_file), (paths[0],))
+        store = os.path.join(self.folder.name, "store.db")
+        self.assertEqual(import_pack(paths[0], store), 5)
+        conn = sqlite3.connect(store)
+        groups = conn.execute("SELECT category, difficulty, COUNT(*) FROM questions GROUP BY difficulty;").fetchall()
+        conn.close()
+        self.assertEqual(groups, [("", "easy", 5)])
+
+    def test_pack_names_do_not_collide(self):
+        self.assertNotEqual(pack_name("Any", "easy"), pack_name(None, "easy"))
+        self.assertNotEqual(pack_name("Any", "any"), pack_name(None, None))
+        self.assertEqual(pack_name("Science: Computers", "hard"), "science_computers-hard.tmqp")
+
+    def test_offline_questions_mix_difficulties(self):
+        packs = os.path.join(self.folder.name, "packs")
+        os.makedirs(packs)
+        for category, difficulty in [("Science: Computers", "hard"), (None, "easy"), (None, None)]:
+            write_pack(os.path.join(packs, pack_name(category, difficulty)),
+                       [("boolean", f'{category} {difficulty} {i}', "True", "False", "", "") for i in range(5)])
+        paths = offline_questions("Science: Computers", "hard", packs, self.database_file)
+        self.assertEqual([os.path.basename(path) for path in paths],
+                         [pack_name("Science: Computers", "hard"), pack_name(None, "easy")])
+        self.assertEqual(offline_questions("History", "medium", packs)[0], os.path.join(packs, pack_name(None, "easy")))
+        questions = open_questions(paths, no_repeat=True)
+        self.assertIsInstance(questions, PackSet)
+        self.assertEqual(len(questions), 10)
+        drawn = {questions.draw().text for _ in range(10)}
+        self.assertEqual(drawn, {f'{category} {difficulty} {i}' for category, difficulty in
+                                 [("Science: Computers", "hard"), (None, "easy")] for i in range(5)})
+        questions.close()
+
+    def test_offline_questions_from_pack(self):
+        packs = os.path.join(self.folder.name, "packs")
+        os.makedirs(packs)
+        self.fill_questions(5)
+        export_pack(self.database_file, os.path.join(packs, pack_name("Science: Computers", "hard")))
+        db = self.database("Science: Computers", "hard", api=TriviaAPIClient("http://127.0.0.1:9", timeout=1),
+                           pack_folder=packs)
+        self.assertFalse(db.online)
+        self.assertIsInstance(db.sampler(), QuestionPack)
+        self.assertIn(db.get_random_question().text, {f'Question {i}' for i in range(5)})
+        db.close()
+
+    def test_question_server_feeds_many_games(self):
+        server = QuestionServer(lambda category, difficulty, target: self.database(category, difficulty, target,
+                                                                                   no_repeat=True), port=0)
+        server.start_background()
+        client = QuestionServiceClient(port=server.port, pool_size=2)
+        databases = [SQLDatabase("Science: Computers", "easy", 10, service=client) for _ in range(4)]
+        self.assertEqual(databases[0].category_list, {"General Knowledge": "9", "Science: Computers": "18"})
+        for db in databases:
+            db.build_database()
+        fetched = self.server.served
+        results = []
+        threads = [threading.Thread(target=lambda db=db: results.extend(db.get_random_question().text
+                                                                        for _ in range(10))) for db in databases]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(fetched, 40)
+        self.assertEqual(len(set(results)), 40)
+        self.assertEqual(self.server.served, fetched)
+        client.close()
+        server.stop()
+
+    def test_question_service_errors(self):
+        server = QuestionServer(port=0).start_background()
+        client = QuestionServiceClient(port=server.port)
+        with self.assertRaises(QuestionServiceError):
+            client.request("shuffle")
+        server.stop()
+        with self.assertRaises(QuestionServiceError):
+            QuestionServiceClient(port=server.port, timeout=1).categories()